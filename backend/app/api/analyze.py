@@ -1,124 +1,357 @@
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Header, Response
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 from ..services.parser import extract_text_chunks
 from ..services.embeddings import embed_texts
 from ..services.qdrant_client import QdrantClientWrapper
-from ..services.analyzer import analyze_vendor_controls
-from ..services.document_classifier import classify_document_type
+from ..services.analyzer import build_ui_report, classify_vendor_controls
+from ..services.document_classifier import classify_documents
+from ..services.lexical_index import build_vendor_index
+from ..services.dedup import dedupe_chunks
+from ..services.checkpoint import RunCheckpoint, compute_run_id, prune_runs
+from ..services.control_framework import controls_fingerprint
 from ..models.schemas import AnalysisReportUI, DocumentMetadata
+from ..services.evidence import prerender_thumbnails
+from ..services.search import mark_ingested
+from ..services.metrics import ANALYSES_IN_PROGRESS, ANALYSES_TOTAL
+from ..services import run_profile
+from ..services.profiler import MODES as PROFILE_MODES, ProfilerBusy, profile_request
+from .profiles import require_admin
+from ..config import EMBED_BATCH_SIZE, EVIDENCE_PRERENDER
+import hashlib
 import os
+import threading
+import time
 import fitz  # PyMuPDF
 
 router = APIRouter()
 qwrap = QdrantClientWrapper()
 
+# Run IDs executing in this process; one in-flight execution per run ID
+_RUNS_IN_PROGRESS = set()
+_RUNS_GUARD = threading.Lock()
+
 
 class AnalyzeRequest(BaseModel):
     vendor_name: Optional[str] = None
     file_paths: List[str]
     framework_filter: Optional[str] = None  # Filter controls by framework (SOC2, ISO27001, etc.)
+    force_rerun: bool = False  # Ignore finished work from an identical earlier submission
 
 
-@router.post("/analyze/{vendor_id}", response_model=AnalysisReportUI)
-def analyze(vendor_id: str, request: AnalyzeRequest):
-    """
-    file_paths: list of local PDF paths to ingest for this vendor
-    """
-    file_paths = request.file_paths
-    vendor_name = request.vendor_name
-    if not file_paths:
-        raise HTTPException(status_code=400, detail="Provide file_paths list in body")
-    
-    try:
-        all_chunks = []
-        document_metadata_list = []
-        
-        # Process each document
-        for p in file_paths:
-            if not os.path.exists(p):
-                continue
-                
-            filename = os.path.basename(p)
-            
-            # Classify document type
-            doc_type = classify_document_type(filename)
-            
-            # Get page count
-            try:
-                doc = fitz.open(p)
-                page_count = len(doc)
-                # Get content preview for better classification
-                content_preview = ""
-                if page_count > 0:
-                    first_page = doc[0]
-                    content_preview = first_page.get_text("text")[:2000]
-                doc.close()
-                # Re-classify with content preview
-                doc_type = classify_document_type(filename, content_preview)
-            except Exception:
-                page_count = None
-                content_preview = None
-            
-            # Extract text chunks
-            chunks = extract_text_chunks(p)
-            for c in chunks:
-                c["doc_id"] = filename
-                c["doc_type"] = doc_type.value if doc_type else None
-                all_chunks.append(c)
-            
-            # Store document metadata
-            document_metadata_list.append(
-                DocumentMetadata(
-                    doc_id=filename,
-                    doc_type=doc_type,
-                    filename=filename,
-                    page_count=page_count
-                )
+class RescoreRequest(BaseModel):
+    analysis_timestamp: Optional[str] = None  # defaults to the latest analysis
+    framework_filter: Optional[str] = None
+    weights: Dict[str, float] = {}  # weight overrides keyed by control_id or category
+
+
+def _ingest(file_paths: List[str]):
+    """Parse, classify and chunk each document. Returns (chunks, document metadata)."""
+    all_chunks = []
+    document_metadata_list = []
+
+    # Read page counts and first-page previews, then classify the packet in one call
+    documents = []
+    for p in file_paths:
+        if not os.path.exists(p):
+            continue
+        try:
+            doc = fitz.open(p)
+            page_count = len(doc)
+            content_preview = doc[0].get_text("text")[:2000] if page_count > 0 else ""
+            doc.close()
+        except Exception:
+            page_count = None
+            content_preview = None
+        documents.append((p, os.path.basename(p), page_count, content_preview))
+    doc_types = classify_documents((filename, preview) for _, filename, _, preview in documents)
+
+    for (p, filename, page_count, _), doc_type in zip(documents, doc_types):
+        # Extract text chunks
+        chunks = extract_text_chunks(p)
+        for c in chunks:
+            c["doc_id"] = filename
+            c["doc_type"] = doc_type.value if doc_type else None
+            all_chunks.append(c)
+
+        # Store document metadata
+        document_metadata_list.append(
+            DocumentMetadata(
+                doc_id=filename,
+                doc_type=doc_type,
+                filename=filename,
+                page_count=page_count
             )
-        
+        )
+
+    # Collapse repeated boilerplate before it costs an embedding each
+    all_chunks, _dedup_stats = dedupe_chunks(all_chunks)
+    return all_chunks, document_metadata_list
+
+
+def _embed(checkpoint: RunCheckpoint, texts: List[str]) -> List[List[float]]:
+    """Embed in batches, persisting each batch so an interrupted run resumes where it stopped."""
+    embeddings = checkpoint.load_embeddings()
+    for start in range(len(embeddings), len(texts), EMBED_BATCH_SIZE):
+        batch = embed_texts(texts[start:start + EMBED_BATCH_SIZE])
+        checkpoint.append_embeddings(batch)
+        embeddings.extend(batch)
+    checkpoint.mark_stage("embed")
+    return embeddings
+
+
+def _upsert(vendor_id: str, all_chunks, embeddings) -> None:
+    points = []
+    for i, (c, emb) in enumerate(zip(all_chunks, embeddings)):
+        # Generate unique point ID using vendor_id, doc_id, and clause_hash
+        # This ensures no collisions across different uploads
+        unique_id_str = f"{vendor_id}:{c['doc_id']}:{c['clause_hash']}:{i}"
+        point_id = int(hashlib.md5(unique_id_str.encode()).hexdigest()[:15], 16)
+        payload = {
+            "vendor_id": vendor_id,
+            "doc_id": c["doc_id"],
+            "doc_type": c.get("doc_type"),  # Include document type
+            "page": c["page"],
+            "clause_hash": c["clause_hash"],
+            "preview": c["text"][:800],  # Increased from 400 to 800 for better context
+            "text": c["text"],  # full chunk for the evidence drill-down
+        }
+        if len(c.get("sources") or []) > 1:
+            # Other locations whose near-identical text was collapsed into this chunk
+            payload["sources"] = c["sources"]
+        points.append({
+            "id": point_id,
+            "vector": emb,
+            "payload": payload
+        })
+    qwrap.upsert_points(points)
+    # Search result pages are keyed by this stamp, so it must change only once the points are in
+    mark_ingested(vendor_id)
+
+
+def _run_analysis(vendor_id: str, request: AnalyzeRequest, checkpoint: RunCheckpoint) -> AnalysisReportUI:
+    """Run (or continue) the analysis pipeline, skipping every stage the checkpoint has finished."""
+    if checkpoint.stage_done("ingest"):
+        saved = checkpoint.load_chunks()
+        all_chunks = saved["chunks"]
+        document_metadata_list = [DocumentMetadata(**d) for d in saved["documents"]]
+    else:
+        with run_profile.stage("ingest"):
+            all_chunks, document_metadata_list = _ingest(request.file_paths)
         if not all_chunks:
             raise HTTPException(status_code=400, detail="No text extracted from PDFs")
-        
-        texts = [c["text"] for c in all_chunks]
-        embeddings = embed_texts(texts)
-        points = []
-        import hashlib
-        for i, (c, emb) in enumerate(zip(all_chunks, embeddings)):
-            # Generate unique point ID using vendor_id, doc_id, and clause_hash
-            # This ensures no collisions across different uploads
-            unique_id_str = f"{vendor_id}:{c['doc_id']}:{c['clause_hash']}:{i}"
-            point_id = int(hashlib.md5(unique_id_str.encode()).hexdigest()[:15], 16)
-            points.append({
-                "id": point_id,
-                "vector": emb,
-                "payload": {
-                    "vendor_id": vendor_id,
-                    "doc_id": c["doc_id"],
-                    "doc_type": c.get("doc_type"),  # Include document type
-                    "page": c["page"],
-                    "clause_hash": c["clause_hash"],
-                    "preview": c["text"][:800]  # Increased from 400 to 800 for better context
-                }
-            })
-        qwrap.upsert_points(points)
-        report = analyze_vendor_controls(
-            vendor_id, 
-            vendor_name, 
-            qwrap, 
-            document_metadata_list,
-            framework_filter=request.framework_filter
+        checkpoint.save_chunks(all_chunks, [d.dict() for d in document_metadata_list])
+    run_profile.count("documents", len(document_metadata_list))
+    run_profile.count("chunks", len(all_chunks))
+
+    with run_profile.stage("index"):
+        lexical_index = build_vendor_index(vendor_id, all_chunks)
+
+    if not checkpoint.stage_done("upsert"):
+        with run_profile.stage("embed"):
+            embeddings = _embed(checkpoint, [c["text"] for c in all_chunks])
+        with run_profile.stage("upsert"):
+            _upsert(vendor_id, all_chunks, embeddings)
+        checkpoint.mark_stage("upsert")
+
+    with run_profile.stage("classify"):
+        results, metadata = classify_vendor_controls(
+            vendor_id,
+            qwrap,
+            framework_filter=request.framework_filter,
+            lexical_index=lexical_index,
+            checkpoint=checkpoint,
         )
-        
-        # Save to history
-        try:
-            from .history import save_analysis_to_history
-            save_analysis_to_history(vendor_id, report.dict())
-        except Exception as e:
-            print(f"Warning: Failed to save to history: {e}")
-        
+    metadata["run_id"] = checkpoint.run_id
+    raw_results = [r.dict() for r in results]
+    report = build_ui_report(
+        vendor_id,
+        request.vendor_name,
+        raw_results,
+        document_metadata=document_metadata_list,
+        metadata=metadata,
+    )
+    checkpoint.save_report(report.dict(), complete=not metadata.get("incomplete_controls"))
+
+    # Save to history
+    try:
+        from .history import save_analysis_to_history
+        with run_profile.stage("history"):
+            profile = run_profile.current_profile()
+            save_analysis_to_history(vendor_id, report.dict(), raw_results,
+                                     profile=profile.to_dict() if profile is not None else None)
+    except Exception as e:
+        print(f"Warning: Failed to save to history: {e}")
+
+    if EVIDENCE_PRERENDER:
+        prerender_thumbnails(vendor_id, report.dict(), all_chunks)
+
+    return report
+
+
+def _execute(vendor_id: str, request: AnalyzeRequest, checkpoint: RunCheckpoint) -> AnalysisReportUI:
+    with _RUNS_GUARD:
+        if checkpoint.run_id in _RUNS_IN_PROGRESS:
+            raise HTTPException(status_code=409, detail=f"Run {checkpoint.run_id} is already in progress")
+        _RUNS_IN_PROGRESS.add(checkpoint.run_id)
+    try:
+        with ANALYSES_IN_PROGRESS.track_inprogress(), run_profile.start_profile(vendor_id, checkpoint.run_id):
+            report = _run_analysis(vendor_id, request, checkpoint)
+        ANALYSES_TOTAL.inc(status="completed")
         return report
+    except HTTPException as e:
+        ANALYSES_TOTAL.inc(status="failed")
+        checkpoint.set_status("failed", str(e.detail))
+        raise
     except RuntimeError as e:
-        raise HTTPException(status_code=503, detail=f"Qdrant unavailable: {str(e)}. Please ensure Qdrant is running on http://localhost:6333")
+        ANALYSES_TOTAL.inc(status="failed")
+        checkpoint.set_status("failed", str(e))
+        raise HTTPException(status_code=503, detail=f"Qdrant unavailable: {str(e)}. Please ensure Qdrant is running on http://localhost:6333 (run_id={checkpoint.run_id})")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
\ No newline at end of file
+        ANALYSES_TOTAL.inc(status="failed")
+        checkpoint.set_status("failed", str(e))
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)} (run_id={checkpoint.run_id})")
+    finally:
+        with _RUNS_GUARD:
+            _RUNS_IN_PROGRESS.discard(checkpoint.run_id)
+            in_progress = set(_RUNS_IN_PROGRESS)
+        try:
+            prune_runs(in_progress)
+        except Exception as e:
+            print(f"Warning: Failed to prune old analysis runs: {e}")
+
+
+@router.post("/analyze/{vendor_id}", response_model=AnalysisReportUI)
+def analyze(
+    vendor_id: str,
+    request: AnalyzeRequest,
+    response: Response,
+    profile: Optional[str] = None,
+    x_profile: Optional[str] = Header(None),
+    x_admin_token: Optional[str] = Header(None),
+):
+    """
+    file_paths: list of local PDF paths to ingest for this vendor
+
+    Identical submissions (same vendor, files, framework filter and control set)
+    share a run ID: a finished run returns its stored report, while an interrupted
+    or partial one (controls that failed on provider errors) continues from its last
+    checkpoint and classifies only what is missing. Set force_rerun to start over.
+
+    Args:
+        profile: "sample" or "cprofile" (or the X-Profile header) runs this call under a
+                 profiler; requires X-Admin-Token. The stored profile's ID is returned in
+                 the X-Profile-Id header, for download from /profiles/{profile_id}.
+    """
+    if not request.file_paths:
+        raise HTTPException(status_code=400, detail="Provide file_paths list in body")
+
+    mode = profile or x_profile
+    if not mode:
+        return _analyze(vendor_id, request)
+    require_admin(x_admin_token)
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown profile mode; use one of {sorted(PROFILE_MODES)}")
+    try:
+        with profile_request(mode, vendor_id) as info:
+            response.headers["X-Profile-Id"] = info["profile_id"]
+            return _analyze(vendor_id, request)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+def _analyze(vendor_id: str, request: AnalyzeRequest) -> AnalysisReportUI:
+    run_id = compute_run_id(vendor_id, request.file_paths, request.framework_filter, controls_fingerprint())
+    checkpoint = RunCheckpoint.open_or_create(run_id, {"vendor_id": vendor_id, **request.dict()})
+    if request.force_rerun:
+        checkpoint.reset()
+    elif checkpoint.state.get("status") == "complete":
+        stored = checkpoint.load_report()
+        if stored is not None:
+            # The vendor name is not part of the run ID; report the one just submitted
+            stored["vendor_name"] = request.vendor_name
+            return AnalysisReportUI(**stored)
+    # Later resumes of this run use the latest submission (e.g. a new vendor name)
+    checkpoint.state["request"] = {"vendor_id": vendor_id, **request.dict(), "force_rerun": False}
+    return _execute(vendor_id, request, checkpoint)
+
+
+@router.post("/analyze/{vendor_id}/resume/{run_id}", response_model=AnalysisReportUI)
+def resume_analysis(vendor_id: str, run_id: str):
+    """Continue an interrupted or partial analysis; only controls without a stored result are classified."""
+    checkpoint = RunCheckpoint.load(run_id)
+    if checkpoint is None or checkpoint.state.get("request", {}).get("vendor_id") != vendor_id:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if checkpoint.state.get("status") == "complete":
+        stored = checkpoint.load_report()
+        if stored is not None:
+            return AnalysisReportUI(**stored)
+    stored_request = {k: v for k, v in checkpoint.state["request"].items() if k != "vendor_id"}
+    stored_request["force_rerun"] = False
+    return _execute(vendor_id, AnalyzeRequest(**stored_request), checkpoint)
+
+
+@router.get("/analyze/{vendor_id}/runs/{run_id}")
+def get_run_status(vendor_id: str, run_id: str):
+    """Stage and per-control progress of an analysis run."""
+    checkpoint = RunCheckpoint.load(run_id)
+    if checkpoint is None or checkpoint.state.get("request", {}).get("vendor_id") != vendor_id:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return checkpoint.summary()
+
+
+@router.get("/analyze/{vendor_id}/profile")
+def get_analysis_profile(vendor_id: str, timestamp: Optional[str] = None):
+    """
+    Performance profile of a stored analysis: stage durations, per-control retrieval
+    and LLM latency, chunk counts, tokens and cache hit ratios.
+
+    Args:
+        vendor_id: Vendor identifier
+        timestamp: ISO timestamp of the analysis (latest if omitted)
+    """
+    from ..services.history_store import get_history_store
+
+    profile = get_history_store().get_profile(vendor_id, timestamp)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="No profile recorded for this analysis")
+    return profile
+
+
+@router.post("/analyze/{vendor_id}/rescore", response_model=AnalysisReportUI)
+def rescore_analysis(vendor_id: str, request: RescoreRequest = Body(default=RescoreRequest())):
+    """
+    Recompute the report of a stored analysis under another framework view or weighting.
+
+    Works from the persisted per-control results only: no parsing, embedding or LLM calls.
+    Only controls included in the original analysis can be shown.
+
+    Args:
+        vendor_id: Vendor identifier
+        request: timestamp of the analysis (latest if omitted), framework filter, weight overrides
+    """
+    from .history import load_analysis_results
+
+    t0 = time.perf_counter()
+    stored = load_analysis_results(vendor_id, request.analysis_timestamp)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="No stored control results for this analysis")
+    report, results = stored
+
+    rescored = build_ui_report(
+        vendor_id,
+        report.get("vendor_name"),
+        results,
+        document_metadata=[DocumentMetadata(**d) for d in report.get("documents_analyzed") or []],
+        framework_filter=request.framework_filter,
+        weights=request.weights,
+        analysis_timestamp=report.get("analysis_timestamp"),
+    )
+    rescored.metadata = {
+        "rescored_from": report.get("analysis_timestamp"),
+        "framework_filter": request.framework_filter,
+        "weight_overrides": len(request.weights),
+        "original_risk_score": report.get("overall_risk_score"),
+        "rescore_ms": round((time.perf_counter() - t0) * 1000, 2),
+    }
+    return rescored
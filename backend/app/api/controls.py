@@ -1,10 +1,10 @@
 """
 API endpoints for control management
 """
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from typing import List, Optional
 from pydantic import BaseModel
-from ..services.control_framework import CONTROLS
+from ..services.control_registry import get_registry
 
 router = APIRouter()
 
@@ -16,6 +16,9 @@ class ControlResponse(BaseModel):
     framework: str
     category: str
     weight: float
+    content_hash: Optional[str] = None
+    catalog: Optional[str] = None
+    catalog_version: Optional[str] = None
 
 
 @router.get("/controls", response_model=List[ControlResponse])
@@ -27,35 +30,32 @@ def get_controls(framework: Optional[str] = None, category: Optional[str] = None
         framework: Filter by framework (SOC2, ISO27001, NIST, GDPR, etc.)
         category: Filter by category (Data Protection, Access Control, etc.)
     """
-    controls = CONTROLS
-    
-    if framework:
-        controls = [c for c in controls if framework.upper() in c.get("framework", "").upper()]
-    
-    if category:
-        controls = [c for c in controls if c.get("category", "").lower() == category.lower()]
-    
-    return controls
+    return list(get_registry().snapshot().filter(framework, category))
 
 
 @router.get("/controls/frameworks")
 def get_frameworks():
     """Get list of all available frameworks."""
-    frameworks = set()
-    for c in CONTROLS:
-        framework_str = c.get("framework", "")
-        if framework_str:
-            frameworks.update([f.strip() for f in framework_str.split(",")])
-    return sorted(list(frameworks))
+    return list(get_registry().snapshot().frameworks)
 
 
 @router.get("/controls/categories")
 def get_categories():
     """Get list of all control categories."""
-    categories = set()
-    for c in CONTROLS:
-        cat = c.get("category")
-        if cat:
-            categories.add(cat)
-    return sorted(list(categories))
+    return list(get_registry().snapshot().categories)
+
+
+@router.get("/controls/catalogs")
+def get_catalogs():
+    """Loaded control catalogs with their versions and the registry fingerprint."""
+    snapshot = get_registry().snapshot()
+    return {"fingerprint": snapshot.fingerprint, "catalogs": list(snapshot.catalogs)}
+
 
+@router.get("/controls/{control_id}", response_model=ControlResponse)
+def get_control(control_id: str):
+    """Get a single control by ID."""
+    control = get_registry().snapshot().get(control_id)
+    if control is None:
+        raise HTTPException(status_code=404, detail="Control not found")
+    return control
@@ -0,0 +1,117 @@
+"""
+API endpoints for drilling into the evidence behind a control
+"""
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+from .analyze import qwrap  # same collection (and connection) the analysis wrote to
+from ..services.evidence import (
+    RENDER_SIZES,
+    chunk_text,
+    get_evidence_cache,
+    render_key,
+    render_page,
+    resolve_chunk,
+    source_path,
+)
+
+router = APIRouter()
+
+
+class EvidenceDetail(BaseModel):
+    vendor_id: str
+    doc_id: str
+    doc_type: Optional[str] = None
+    page: int
+    clause_hash: str
+    point_id: Optional[int] = None
+    text: str
+    sources: Optional[List[Dict[str, Any]]] = None  # other locations of near-identical text
+    page_image_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+
+
+def _resolve(vendor_id: str, doc: str, clause_hash: str, point_id: Optional[int]) -> Dict[str, Any]:
+    try:
+        payload = resolve_chunk(qwrap, vendor_id, doc, clause_hash, point_id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=f"Qdrant unavailable: {str(e)}")
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Evidence not found")
+    return payload
+
+
+@router.get("/evidence/{vendor_id}", response_model=EvidenceDetail)
+def get_evidence(request: Request, vendor_id: str, doc: str, page: int, clause_hash: str,
+                 point_id: Optional[int] = None):
+    """
+    Full text of a cited chunk, with links to its highlighted source page.
+
+    Args:
+        vendor_id: Vendor identifier
+        doc: Document ID (EvidenceSummary.doc)
+        page: Page number cited by the evidence
+        clause_hash: Chunk hash (EvidenceSummary.clause_hash)
+        point_id: Optional Qdrant point ID, resolved directly when given
+    """
+    payload = _resolve(vendor_id, doc, clause_hash, point_id)
+    detail = EvidenceDetail(
+        vendor_id=vendor_id,
+        doc_id=doc,
+        doc_type=payload.get("doc_type"),
+        page=page,
+        clause_hash=clause_hash,
+        point_id=payload.get("point_id"),
+        text=chunk_text(payload),
+        sources=payload.get("sources"),
+    )
+    if source_path(vendor_id, doc) is not None:
+        params = {"doc": doc, "page": page, "clause_hash": clause_hash}
+        if detail.point_id is not None:
+            params["point_id"] = detail.point_id
+        url = request.url_for("get_evidence_page", vendor_id=vendor_id)
+        detail.page_image_url = str(url.include_query_params(**params))
+        detail.thumbnail_url = str(url.include_query_params(**params, size="thumb"))
+    return detail
+
+
+@router.get("/evidence/{vendor_id}/page")
+def get_evidence_page(request: Request, vendor_id: str, doc: str, page: int,
+                      clause_hash: Optional[str] = None, point_id: Optional[int] = None,
+                      size: str = "page"):
+    """
+    PNG of a source page with the cited chunk highlighted.
+
+    Served from the render cache when present; the chunk is only looked up in
+    Qdrant to render a page for the first time.
+
+    Args:
+        vendor_id: Vendor identifier
+        doc: Document ID
+        page: Page number (1-based)
+        clause_hash: Chunk to highlight; omit for the plain page
+        point_id: Optional Qdrant point ID of the chunk
+        size: "page" or "thumb"
+    """
+    if size not in RENDER_SIZES:
+        raise HTTPException(status_code=400, detail=f"size must be one of {', '.join(RENDER_SIZES)}")
+    path = source_path(vendor_id, doc)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Source document not found")
+
+    # The key embeds the file's version, so a render is valid for as long as its key is
+    key = render_key(path, page, clause_hash, size)
+    etag = f'"{key[:-len(".png")]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=3600"}
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    rendered = get_evidence_cache().get(key)
+    if rendered is None:
+        text = chunk_text(_resolve(vendor_id, doc, clause_hash, point_id)) if clause_hash else None
+        try:
+            rendered = get_evidence_cache().put(key, render_page(path, page, text, size))
+        except IndexError:
+            raise HTTPException(status_code=404, detail="Page not found")
+    return FileResponse(rendered, media_type="image/png", headers=headers)
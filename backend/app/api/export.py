@@ -1,20 +1,112 @@
 """
 API endpoints for exporting analysis reports
 """
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse, StreamingResponse
-from typing import Optional
-import json
-import os
-from datetime import datetime
-from io import BytesIO
-import csv
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import hashlib
+import re
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from ..services import portfolio
+from ..services.history_store import as_of_bound, get_history_store
+from ..services.pdf_report import get_report_pdf
+from ..services.exporter import (
+    BULK_CSV_HEADER,
+    EXPORT_FORMAT_VERSION,
+    artifact_key,
+    bulk_csv_rows,
+    get_export_cache,
+    iter_artifact,
+    iter_csv,
+    iter_ndjson,
+    iter_zip,
+    render,
+    tee_to_cache,
+)
 
 router = APIRouter()
 
+_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "json": "application/json",
+    "pdf": "application/pdf",
+}
+
+
+def _not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since (the former wins when both are sent)."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+            if since.tzinfo is None:
+                # A "-0000" zone parses naive; HTTP dates are always GMT
+                since = since.replace(tzinfo=timezone.utc)
+            return last_modified.replace(microsecond=0) <= since
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _export(request: Request, vendor_id: str, timestamp: Optional[str], fmt: str) -> Response:
+    """Serve one analysis in `fmt`: 304 if the client copy is current, else from the artifact
+    cache, else rendered as a stream that fills the cache on the way out."""
+    store = get_history_store()
+    version = store.get_version(vendor_id, timestamp)
+    if version is None or not version["has_report"]:
+        raise HTTPException(status_code=404, detail="Analysis not found" if timestamp else "No analysis history found")
+
+    tag = f"{version['id']}:{version['created_at']}:{fmt}:{EXPORT_FORMAT_VERSION}"
+    etag = f'"{hashlib.sha1(tag.encode("utf-8")).hexdigest()[:20]}"'
+    last_modified = datetime.fromisoformat(version["created_at"]).replace(tzinfo=timezone.utc)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        # Clients may keep the file but must revalidate, which is a cheap 304
+        "Cache-Control": "private, no-cache",
+    }
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    headers["Content-Disposition"] = f"attachment; filename=vendorguard_{vendor_id}_{timestamp or 'latest'}.{fmt}"
+    if fmt == "pdf":
+        return _export_pdf(store, version["id"], headers)
+    key = artifact_key(version["id"], fmt)
+    cached = get_export_cache().get(key)
+    if cached is not None:
+        return FileResponse(cached, media_type=_MEDIA_TYPES[fmt], headers=headers)
+
+    report = store.get_report_by_id(version["id"])
+    if report is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return StreamingResponse(tee_to_cache(render(report, fmt), key), media_type=_MEDIA_TYPES[fmt], headers=headers)
+
+
+def _export_pdf(store, row_id: int, headers: Dict[str, str]) -> Response:
+    # PDFs are cached by report content rather than by analysis, so the report is always read
+    report = store.get_report_by_id(row_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    try:
+        path = get_report_pdf(report)
+    except FutureTimeoutError:
+        raise HTTPException(status_code=503, detail="PDF is still rendering, retry shortly",
+                            headers={"Retry-After": "5"})
+    except Exception as e:
+        print(f"PDF render failed for analysis {row_id}: {e}")
+        raise HTTPException(status_code=500, detail="PDF rendering failed")
+    return FileResponse(path, media_type=_MEDIA_TYPES["pdf"], headers=headers)
+
 
 @router.get("/export/{vendor_id}/json")
-def export_json(vendor_id: str, timestamp: Optional[str] = None):
+def export_json(request: Request, vendor_id: str, timestamp: Optional[str] = None):
     """
     Export analysis report as JSON.
     
@@ -22,46 +114,11 @@ def export_json(vendor_id: str, timestamp: Optional[str] = None):
         vendor_id: Vendor identifier
         timestamp: Optional timestamp to export specific analysis
     """
-    from ..api.history import HISTORY_DIR
-    
-    if timestamp:
-        report_file = os.path.join(HISTORY_DIR, f"{vendor_id}_{timestamp.replace(':', '-')}.json")
-        if not os.path.exists(report_file):
-            raise HTTPException(status_code=404, detail="Analysis not found")
-        
-        return FileResponse(
-            report_file,
-            media_type="application/json",
-            filename=f"vendorguard_{vendor_id}_{timestamp}.json"
-        )
-    else:
-        # Get latest analysis
-        history_file = os.path.join(HISTORY_DIR, f"{vendor_id}_history.json")
-        if not os.path.exists(history_file):
-            raise HTTPException(status_code=404, detail="No analysis history found")
-        
-        with open(history_file, "r") as f:
-            history = json.load(f)
-        
-        if not history:
-            raise HTTPException(status_code=404, detail="No analysis history found")
-        
-        latest = sorted(history, key=lambda x: x.get("analysis_timestamp", ""), reverse=True)[0]
-        timestamp = latest.get("analysis_timestamp", "").replace(":", "-")
-        report_file = os.path.join(HISTORY_DIR, f"{vendor_id}_{timestamp}.json")
-        
-        if not os.path.exists(report_file):
-            raise HTTPException(status_code=404, detail="Analysis file not found")
-        
-        return FileResponse(
-            report_file,
-            media_type="application/json",
-            filename=f"vendorguard_{vendor_id}_latest.json"
-        )
+    return _export(request, vendor_id, timestamp, "json")
 
 
 @router.get("/export/{vendor_id}/csv")
-def export_csv(vendor_id: str, timestamp: Optional[str] = None):
+def export_csv(request: Request, vendor_id: str, timestamp: Optional[str] = None):
     """
     Export analysis report as CSV.
     
@@ -69,77 +126,147 @@ def export_csv(vendor_id: str, timestamp: Optional[str] = None):
         vendor_id: Vendor identifier
         timestamp: Optional timestamp to export specific analysis
     """
-    from ..api.history import HISTORY_DIR
-    
-    if timestamp:
-        report_file = os.path.join(HISTORY_DIR, f"{vendor_id}_{timestamp.replace(':', '-')}.json")
+    return _export(request, vendor_id, timestamp, "csv")
+
+
+class BulkExportRequest(BaseModel):
+    vendor_ids: Optional[List[str]] = None  # explicit vendor set; otherwise the portfolio filter below
+    risk_level: Optional[str] = None
+    min_score: Optional[float] = None
+    max_score: Optional[float] = None
+    search: Optional[str] = None
+    control_id: Optional[str] = None
+    control_status: Optional[str] = None
+    control_risk_level: Optional[str] = None
+    as_of: Optional[str] = None  # each vendor's latest analysis at or before this timestamp (a date means end of day)
+    format: str = "zip"  # zip, csv or ndjson
+
+
+_BULK_MEDIA_TYPES = {
+    "zip": "application/zip",
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+_BULK_PAGE_SIZE = 500
+_UNSAFE_NAME_RE = re.compile(r"[^A-Za-z0-9._-]")
+
+
+def _bulk_vendor_ids(request: BulkExportRequest) -> Iterator[str]:
+    if request.vendor_ids is not None:
+        yield from dict.fromkeys(request.vendor_ids)
+        return
+    # Page through the portfolio rollup; filters apply to each vendor's latest analysis
+    offset = 0
+    while True:
+        page = portfolio.list_vendors(
+            get_history_store().connection(),
+            risk_level=request.risk_level,
+            min_score=request.min_score,
+            max_score=request.max_score,
+            search=request.search,
+            control_id=request.control_id,
+            control_status=request.control_status,
+            control_risk_level=request.control_risk_level,
+            sort="vendor_id",
+            order="asc",
+            limit=_BULK_PAGE_SIZE,
+            offset=offset,
+        )
+        ids = [item["vendor_id"] for item in page["items"]]
+        yield from ids
+        if len(ids) < _BULK_PAGE_SIZE:
+            return
+        offset += _BULK_PAGE_SIZE
+
+
+def _bulk_versions(request: BulkExportRequest) -> Iterator[Dict[str, Any]]:
+    # Every lookup goes through the store per call: a streaming response may resume
+    # the generator on a different threadpool thread, and connections are per thread
+    store = get_history_store()
+    for vendor_id in _bulk_vendor_ids(request):
+        version = store.get_version(vendor_id, as_of=request.as_of)
+        if version is not None and version["has_report"]:
+            yield version
+
+
+def _bulk_reports(request: BulkExportRequest) -> Iterator[Dict[str, Any]]:
+    store = get_history_store()
+    for version in _bulk_versions(request):
+        report = store.get_report_by_id(version["id"])
+        if report is not None:
+            report.setdefault("vendor_id", version["vendor_id"])
+            yield report
+
+
+def _zip_entries(request: BulkExportRequest) -> Iterator[Tuple[str, Iterator[bytes]]]:
+    # One pass over the versions (small rows, no reports) so the manifest lists exactly
+    # the entries that follow, even if an analysis lands while the archive streams
+    versions = list(_bulk_versions(request))
+    manifest_rows = ([v["vendor_id"], v["vendor_name"] or "", v["analysis_timestamp"], v["risk_score"]] for v in versions)
+
+    yield "manifest.csv", iter_csv(manifest_rows, ["Vendor ID", "Vendor Name", "Analysis Timestamp", "Overall Risk Score"])
+
+    store = get_history_store()
+    for version in versions:
+        loaded: Dict[int, Dict[str, Any]] = {}
+
+        def load(row_id: int = version["id"], loaded: Dict[int, Dict[str, Any]] = loaded) -> Dict[str, Any]:
+            if row_id not in loaded:
+                loaded[row_id] = store.get_report_by_id(row_id) or {}
+            return loaded[row_id]
+
+        base = f"{_UNSAFE_NAME_RE.sub('_', version['vendor_id'])}/{version['analysis_timestamp'].replace(':', '-')}"
+        yield f"{base}.json", iter_artifact(version["id"], "json", load)
+        yield f"{base}.csv", iter_artifact(version["id"], "csv", load)
+
+
+@router.post("/export/bulk")
+def export_bulk(request: BulkExportRequest):
+    """
+    Export the latest (or as-of) reports of many vendors in one streamed download.
+
+    Vendors come from vendor_ids, or from the same filters as /portfolio/vendors.
+    `zip` holds a manifest plus JSON and CSV per vendor; `csv` is one table of every
+    control row prefixed with vendor columns; `ndjson` is one report per line.
+    Reports are read and written one at a time, so memory stays flat however many
+    vendors are included.
+    """
+    if request.format not in _BULK_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(_BULK_MEDIA_TYPES)}")
+    if request.as_of is not None:
+        try:
+            as_of_bound(request.as_of)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="as_of must be an ISO date or timestamp")
+
+    if request.format == "zip":
+        body = iter_zip(_zip_entries(request))
+    elif request.format == "csv":
+        body = iter_csv(
+            (row for report in _bulk_reports(request) for row in bulk_csv_rows(report)),
+            BULK_CSV_HEADER,
+        )
     else:
-        # Get latest
-        history_file = os.path.join(HISTORY_DIR, f"{vendor_id}_history.json")
-        if not os.path.exists(history_file):
-            raise HTTPException(status_code=404, detail="No analysis history found")
-        
-        with open(history_file, "r") as f:
-            history = json.load(f)
-        
-        if not history:
-            raise HTTPException(status_code=404, detail="No analysis history found")
-        
-        latest = sorted(history, key=lambda x: x.get("analysis_timestamp", ""), reverse=True)[0]
-        timestamp = latest.get("analysis_timestamp", "").replace(":", "-")
-        report_file = os.path.join(HISTORY_DIR, f"{vendor_id}_{timestamp}.json")
-    
-    if not os.path.exists(report_file):
-        raise HTTPException(status_code=404, detail="Analysis not found")
-    
-    with open(report_file, "r") as f:
-        report = json.load(f)
-    
-    # Create CSV
-    output = BytesIO()
-    writer = csv.writer(output)
-    
-    # Header
-    writer.writerow([
-        "Control ID", "Control Name", "Frameworks", "Status",
-        "Confidence (%)", "Risk Level"
-    ])
-    
-    # Data rows
-    for control in report.get("controls", []):
-        frameworks = control.get("frameworks", [])
-        if isinstance(frameworks, list):
-            frameworks_str = ",".join(frameworks)
-        else:
-            frameworks_str = str(frameworks or "")
-        writer.writerow([
-            control.get("control_id", ""),
-            control.get("control_name", ""),
-            frameworks_str,
-            control.get("status", ""),
-            control.get("confidence", 0),
-            control.get("risk_level", ""),
-        ])
-    
-    output.seek(0)
-    
+        body = iter_ndjson(_bulk_reports(request))
+
+    stamp = (request.as_of or datetime.utcnow().isoformat())[:10]
     return StreamingResponse(
-        BytesIO(output.read()),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename=vendorguard_{vendor_id}_{timestamp or 'latest'}.csv"}
+        body,
+        media_type=_BULK_MEDIA_TYPES[request.format],
+        headers={"Content-Disposition": f"attachment; filename=vendorguard_bulk_{stamp}.{request.format}"},
     )
 
 
 @router.get("/export/{vendor_id}/pdf")
-def export_pdf(vendor_id: str, timestamp: Optional[str] = None):
+def export_pdf(request: Request, vendor_id: str, timestamp: Optional[str] = None):
     """
-    Export analysis report as PDF.
-    Note: This is a placeholder - in production, use a library like reportlab or weasyprint
-    """
-    # For now, return JSON with instructions
-    # In production, generate actual PDF using reportlab or similar
-    raise HTTPException(
-        status_code=501,
-        detail="PDF export not yet implemented. Use JSON or CSV export instead."
-    )
+    Export analysis report as PDF (executive summary, control table and evidence).
 
+    Rendered in a background worker pool on first request and served from the
+    export cache afterwards.
+
+    Args:
+        vendor_id: Vendor identifier
+        timestamp: Optional timestamp to export specific analysis
+    """
+    return _export(request, vendor_id, timestamp, "pdf")
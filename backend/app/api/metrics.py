@@ -0,0 +1,14 @@
+"""
+Prometheus scrape endpoint
+"""
+from fastapi import APIRouter
+from fastapi.responses import Response
+from ..services.metrics import CONTENT_TYPE, render_metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """Process metrics in the Prometheus text exposition format."""
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
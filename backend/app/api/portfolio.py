@@ -0,0 +1,91 @@
+"""
+API endpoints for portfolio-level (cross-vendor) risk views
+"""
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from ..services import portfolio
+from ..services.history_store import get_history_store
+
+router = APIRouter()
+
+
+@router.get("/portfolio/summary")
+def get_portfolio_summary():
+    """Vendor count, average latest risk score and vendors per risk level."""
+    return portfolio.summary(get_history_store().connection())
+
+
+@router.get("/portfolio/vendors")
+def get_portfolio_vendors(
+    risk_level: Optional[str] = None,
+    min_score: Optional[float] = None,
+    max_score: Optional[float] = None,
+    search: Optional[str] = None,
+    control_id: Optional[str] = None,
+    control_status: Optional[str] = None,
+    control_risk_level: Optional[str] = None,
+    sort: str = "risk_score",
+    order: str = "desc",
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    """
+    Vendors by their latest analysis.
+
+    Args:
+        risk_level: High, Medium or Low (overall score band)
+        min_score / max_score: Overall risk score range
+        search: Substring of vendor ID or name
+        control_id: Only vendors assessed on this control; narrow further with
+                    control_status (Covered/Partial/Missing) or control_risk_level
+        sort: One of risk_score, vendor_name, vendor_id, analysis_timestamp,
+              covered, partial, missing, analysis_count
+        order: asc or desc
+    """
+    if sort not in portfolio.VENDOR_SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(portfolio.VENDOR_SORT_COLUMNS)}")
+    return portfolio.list_vendors(
+        get_history_store().connection(),
+        risk_level=risk_level,
+        min_score=min_score,
+        max_score=max_score,
+        search=search,
+        control_id=control_id,
+        control_status=control_status,
+        control_risk_level=control_risk_level,
+        sort=sort,
+        order=order,
+        limit=limit,
+        offset=offset,
+    )
+
+
+@router.get("/portfolio/controls")
+def get_portfolio_controls(
+    sort: str = "missing",
+    order: str = "desc",
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+):
+    """Covered/Partial/Missing vendor counts per control, from each vendor's latest analysis."""
+    return portfolio.control_status(get_history_store().connection(), sort=sort, order=order, limit=limit, offset=offset)
+
+
+@router.get("/portfolio/frameworks")
+def get_portfolio_frameworks(framework: Optional[str] = None):
+    """Control coverage per framework across the portfolio."""
+    return portfolio.framework_coverage(get_history_store().connection(), framework)
+
+
+@router.get("/portfolio/trend")
+def get_portfolio_trend(bucket: str = "month", start: Optional[str] = None, end: Optional[str] = None):
+    """
+    Average risk score of all analyses per time bucket.
+
+    Args:
+        bucket: day, week, month or quarter
+        start / end: Optional ISO dates bounding the range (inclusive)
+    """
+    if bucket not in portfolio.TREND_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(portfolio.TREND_BUCKETS)}")
+    return portfolio.risk_trend(get_history_store().connection(), bucket=bucket, start=start, end=end)
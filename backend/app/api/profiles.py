@@ -0,0 +1,45 @@
+"""
+Admin endpoints for on-demand request profiles
+"""
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import FileResponse
+
+from ..config import ADMIN_TOKEN
+from ..services.profiler import list_profiles, profile_path
+
+router = APIRouter()
+
+
+def require_admin(token: Optional[str]) -> None:
+    """Reject the request unless token matches ADMIN_TOKEN (always, while no token is configured)."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)")
+    if not token or not hmac.compare_digest(token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.get("/profiles")
+def get_profiles(x_admin_token: Optional[str] = Header(None)):
+    """Stored request profiles, newest first."""
+    require_admin(x_admin_token)
+    return list_profiles()
+
+
+@router.get("/profiles/{profile_id}")
+def download_profile(profile_id: str, x_admin_token: Optional[str] = Header(None)):
+    """
+    Download a stored profile.
+
+    Args:
+        profile_id: ID returned in the X-Profile-Id header of the profiled request;
+                    .collapsed files are flamegraph input, .pstats files load with pstats
+    """
+    require_admin(x_admin_token)
+    path = profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "text/plain; charset=utf-8" if profile_id.endswith(".collapsed") else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=profile_id)
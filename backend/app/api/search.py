@@ -0,0 +1,64 @@
+"""
+API endpoints for free-text search over a vendor's documents
+"""
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from typing import List, Optional
+from .analyze import qwrap  # same collection (and connection) the analysis wrote to
+from ..services.search import normalize_query, search_chunks
+from ..config import SEARCH_MAX_LIMIT, SEARCH_MIN_SCORE
+
+router = APIRouter()
+
+
+class SearchHit(BaseModel):
+    doc_id: Optional[str] = None
+    doc_type: Optional[str] = None
+    page: Optional[int] = None
+    clause_hash: Optional[str] = None
+    point_id: Optional[int] = None
+    score: float
+    snippet: str
+
+
+class SearchResponse(BaseModel):
+    vendor_id: str
+    query: str
+    limit: int
+    offset: int
+    results: List[SearchHit]
+    cached: bool
+    took_ms: float
+
+
+@router.get("/search/{vendor_id}", response_model=SearchResponse)
+def search_vendor_documents(
+    vendor_id: str,
+    q: str,
+    doc_type: Optional[str] = None,
+    doc_id: Optional[str] = None,
+    limit: int = 10,
+    offset: int = 0,
+    min_score: float = SEARCH_MIN_SCORE,
+):
+    """
+    Semantic search over a vendor's indexed document chunks.
+
+    Args:
+        vendor_id: Vendor identifier
+        q: Free-text query
+        doc_type: Optional document type filter (contract, soc2, ...)
+        doc_id: Optional document filter
+        limit: Results per page (max SEARCH_MAX_LIMIT)
+        offset: Number of results to skip
+        min_score: Minimum cosine similarity
+    """
+    if not normalize_query(q):
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+    if not 1 <= limit <= SEARCH_MAX_LIMIT or offset < 0:
+        raise HTTPException(status_code=400, detail=f"limit must be 1-{SEARCH_MAX_LIMIT} and offset >= 0")
+    try:
+        return search_chunks(qwrap, vendor_id, q, doc_type=doc_type, doc_id=doc_id,
+                             limit=limit, offset=offset, min_score=min_score)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=f"Qdrant unavailable: {str(e)}")
@@ -23,19 +23,16 @@ async def upload_pdf(vendor_id: str, file: UploadFile = File(...)):
         with open(path, "wb") as f:
             f.write(content)
         
-        # Classify document type
-        doc_type = classify_document_type(file.filename)
-        
-        # Try to get content preview for better classification
+        # Classify once, from the filename and (when readable) the first page
+        content_preview = None
         try:
             doc = fitz.open(path)
             if len(doc) > 0:
-                first_page = doc[0]
-                content_preview = first_page.get_text("text")[:2000]
-                doc_type = classify_document_type(file.filename, content_preview)
+                content_preview = doc[0].get_text("text")[:2000]
             doc.close()
         except Exception:
-            pass  # If classification fails, use filename-based classification
+            pass  # If the PDF can't be read, classify by filename alone
+        doc_type = classify_document_type(file.filename, content_preview)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
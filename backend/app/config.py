@@ -12,6 +12,42 @@ LLM_PROVIDER = "gemini"
 GEMINI_EMBEDDING_MODEL = os.getenv("GEMINI_EMBEDDING_MODEL", "gemini-embedding-001")
 GEMINI_LLM_MODEL = os.getenv("GEMINI_LLM_MODEL", "gemini-2.5-flash")
 
+# Classification prompt sizing: evidence is trimmed to EVIDENCE_TOKEN_BUDGET (estimated tokens);
+# the answer is a small JSON object, so the output cap only needs headroom for the rationale.
+# Thinking tokens count against the output cap on Gemini 2.5 models and are budgeted separately.
+EVIDENCE_TOKEN_BUDGET = int(os.getenv("EVIDENCE_TOKEN_BUDGET", "1500"))
+LLM_MAX_OUTPUT_TOKENS = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "512"))
+# 0 disables thinking; models that require it (gemini-2.5-pro) get their minimum budget instead
+LLM_THINKING_BUDGET = int(os.getenv("LLM_THINKING_BUDGET", "0"))
+# Model cascade: a cheaper triage model classifies first; Partial, low-confidence results and
+# results that contradict the retrieval scores are re-run on GEMINI_LLM_MODEL
+LLM_CASCADE_ENABLED = os.getenv("LLM_CASCADE_ENABLED", "false").lower() in ("1", "true", "yes")
+GEMINI_TRIAGE_MODEL = os.getenv("GEMINI_TRIAGE_MODEL", "gemini-2.5-flash-lite")
+CASCADE_CONFIDENCE_THRESHOLD = float(os.getenv("CASCADE_CONFIDENCE_THRESHOLD", "0.75"))
+# "Covered" with best similarity below LOW, or "Missing" with best similarity above HIGH, is suspect
+CASCADE_EVIDENCE_LOW = float(os.getenv("CASCADE_EVIDENCE_LOW", "0.5"))
+CASCADE_EVIDENCE_HIGH = float(os.getenv("CASCADE_EVIDENCE_HIGH", "0.75"))
+# Tail latency: every LLM call has a hard deadline; if it has not answered after the observed
+# LLM_HEDGE_PERCENTILE latency (LLM_HEDGE_INITIAL_DELAY_S until enough samples exist, never less
+# than LLM_HEDGE_MIN_DELAY_S) one duplicate request is sent and the first answer wins.
+LLM_CALL_DEADLINE_S = float(os.getenv("LLM_CALL_DEADLINE_S", "60"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+LLM_HEDGE_INITIAL_DELAY_S = float(os.getenv("LLM_HEDGE_INITIAL_DELAY_S", "10"))
+LLM_HEDGE_MIN_DELAY_S = float(os.getenv("LLM_HEDGE_MIN_DELAY_S", "1"))
+LLM_MAX_WORKERS = int(os.getenv("LLM_MAX_WORKERS", "16"))
+# Circuit breaker: open when LLM_BREAKER_ERROR_RATE of the last LLM_BREAKER_WINDOW calls failed
+# (after at least LLM_BREAKER_MIN_CALLS), then probe again after LLM_BREAKER_COOLDOWN_S
+LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+LLM_BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", "20"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+LLM_BREAKER_COOLDOWN_S = float(os.getenv("LLM_BREAKER_COOLDOWN_S", "30"))
+# Controls rejected by an open breaker are retried at the end of the run only if it half-opens within
+# this wait (held on the request thread, so capped at 5s); otherwise they are left for a resume
+LLM_DEFERRED_MAX_WAIT_S = min(float(os.getenv("LLM_DEFERRED_MAX_WAIT_S", "2")), 5.0)
+# Extra attempts, each with double the output cap, when a structured response is truncated (MAX_TOKENS)
+LLM_PARSE_RETRIES = int(os.getenv("LLM_PARSE_RETRIES", "1"))
+
 
 def _default_embedding_dim():
 	"""Pick a sane default dimension based on provider/model to avoid Qdrant size mismatches."""
@@ -27,6 +63,87 @@ EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", str(_default_embedding_dim())))
 # Keep history under the uploads volume so it persists with the existing mount
 HISTORY_DIR = os.path.join(UPLOAD_DIR, "history")
 os.makedirs(HISTORY_DIR, exist_ok=True)
+# SQLite (WAL) database holding every saved analysis; legacy JSON history is imported on first use
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", os.path.join(HISTORY_DIR, "history.db"))
+
+# Rendered exports are cached per (analysis, format) under EXPORT_CACHE_DIR, up to EXPORT_CACHE_MAX_MB
+EXPORT_CACHE_DIR = os.path.join(UPLOAD_DIR, "exports")
+EXPORT_CACHE_MAX_MB = int(os.getenv("EXPORT_CACHE_MAX_MB", "512"))
+# PDF reports are laid out in a pool of PDF_RENDER_WORKERS processes; a request waits up to
+# PDF_RENDER_TIMEOUT_S for its render before giving up (the result is still cached when it finishes)
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", "2"))
+PDF_RENDER_TIMEOUT_S = float(os.getenv("PDF_RENDER_TIMEOUT_S", "120"))
+
+# Evidence page renders (PNG, clause highlighted) are cached under EVIDENCE_CACHE_DIR up to
+# EVIDENCE_CACHE_MAX_MB; thumbnails of each control's top evidence are rendered after every analysis
+EVIDENCE_CACHE_DIR = os.path.join(UPLOAD_DIR, "evidence")
+EVIDENCE_CACHE_MAX_MB = int(os.getenv("EVIDENCE_CACHE_MAX_MB", "256"))
+EVIDENCE_PAGE_DPI = int(os.getenv("EVIDENCE_PAGE_DPI", "110"))
+EVIDENCE_THUMB_DPI = int(os.getenv("EVIDENCE_THUMB_DPI", "36"))
+EVIDENCE_PRERENDER = os.getenv("EVIDENCE_PRERENDER", "true").lower() in ("1", "true", "yes")
+
+# On-demand profiling of single /analyze calls (X-Profile header or ?profile=) requires the
+# X-Admin-Token header to match ADMIN_TOKEN; profiling is disabled while ADMIN_TOKEN is unset.
+# Output (collapsed stacks or pstats) is kept under PROFILE_DIR, newest PROFILE_KEEP files only.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_DIR = os.path.join(UPLOAD_DIR, "profiles")
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+
+# Per-vendor lexical (BM25) indexes live alongside history on the uploads volume
+INDEX_DIR = os.path.join(UPLOAD_DIR, "index")
+os.makedirs(INDEX_DIR, exist_ok=True)
+
+# Chunking: sentences are packed into chunks of up to CHUNK_MAX_TOKENS (estimated),
+# with CHUNK_OVERLAP_TOKENS of trailing context repeated in the next chunk
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+
+# Analysis runs are checkpointed per stage and per control under RUNS_DIR so they can resume;
+# embeddings are computed and persisted EMBED_BATCH_SIZE texts at a time
+RUNS_DIR = os.path.join(UPLOAD_DIR, "runs")
+os.makedirs(RUNS_DIR, exist_ok=True)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+# Completed runs beyond the newest RUNS_KEEP are deleted, as are unfinished (resumable) runs
+# untouched for RUNS_MAX_AGE_DAYS
+RUNS_KEEP = int(os.getenv("RUNS_KEEP", "200"))
+RUNS_MAX_AGE_DAYS = float(os.getenv("RUNS_MAX_AGE_DAYS", "7"))
+
+# Control catalogs (JSON, or YAML when PyYAML is installed) are loaded from CONTROL_CATALOG_DIRS
+# (os.pathsep-separated; later directories override earlier ones by control_id) and re-checked for
+# changes at most every CONTROL_CATALOG_RELOAD_S seconds. Per-control query embeddings are cached.
+CONTROL_CATALOG_DIRS = [
+	d for d in os.getenv(
+		"CONTROL_CATALOG_DIRS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalogs")
+	).split(os.pathsep) if d
+]
+CONTROL_CATALOG_RELOAD_S = float(os.getenv("CONTROL_CATALOG_RELOAD_S", "2"))
+CONTROL_EMBED_CACHE_SIZE = int(os.getenv("CONTROL_EMBED_CACHE_SIZE", "1024"))
+
+# Hybrid retrieval: dense hits below RETRIEVAL_SCORE_THRESHOLD are never returned by Qdrant.
+# A control is marked Missing without an LLM call when the best dense score is below
+# ZERO_EVIDENCE_DENSE_SCORE and no chunk reaches LEXICAL_SCORE_THRESHOLD under BM25.
+RETRIEVAL_SCORE_THRESHOLD = float(os.getenv("RETRIEVAL_SCORE_THRESHOLD", "0.2"))
+LEXICAL_SCORE_THRESHOLD = float(os.getenv("LEXICAL_SCORE_THRESHOLD", "2.0"))
+ZERO_EVIDENCE_DENSE_SCORE = float(os.getenv("ZERO_EVIDENCE_DENSE_SCORE", "0.55"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Adaptive retrieval depth: the first pass fetches RETRIEVAL_INITIAL_K hits and drops everything
+# after a drop of RETRIEVAL_SCORE_GAP (or more than that below a RETRIEVAL_HIGH_SCORE match).
+# One wider pass of RETRIEVAL_MAX_K hits runs only if the LLM answers Partial or below
+# RETRIEVAL_WIDEN_CONFIDENCE.
+RETRIEVAL_INITIAL_K = int(os.getenv("RETRIEVAL_INITIAL_K", "6"))
+RETRIEVAL_MAX_K = int(os.getenv("RETRIEVAL_MAX_K", "20"))
+RETRIEVAL_HIGH_SCORE = float(os.getenv("RETRIEVAL_HIGH_SCORE", "0.8"))
+RETRIEVAL_SCORE_GAP = float(os.getenv("RETRIEVAL_SCORE_GAP", "0.1"))
+RETRIEVAL_WIDEN_CONFIDENCE = float(os.getenv("RETRIEVAL_WIDEN_CONFIDENCE", "0.6"))
+
+# Ad-hoc search (/search/{vendor_id}): query embeddings and result pages are kept in LRU caches;
+# cached pages are dropped whenever the vendor's documents are re-ingested
+SEARCH_MIN_SCORE = float(os.getenv("SEARCH_MIN_SCORE", "0.3"))
+SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", "50"))
+SEARCH_EMBED_CACHE_SIZE = int(os.getenv("SEARCH_EMBED_CACHE_SIZE", "512"))
+SEARCH_RESULT_CACHE_SIZE = int(os.getenv("SEARCH_RESULT_CACHE_SIZE", "256"))
 
 # Allow overriding CORS origins via env (comma separated)
 RAW_ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000")
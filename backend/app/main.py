@@ -1,7 +1,7 @@
 import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .api import upload, analyze, controls, history, export
+from .api import upload, analyze, controls, history, export, portfolio, evidence, search, metrics, profiles
 from .config import ALLOWED_ORIGINS
 
 app = FastAPI(title="VendorGuard - Procurement & Vendor Risk Analyzer")
@@ -19,4 +19,11 @@ app.include_router(upload.router, prefix="/api")
 app.include_router(analyze.router, prefix="/api")
 app.include_router(controls.router, prefix="/api")
 app.include_router(history.router, prefix="/api")
-app.include_router(export.router, prefix="/api")
\ No newline at end of file
+app.include_router(export.router, prefix="/api")
+app.include_router(portfolio.router, prefix="/api")
+app.include_router(evidence.router, prefix="/api")
+app.include_router(search.router, prefix="/api")
+app.include_router(profiles.router, prefix="/api")
+
+# Scraped by Prometheus at the conventional path, outside the /api prefix
+app.include_router(metrics.router)
@@ -1,6 +1,6 @@
 from __future__ import annotations
-from pydantic import BaseModel
-from typing import List, Optional, Literal
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional, Literal
 from enum import Enum
 
 
@@ -28,6 +28,8 @@ class EvidenceItem(BaseModel):
     snippet: str
     clause_hash: str
     similarity_score: Optional[float] = None
+    point_id: Optional[int] = None  # Qdrant point of the chunk; None for lexical-only hits
+    sources: Optional[List[Dict[str, Any]]] = None  # every location of near-identical text (doc_id, page, clause_hash)
 
 
 class ControlResult(BaseModel):
@@ -39,12 +41,31 @@ class ControlResult(BaseModel):
     rationale: str
     followup_questions: List[str]
     framework: Optional[str] = None  # e.g., "SOC2", "ISO27001", "Custom"
+    description: Optional[str] = None
+    category: Optional[str] = None
+    weight: Optional[float] = None  # catalog weight at analysis time; re-scoring may override it
+
+
+class ControlClassification(BaseModel):
+    """LLM output schema for one control; the judgement fields of ControlResult.
+
+    Passed to the provider as the response schema, so fields are all required
+    and carry no defaults.
+    """
+    control_id: str
+    classification: Literal["Covered", "Partial", "Missing"]
+    confidence: float = Field(ge=0.0, le=1.0)
+    rationale: str
+    followup_questions: List[str]
 
 
 class EvidenceSummary(BaseModel):
     doc: str
     page: int
     excerpt: str
+    clause_hash: Optional[str] = None  # with doc and page, identifies the chunk for /evidence
+    point_id: Optional[int] = None
+    sources: Optional[List[Dict[str, Any]]] = None  # every location of near-identical text
 
 
 class ControlSummary(BaseModel):
@@ -67,6 +88,7 @@ class AnalysisReportUI(BaseModel):
     controls: List[ControlSummary]
     documents_analyzed: List[DocumentMetadata] = []
     analysis_timestamp: Optional[str] = None
+    metadata: Dict[str, Any] = {}  # run statistics (LLM usage, etc.), not shown in the UI
 
 
 class DocumentMetadata(BaseModel):
@@ -1,8 +1,33 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
-from ..models.schemas import AnalysisReportUI, ControlSummary, EvidenceSummary, DocumentMetadata
-from .llm import classify_control_with_gemini
-from .control_framework import CONTROLS
+import time
+from ..models.schemas import (
+    AnalysisReportUI,
+    ControlResult,
+    ControlSummary,
+    DocumentMetadata,
+    EvidenceItem,
+    EvidenceSummary,
+)
+from .llm import classify_control, get_breaker, is_transient_error
+from .control_registry import get_registry
+from .cache import LRUCache
+from . import run_profile
+from .lexical_index import LexicalIndex
+from .scoring import filter_by_framework, score_results
+from ..config import (
+    RETRIEVAL_SCORE_THRESHOLD,
+    LEXICAL_SCORE_THRESHOLD,
+    ZERO_EVIDENCE_DENSE_SCORE,
+    RRF_K,
+    LLM_DEFERRED_MAX_WAIT_S,
+    RETRIEVAL_INITIAL_K,
+    RETRIEVAL_MAX_K,
+    RETRIEVAL_HIGH_SCORE,
+    RETRIEVAL_SCORE_GAP,
+    RETRIEVAL_WIDEN_CONFIDENCE,
+    CONTROL_EMBED_CACHE_SIZE,
+)
 
 
 _STATUS_TO_RISK = {
@@ -51,13 +76,238 @@ def _dedupe_top_evidence(evidences: List[Dict[str, Any]], max_items: int = 3) ->
         if not doc_id or not page or not excerpt:
             continue
 
-        top.append(EvidenceSummary(doc=doc_id, page=int(page), excerpt=excerpt))
+        top.append(EvidenceSummary(doc=doc_id, page=int(page), excerpt=excerpt,
+                                   clause_hash=clause_hash or None, point_id=e.get("point_id"),
+                                   sources=e.get("sources")))
         if len(top) >= max_items:
             break
 
     return top
 
 
+def _retrieve_evidence(
+    qwrap,
+    vendor_id: str,
+    qvec: Optional[List[float]],
+    query: str,
+    lexical_index: Optional[LexicalIndex],
+    limit: int = 20,
+) -> Tuple[List[Dict[str, Any]], float, float]:
+    """Hybrid retrieval: dense (Qdrant) and lexical (BM25) hits fused by reciprocal rank.
+
+    Returns (evidences, best_dense_score, best_lexical_score). Evidences keep the dense
+    similarity_score when the chunk was found by Qdrant and None for lexical-only hits.
+    """
+    hits = []
+    if qvec is not None:
+        # Use a low score threshold to catch more potentially relevant results;
+        # the LLM will filter out irrelevant ones
+        hits = qwrap.search(qvec, limit=limit, with_payload=True, vendor_id=vendor_id,
+                            score_threshold=RETRIEVAL_SCORE_THRESHOLD)
+
+    dense_ranked = sorted(
+        ((getattr(h, "score", 0.0) or 0.0, h) for h in hits), key=lambda x: x[0], reverse=True
+    )
+    lexical_ranked = []
+    if lexical_index is not None:
+        lexical_ranked = lexical_index.search(query, limit=limit, min_score=LEXICAL_SCORE_THRESHOLD)
+
+    fused: Dict[Tuple[Any, Any], float] = {}
+    by_key: Dict[Tuple[Any, Any], Dict[str, Any]] = {}
+
+    for rank, (score, h) in enumerate(dense_ranked):
+        payload = getattr(h, "payload", {}) or {}
+        # Always prefer clause_hash from payload, fallback to string conversion of point ID
+        clause_hash = payload.get("clause_hash") or str(getattr(h, "id", ""))
+        key = (payload.get("doc_id"), clause_hash)
+        fused[key] = fused.get(key, 0.0) + 1.0 / (RRF_K + rank + 1)
+        by_key.setdefault(key, {
+            "doc_id": payload.get("doc_id"),
+            "doc_type": payload.get("doc_type"),
+            "page": payload.get("page"),
+            # Full chunk text; points stored before it was kept only have the preview
+            "snippet": payload.get("text") or payload.get("preview", ""),
+            "clause_hash": clause_hash,
+            "similarity_score": round(score, 3) if score else None,
+            "sources": payload.get("sources"),
+            "point_id": getattr(h, "id", None),
+        })
+
+    for rank, (score, meta) in enumerate(lexical_ranked):
+        key = (meta.get("doc_id"), meta.get("clause_hash"))
+        fused[key] = fused.get(key, 0.0) + 1.0 / (RRF_K + rank + 1)
+        by_key.setdefault(key, {
+            "doc_id": meta.get("doc_id"),
+            "doc_type": meta.get("doc_type"),
+            "page": meta.get("page"),
+            "snippet": meta.get("text", ""),
+            "clause_hash": meta.get("clause_hash"),
+            "similarity_score": None,
+            "sources": meta.get("sources"),
+        })
+
+    ordered = sorted(fused, key=fused.get, reverse=True)[:limit]
+    evidences = [by_key[k] for k in ordered]
+    best_dense = dense_ranked[0][0] if dense_ranked else 0.0
+    best_lexical = lexical_ranked[0][0] if lexical_ranked else 0.0
+    return evidences, best_dense, best_lexical
+
+
+_USAGE_SUM_KEYS = (
+    "hedges",
+    "hedge_wins",
+    "prompt_tokens",
+    "output_tokens",
+    "thinking_tokens",
+    "evidence_tokens",
+    "latency_ms",
+    "retries",
+    "parse_failures",
+)
+
+
+def _trim_at_score_gap(evidences: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop dense hits after a clear break in similarity.
+
+    With a high-similarity match, anything more than RETRIEVAL_SCORE_GAP below it
+    goes; otherwise the list is cut at the first drop of RETRIEVAL_SCORE_GAP
+    between consecutive scores. Lexical-only hits (no dense score) are kept.
+    """
+    scores = sorted((e["similarity_score"] for e in evidences if e.get("similarity_score") is not None), reverse=True)
+    if not scores:
+        return evidences
+    floor = None
+    if scores[0] >= RETRIEVAL_HIGH_SCORE:
+        floor = scores[0] - RETRIEVAL_SCORE_GAP
+    else:
+        for prev, cur in zip(scores, scores[1:]):
+            if prev - cur >= RETRIEVAL_SCORE_GAP:
+                floor = prev
+                break
+    if floor is None:
+        return evidences
+    return [e for e in evidences if e.get("similarity_score") is None or e["similarity_score"] >= floor]
+
+
+def _needs_wider_search(resp: Dict[str, Any]) -> bool:
+    if resp.get("error"):
+        return False
+    if resp.get("classification") == "Partial":
+        return True
+    return float(resp.get("confidence") or 0.0) < RETRIEVAL_WIDEN_CONFIDENCE
+
+
+def _new_usage_totals() -> Dict[str, Any]:
+    totals: Dict[str, Any] = {key: 0 for key in _USAGE_SUM_KEYS}
+    totals.update({"calls": 0, "skipped": 0, "latency_ms": 0.0})
+    return totals
+
+
+def _add_usage(totals: Dict[str, Any], usage: Optional[Dict[str, Any]]) -> None:
+    if not usage:
+        return
+    totals["calls"] += usage.get("attempts", 1)
+    for key in _USAGE_SUM_KEYS:
+        totals[key] += usage.get(key) or 0
+
+
+def _finalize_usage(totals: Dict[str, Any]) -> Dict[str, Any]:
+    calls = totals["calls"]
+    totals["latency_ms"] = round(totals["latency_ms"], 1)
+    totals["mean_prompt_tokens"] = round(totals["prompt_tokens"] / calls, 1) if calls else 0.0
+    totals["mean_latency_ms"] = round(totals["latency_ms"] / calls, 1) if calls else 0.0
+    return totals
+
+
+# Query embeddings per control version: (control_id, content_hash) -> vector
+_QUERY_VECTORS = LRUCache(CONTROL_EMBED_CACHE_SIZE, name="control_query_vectors")
+
+
+def _on_controls_changed(changed_ids) -> None:
+    _QUERY_VECTORS.discard_where(lambda key: key[0] in changed_ids)
+
+
+get_registry().add_listener(_on_controls_changed)
+
+
+def _control_query_vector(c: Dict[str, Any], expanded_query: str) -> Optional[List[float]]:
+    # local import to avoid potential circular imports
+    from .embeddings import embed_texts
+
+    key = (c["control_id"], c.get("content_hash"))
+    qvec = _QUERY_VECTORS.get(key)
+    if qvec is None:
+        # Strict: a fallback hash vector would be cached for the process lifetime
+        try:
+            qvecs = embed_texts([expanded_query], strict=True)
+        except Exception as e:
+            print(f"Warning: Failed to embed query for {c['control_id']}; lexical retrieval only: {e}")
+            return None
+        qvec = qvecs[0] if qvecs else None
+        if qvec is not None:
+            _QUERY_VECTORS.put(key, qvec)
+    return qvec
+
+
+def _classify_safely(control: Dict[str, Any], evidences: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Handle exceptions so one failure doesn't break the whole analysis
+    with run_profile.control_timer(control["control_id"], "llm_ms"):
+        try:
+            resp = classify_control(control["control_id"], control["description"], evidences) or {}
+        except Exception as exc:
+            resp = {
+                "classification": "Missing",
+                "confidence": 0.0,
+                "rationale": f"LLM error: {exc}",
+                "followup_questions": [],
+                "error": True,
+                "retryable": is_transient_error(exc),
+            }
+    entry = run_profile.control_entry(control["control_id"])
+    if entry is not None:
+        usage = resp.get("usage") or {}
+        entry["llm_calls"] += usage.get("attempts", 1)
+        entry["prompt_tokens"] += usage.get("prompt_tokens") or 0
+        entry["output_tokens"] += usage.get("output_tokens") or 0
+    return resp
+
+
+def _profile_outcome(control_id: str, outcome: str, evidences: List[Dict[str, Any]]) -> None:
+    entry = run_profile.control_entry(control_id)
+    if entry is not None:
+        entry["outcome"] = outcome
+        entry["evidence"] = len(evidences)
+
+
+def _new_cascade_stats() -> Dict[str, Any]:
+    return {"controls": 0, "escalated": 0, "reasons": {}, "tiers": {}}
+
+
+def _add_cascade(stats: Dict[str, Any], resp: Dict[str, Any]) -> None:
+    tiers = resp.get("tiers")
+    if not tiers:
+        return
+    stats["controls"] += 1
+    reason = resp.get("escalation_reason")
+    if reason:
+        stats["escalated"] += 1
+        stats["reasons"][reason] = stats["reasons"].get(reason, 0) + 1
+    for t in tiers:
+        tier = stats["tiers"].setdefault(t["tier"], {"model": t.get("model"), "calls": 0, "latency_ms": 0.0})
+        tier["calls"] += 1
+        tier["latency_ms"] += t.get("latency_ms") or 0.0
+
+
+def _finalize_cascade(stats: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not stats["controls"]:
+        return None
+    stats["escalation_rate"] = round(stats["escalated"] / stats["controls"], 3)
+    for tier in stats["tiers"].values():
+        tier["latency_ms"] = round(tier["latency_ms"], 1)
+        tier["mean_latency_ms"] = round(tier["latency_ms"] / tier["calls"], 1) if tier["calls"] else 0.0
+    return stats
+
+
 def summarize_for_ui(raw_result: Dict[str, Any]) -> ControlSummary:
     """Convert internal analysis output into a clean UI-facing ControlSummary.
 
@@ -119,138 +369,264 @@ def summarize_for_ui(raw_result: Dict[str, Any]) -> ControlSummary:
     )
 
 
-def analyze_vendor_controls(
-    vendor_id: str, 
-    vendor_name: str, 
+def _to_evidence_items(evidences: List[Dict[str, Any]]) -> List[EvidenceItem]:
+    items: List[EvidenceItem] = []
+    for e in evidences or []:
+        try:
+            items.append(EvidenceItem(
+                doc_id=e.get("doc_id") or "",
+                doc_type=e.get("doc_type"),
+                page=int(e.get("page")),
+                snippet=e.get("snippet") or "",
+                clause_hash=str(e.get("clause_hash") or ""),
+                similarity_score=e.get("similarity_score"),
+                point_id=e.get("point_id"),
+                sources=e.get("sources"),
+            ))
+        except (TypeError, ValueError):
+            continue
+    return items
+
+
+def _to_control_result(c: Dict[str, Any], evidences: List[Dict[str, Any]], resp: Dict[str, Any]) -> ControlResult:
+    return ControlResult(
+        control_id=c["control_id"],
+        name=c.get("name") or "",
+        classification=_normalize_status(resp.get("classification", "Missing")),
+        confidence=float(resp.get("confidence", 0.0)),
+        evidence=_to_evidence_items(evidences),
+        rationale=resp.get("rationale") or "",
+        followup_questions=list(resp.get("followup_questions") or []),
+        framework=c.get("framework"),
+        description=c.get("description"),
+        category=c.get("category"),
+        weight=float(c.get("weight", 0.0)),
+    )
+
+
+def classify_vendor_controls(
+    vendor_id: str,
     qwrap,
-    document_metadata: Optional[List[DocumentMetadata]] = None,
-    framework_filter: Optional[str] = None
-) -> AnalysisReportUI:
+    framework_filter: Optional[str] = None,
+    lexical_index: Optional[LexicalIndex] = None,
+    checkpoint=None,
+) -> Tuple[List[ControlResult], Dict[str, Any]]:
     """
-    Analyze vendor controls using embeddings + LLM classification.
+    Retrieve evidence for and classify every control; no scoring.
 
     Args:
         vendor_id: identifier for the vendor
-        vendor_name: human-readable vendor name
         qwrap: an object providing .search(vector, limit=..., with_payload=True) that returns hits
                where each hit has .payload (dict) and .id (or .clause_hash) attributes
-        document_metadata: List of analyzed documents
         framework_filter: Optional framework to filter controls (SOC2, ISO27001, etc.)
+        lexical_index: Optional BM25 index of the vendor's chunks for hybrid retrieval
+        checkpoint: Optional RunCheckpoint; finished controls are read from it instead of
+                    re-classified, and each newly classified control is appended to it
 
     Returns:
-        AnalysisReport dataclass (from ..models.schemas)
+        (raw per-control results, run statistics for the report metadata)
     """
-    # local import to avoid potential circular imports
-    from .embeddings import embed_texts
-
-    controls_results: List[ControlSummary] = []
-    total_weighted = 0.0
-    accumulated = 0.0
-
-    # Get all controls
-    all_controls = CONTROLS
-    
-    # Filter by framework if specified
-    if framework_filter:
-        all_controls = [
-            c for c in all_controls
-            if framework_filter.upper() in c.get("framework", "").upper()
-        ]
+    llm_usage = _new_usage_totals()
+    cascade = _new_cascade_stats()
 
-    # If no controls are left after filtering, return a benign report instead of 100% risk
+    # Controls for the requested framework (all of them if none), from the current catalogs
+    all_controls = get_registry().snapshot().filter(framework_filter)
     if not all_controls:
-        return AnalysisReportUI(
-            vendor_id=vendor_id,
-            vendor_name=vendor_name,
-            overall_risk_score=0.0,
-            controls=[],
-            documents_analyzed=document_metadata or [],
-            analysis_timestamp=datetime.utcnow().isoformat(),
-        )
+        return [], {}
+
+    outcomes: List[Tuple[Dict[str, Any], List[Dict[str, Any]], Dict[str, Any]]] = []
+    retrieval = {"first_pass_evidence": 0, "widened": 0, "second_pass_evidence": 0}
+    deferred: List[int] = []
+
+    resumed = 0
 
     for c in all_controls:
+        if checkpoint is not None:
+            done = checkpoint.get_control(c["control_id"])
+            if done is not None:
+                outcomes.append((c, done["evidences"], done["resp"]))
+                resumed += 1
+                _profile_outcome(c["control_id"], "resumed", done["evidences"])
+                continue
+
         # Create expanded query with related terms for better search
         query = c["description"]
         # Add control name and key terms to improve search
         expanded_query = f"{c['name']}. {query}"
         
-        # embed_texts should return a list of vectors for the provided texts
-        qvecs = embed_texts([expanded_query])
-        qvec = qvecs[0] if qvecs else None
-
-        hits = []
-        if qvec is not None:
-            # Use lower score threshold (0.2) to catch more potentially relevant results
-            # The LLM will filter out irrelevant ones
-            hits = qwrap.search(qvec, limit=20, with_payload=True, vendor_id=vendor_id, score_threshold=0.2)
-
-        evidences: List[Dict[str, Any]] = []
-        # Sort hits by score (similarity) if available, highest first
-        scored_hits = []
-        for h in hits:
-            score = getattr(h, "score", 0.0)
-            scored_hits.append((score, h))
-        scored_hits.sort(key=lambda x: x[0], reverse=True)
-        
-        for score, h in scored_hits:
-            payload = getattr(h, "payload", {}) or {}
-            # Always prefer clause_hash from payload, fallback to string conversion of point ID
-            clause_hash = payload.get("clause_hash")
-            if not clause_hash:
-                clause_hash = str(getattr(h, "id", ""))
-            evidences.append(
-                {
-                    "doc_id": payload.get("doc_id"),
-                    "doc_type": payload.get("doc_type"),  # Include document type
-                    "page": payload.get("page"),
-                    "snippet": payload.get("preview", ""),
-                    "clause_hash": clause_hash,
-                    "similarity_score": round(score, 3) if score else None,
-                }
+        with run_profile.control_timer(c["control_id"], "retrieval_ms"):
+            qvec = _control_query_vector(c, expanded_query)
+            evidences, best_dense, best_lexical = _retrieve_evidence(
+                qwrap, vendor_id, qvec, expanded_query, lexical_index, limit=RETRIEVAL_INITIAL_K
             )
-
-        # Call LLM for classification (handle exceptions so one failure doesn't break everything)
-        try:
-            resp = classify_control_with_gemini(c["control_id"], c["description"], evidences) or {}
-        except Exception as exc:
+        evidences = _trim_at_score_gap(evidences)
+        retrieval["first_pass_evidence"] += len(evidences)
+
+        if (
+            lexical_index is not None
+            and qvec is not None  # without a dense search, a lexical miss proves nothing
+            and best_dense < ZERO_EVIDENCE_DENSE_SCORE
+            and best_lexical < LEXICAL_SCORE_THRESHOLD
+        ):
+            # Neither retriever found anything relevant: the answer is Missing
+            # regardless of what the LLM would say, so skip the call.
             resp = {
                 "classification": "Missing",
-                "confidence": 0.0,
-                "rationale": f"LLM error: {exc}",
+                "confidence": 1.0,
+                "rationale": "No relevant evidence retrieved (dense or lexical).",
                 "followup_questions": [],
             }
+            llm_usage["skipped"] += 1
+            outcome = "skipped"
+        else:
+            resp = _classify_safely(c, evidences)
+            _add_usage(llm_usage, resp.get("usage"))
+            if resp.get("circuit_open"):
+                # Provider is failing: queue the control instead of settling for a fallback now
+                deferred.append(len(outcomes))
+            else:
+                _add_cascade(cascade, resp)
+                if _needs_wider_search(resp):
+                    # Uncertain answer: one bounded, deeper retrieval pass and a re-classification
+                    with run_profile.control_timer(c["control_id"], "retrieval_ms"):
+                        wider, _, _ = _retrieve_evidence(
+                            qwrap, vendor_id, qvec, expanded_query, lexical_index, limit=RETRIEVAL_MAX_K
+                        )
+                    seen = {(e.get("doc_id"), e.get("clause_hash")) for e in evidences}
+                    if any((e.get("doc_id"), e.get("clause_hash")) not in seen for e in wider):
+                        retrieval["widened"] += 1
+                        retrieval["second_pass_evidence"] += len(wider)
+                        wider_resp = _classify_safely(c, wider)
+                        _add_usage(llm_usage, wider_resp.get("usage"))
+                        if not wider_resp.get("error"):
+                            _add_cascade(cascade, wider_resp)
+                            resp, evidences = wider_resp, wider
+            outcome = "deferred" if resp.get("circuit_open") else resp.get("classification") or "error"
+        _profile_outcome(c["control_id"], outcome, evidences)
+        if checkpoint is not None and not resp.get("retryable"):
+            # Final outcomes are kept, errors included (e.g. no provider configured)
+            checkpoint.save_control(c["control_id"], evidences, resp)
+        outcomes.append((c, evidences, resp))
+
+    recovered = 0
+    breaker = get_breaker()
+    # A longer outage would hold this request thread (and the run) for the whole cooldown:
+    # deferred controls stay incomplete and the run is left partial for a resume instead
+    if deferred and breaker.seconds_until_retry() <= LLM_DEFERRED_MAX_WAIT_S:
+        time.sleep(breaker.seconds_until_retry())
+        for i in deferred:
+            c, evidences, _ = outcomes[i]
+            resp = _classify_safely(c, evidences)
+            _add_usage(llm_usage, resp.get("usage"))
+            _add_cascade(cascade, resp)
+            _profile_outcome(c["control_id"], resp.get("classification") or "error", evidences)
+            if not resp.get("error"):
+                recovered += 1
+            if checkpoint is not None and not resp.get("retryable"):
+                checkpoint.save_control(c["control_id"], evidences, resp)
+            outcomes[i] = (c, evidences, resp)
+
+    llm_usage = _finalize_usage(llm_usage)
+    metadata = {
+        "framework_filter": framework_filter or None,
+        "llm_usage": llm_usage,
+        "llm_resilience": {
+            "hedges": llm_usage["hedges"],
+            "hedge_wins": llm_usage["hedge_wins"],
+            "deferred": len(deferred),
+            "recovered": recovered,
+            "breaker": breaker.snapshot(),
+        },
+        "retrieval": retrieval,
+        "resumed_controls": resumed,
+        # Controls left out of the checkpoint on retryable provider failures; a resumed run classifies only these
+        "incomplete_controls": sum(1 for _, _, resp in outcomes if resp.get("retryable")),
+    }
+    cascade_stats = _finalize_cascade(cascade)
+    if cascade_stats:
+        metadata["cascade"] = cascade_stats
+    return [_to_control_result(c, evidences, resp) for c, evidences, resp in outcomes], metadata
+
+
+def build_ui_report(
+    vendor_id: str,
+    vendor_name: Optional[str],
+    results: List[Dict[str, Any]],
+    document_metadata: Optional[List[DocumentMetadata]] = None,
+    framework_filter: Optional[str] = None,
+    weights: Optional[Dict[str, float]] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    analysis_timestamp: Optional[str] = None,
+) -> AnalysisReportUI:
+    """
+    Score raw control results and shape them into the UI report.
 
-        classification = _normalize_status(resp.get("classification", "Missing"))
-        confidence = float(resp.get("confidence", 0.0))
-
-        # Adjust score based on confidence - higher confidence = more weight
-        base_mapval = {"Covered": 1.0, "Partial": 0.5, "Missing": 0.0}.get(classification, 0.0)
-        # Apply confidence as a multiplier (confidence 0.9 means 90% of the base value)
-        adjusted_mapval = base_mapval * confidence
-        weight = float(c.get("weight", 0.0))
-        total_weighted += weight
-        accumulated += adjusted_mapval * weight
-
-        raw_for_ui = {
-            "control_id": c.get("control_id"),
-            "control_name": c.get("name"),
-            "control_description": c.get("description"),
-            "frameworks": _split_frameworks(c.get("framework")),
-            "status": classification,
-            "confidence": confidence,
-            "evidence": evidences,
-        }
-        controls_results.append(summarize_for_ui(raw_for_ui))
-
-    safety_pct = accumulated / total_weighted if total_weighted else 0.0
-    risk_score = round((1.0 - safety_pct) * 100, 2)
-
-    report = AnalysisReportUI(
+    Args:
+        results: ControlResult dicts, as returned by classify_vendor_controls or stored with history
+        framework_filter: Optional framework view over the results
+        weights: Optional weight overrides keyed by control_id or category
+    """
+    results = filter_by_framework(results, framework_filter)
+    controls_results = [
+        summarize_for_ui({
+            "control_id": r.get("control_id"),
+            "control_name": r.get("name"),
+            "control_description": r.get("description"),
+            "frameworks": _split_frameworks(r.get("framework")),
+            "status": r.get("classification"),
+            "confidence": r.get("confidence"),
+            "evidence": r.get("evidence"),
+        })
+        for r in results
+    ]
+
+    # No controls left after filtering: a benign report instead of 100% risk
+    risk = score_results(results, weights) if results else 0.0
+
+    return AnalysisReportUI(
         vendor_id=vendor_id,
         vendor_name=vendor_name,
-        overall_risk_score=risk_score,
+        overall_risk_score=risk,
         controls=controls_results,
         documents_analyzed=document_metadata or [],
-        analysis_timestamp=datetime.utcnow().isoformat(),
+        analysis_timestamp=analysis_timestamp or datetime.utcnow().isoformat(),
+        metadata=metadata or {},
+    )
+
+
+def analyze_vendor_controls(
+    vendor_id: str, 
+    vendor_name: str, 
+    qwrap,
+    document_metadata: Optional[List[DocumentMetadata]] = None,
+    framework_filter: Optional[str] = None,
+    lexical_index: Optional[LexicalIndex] = None,
+    checkpoint=None,
+) -> AnalysisReportUI:
+    """
+    Analyze vendor controls using embeddings + LLM classification.
+
+    Convenience wrapper over classify_vendor_controls + build_ui_report for callers
+    that do not keep the raw results. Without an enclosing run profile, the
+    classification's profile is returned in metadata["profile"].
+
+    Returns:
+        AnalysisReportUI (from ..models.schemas)
+    """
+    if run_profile.current_profile() is None:
+        with run_profile.start_profile(vendor_id) as profile:
+            with run_profile.stage("classify"):
+                results, metadata = classify_vendor_controls(
+                    vendor_id, qwrap, framework_filter=framework_filter,
+                    lexical_index=lexical_index, checkpoint=checkpoint,
+                )
+        metadata["profile"] = profile.to_dict()
+    else:
+        results, metadata = classify_vendor_controls(
+            vendor_id, qwrap, framework_filter=framework_filter,
+            lexical_index=lexical_index, checkpoint=checkpoint,
+        )
+    return build_ui_report(
+        vendor_id, vendor_name, [r.dict() for r in results],
+        document_metadata=document_metadata, metadata=metadata,
     )
-    return report
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""
+Caches shared by services: an in-process LRU and a size-bounded on-disk artifact cache.
+"""
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Callable, Hashable, Iterator, Optional
+
+from .metrics import CACHE_REQUESTS_TOTAL
+from .run_profile import record_cache
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with a fixed number of entries.
+
+    A named cache reports its hits and misses to /metrics.
+    """
+
+    def __init__(self, maxsize: int = 1024, name: Optional[str] = None):
+        self.maxsize = maxsize
+        self.name = name
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            hit = key in self._data
+            if hit:
+                self._data.move_to_end(key)
+                self.hits += 1
+                value = self._data[key]
+            else:
+                self.misses += 1
+                value = default
+        if self.name:
+            CACHE_REQUESTS_TOTAL.inc(cache=self.name, result="hit" if hit else "miss")
+            record_cache(self.name, hit)
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches; returns how many were dropped."""
+        with self._lock:
+            stale = [k for k in self._data if predicate(k)]
+            for k in stale:
+                del self._data[k]
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+class DiskCache:
+    """Size-bounded directory of immutable artifacts, evicting least recently used files.
+
+    Keys must be safe relative file names; callers build them from IDs and hashes.
+    Recency is tracked through file mtimes, so the cache is shared correctly by
+    every worker process pointing at the same directory.
+    """
+
+    def __init__(self, root: str, max_bytes: int, name: Optional[str] = None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.name = name
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def get(self, key: str) -> Optional[str]:
+        """Path of a cached artifact (marking it recently used), or None."""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            path = None
+        if self.name:
+            CACHE_REQUESTS_TOTAL.inc(cache=self.name, result="miss" if path is None else "hit")
+            record_cache(self.name, path is not None)
+        return path
+
+    @contextmanager
+    def open_write(self, key: str) -> Iterator[BinaryIO]:
+        """Write an artifact; it becomes visible atomically only if the block completes."""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                yield f
+            os.replace(tmp_path, path)
+        except BaseException:
+            # Includes GeneratorExit when a streaming client disconnects mid-write
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        self.evict()
+
+    def temp_path(self, key: str) -> str:
+        """A fresh temporary file next to key's artifact, for writers that need a file name.
+
+        Publish it with commit(); the cache never evicts or serves temporary files.
+        """
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        os.close(fd)
+        return tmp_path
+
+    def commit(self, key: str, tmp_path: str) -> str:
+        path = self.path(key)
+        os.replace(tmp_path, path)
+        self.evict()
+        return path
+
+    def put(self, key: str, data: bytes) -> str:
+        with self.open_write(key) as f:
+            f.write(data)
+        return self.path(key)
+
+    def evict(self) -> int:
+        """Delete least recently used artifacts until the cache fits max_bytes; returns files removed."""
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        removed = 0
+        if total <= self.max_bytes:
+            return removed
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+            if total <= self.max_bytes:
+                break
+        return removed
@@ -0,0 +1,266 @@
+"""
+Durable per-run checkpoints for vendor analyses.
+
+A run is identified by a hash of its inputs (vendor, files and their
+size/mtime, framework filter, control catalog), so re-submitting the same
+request maps to the same run and reuses whatever it already finished.
+Layout under RUNS_DIR/<run_id>/:
+
+    state.json        request, per-stage completion flags, status
+                      (running, partial, complete or failed)
+    chunks.json.gz    deduplicated chunks + document metadata (ingest stage)
+    embeddings.f32    float32 rows appended batch by batch (embed stage)
+    controls.jsonl    one line per classified control, appended as they finish
+    report.json       latest UI report (final once the status is complete)
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from ..config import RUNS_DIR, EMBEDDING_DIM, RUNS_KEEP, RUNS_MAX_AGE_DAYS
+
+STAGES = ("ingest", "embed", "upsert", "controls")
+
+
+def _file_fingerprint(path: str) -> List[Any]:
+    try:
+        st = os.stat(path)
+        return [path, st.st_size, st.st_mtime_ns]
+    except OSError:
+        return [path, None, None]
+
+
+def compute_run_id(
+    vendor_id: str,
+    file_paths: List[str],
+    framework_filter: Optional[str],
+    controls_fingerprint: str,
+) -> str:
+    """Deterministic run ID for a set of analysis inputs."""
+    key = json.dumps(
+        {
+            "vendor_id": vendor_id,
+            "files": [_file_fingerprint(p) for p in sorted(file_paths)],
+            "framework_filter": (framework_filter or "").upper(),
+            "controls": controls_fingerprint,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:24]
+
+
+def _atomic_write_json(path: str, data: Any) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class RunCheckpoint:
+    """Checkpoint store for one analysis run; safe to call from the analysis thread only."""
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.dir = os.path.join(RUNS_DIR, run_id)
+        self._state_path = os.path.join(self.dir, "state.json")
+        self._controls_path = os.path.join(self.dir, "controls.jsonl")
+        self._embeddings_path = os.path.join(self.dir, "embeddings.f32")
+        self._lock = threading.Lock()
+        self.state: Dict[str, Any] = {}
+        self._controls: Optional[Dict[str, Dict[str, Any]]] = None
+
+    # --- lifecycle -------------------------------------------------------
+
+    @classmethod
+    def load(cls, run_id: str) -> Optional["RunCheckpoint"]:
+        ckpt = cls(run_id)
+        if not os.path.exists(ckpt._state_path):
+            return None
+        with open(ckpt._state_path, "r") as f:
+            ckpt.state = json.load(f)
+        return ckpt
+
+    @classmethod
+    def open_or_create(cls, run_id: str, request: Dict[str, Any]) -> "RunCheckpoint":
+        existing = cls.load(run_id)
+        if existing is not None:
+            return existing
+        ckpt = cls(run_id)
+        os.makedirs(ckpt.dir, exist_ok=True)
+        now = datetime.utcnow().isoformat()
+        ckpt.state = {
+            "run_id": run_id,
+            "request": request,
+            "stages": {stage: False for stage in STAGES},
+            "status": "running",
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        ckpt._save_state()
+        return ckpt
+
+    def reset(self) -> None:
+        """Discard all completed work for this run (used for forced re-runs)."""
+        for name in ("chunks.json.gz", "embeddings.f32", "controls.jsonl", "report.json"):
+            path = os.path.join(self.dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+        self._controls = None
+        self.state["stages"] = {stage: False for stage in STAGES}
+        self.set_status("running")
+
+    def _save_state(self) -> None:
+        self.state["updated_at"] = datetime.utcnow().isoformat()
+        _atomic_write_json(self._state_path, self.state)
+
+    def stage_done(self, stage: str) -> bool:
+        return bool(self.state.get("stages", {}).get(stage))
+
+    def mark_stage(self, stage: str) -> None:
+        self.state["stages"][stage] = True
+        self._save_state()
+
+    def set_status(self, status: str, error: Optional[str] = None) -> None:
+        self.state["status"] = status
+        self.state["error"] = error
+        self._save_state()
+
+    # --- ingest ----------------------------------------------------------
+
+    def save_chunks(self, chunks: List[Dict[str, Any]], documents: List[Dict[str, Any]]) -> None:
+        path = os.path.join(self.dir, "chunks.json.gz")
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump({"chunks": chunks, "documents": documents}, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+        self.mark_stage("ingest")
+
+    def load_chunks(self) -> Dict[str, Any]:
+        with gzip.open(os.path.join(self.dir, "chunks.json.gz"), "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    # --- embeddings ------------------------------------------------------
+
+    def load_embeddings(self) -> List[List[float]]:
+        """Rows embedded so far; a torn trailing row from a crash is discarded."""
+        if not os.path.exists(self._embeddings_path):
+            return []
+        raw = np.fromfile(self._embeddings_path, dtype=np.float32)
+        rows = len(raw) // EMBEDDING_DIM
+        if rows * EMBEDDING_DIM != len(raw):
+            with open(self._embeddings_path, "r+b") as f:
+                f.truncate(rows * EMBEDDING_DIM * 4)
+        return raw[: rows * EMBEDDING_DIM].reshape(rows, EMBEDDING_DIM).tolist()
+
+    def append_embeddings(self, vectors: List[List[float]]) -> None:
+        with open(self._embeddings_path, "ab") as f:
+            np.asarray(vectors, dtype=np.float32).tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    # --- controls --------------------------------------------------------
+
+    def completed_controls(self) -> Dict[str, Dict[str, Any]]:
+        if self._controls is None:
+            self._controls = {}
+            if os.path.exists(self._controls_path):
+                good_bytes = 0
+                with open(self._controls_path, "rb") as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            break
+                        if not line.endswith(b"\n"):
+                            break
+                        self._controls[record["control_id"]] = record
+                        good_bytes += len(line)
+                if good_bytes != os.path.getsize(self._controls_path):
+                    # Drop a torn final line from an interrupted write so appends stay line-aligned
+                    with open(self._controls_path, "r+b") as f:
+                        f.truncate(good_bytes)
+        return self._controls
+
+    def get_control(self, control_id: str) -> Optional[Dict[str, Any]]:
+        return self.completed_controls().get(control_id)
+
+    def save_control(self, control_id: str, evidences: List[Dict[str, Any]], resp: Dict[str, Any]) -> None:
+        record = {"control_id": control_id, "evidences": evidences, "resp": resp}
+        with self._lock:
+            with open(self._controls_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.completed_controls()[control_id] = record
+
+    # --- report ----------------------------------------------------------
+
+    def save_report(self, report: Dict[str, Any], complete: bool = True) -> None:
+        """Store the report; a run with controls still unclassified is left "partial" for resume."""
+        _atomic_write_json(os.path.join(self.dir, "report.json"), report)
+        if complete:
+            self.mark_stage("controls")
+            self.set_status("complete")
+        else:
+            self.set_status("partial")
+
+    def load_report(self) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self.dir, "report.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "vendor_id": self.state.get("request", {}).get("vendor_id"),
+            "status": self.state.get("status"),
+            "error": self.state.get("error"),
+            "stages": self.state.get("stages"),
+            "completed_controls": len(self.completed_controls()),
+            "created_at": self.state.get("created_at"),
+            "updated_at": self.state.get("updated_at"),
+        }
+
+
+def prune_runs(in_progress: Iterable[str] = ()) -> int:
+    """Delete run directories beyond the retention limits; returns how many were removed.
+
+    Complete runs past the newest RUNS_KEEP go, and so do unfinished ones whose state
+    has not changed for RUNS_MAX_AGE_DAYS. Runs in `in_progress` are never touched.
+    """
+    skip = set(in_progress)
+    runs = []
+    for run_id in os.listdir(RUNS_DIR):
+        state_path = os.path.join(RUNS_DIR, run_id, "state.json")
+        if run_id in skip:
+            continue
+        try:
+            mtime = os.path.getmtime(state_path)
+            with open(state_path, "r") as f:
+                status = json.load(f).get("status")
+        except (OSError, ValueError):
+            continue
+        runs.append((mtime, run_id, status))
+    runs.sort(reverse=True)
+
+    cutoff = time.time() - RUNS_MAX_AGE_DAYS * 86400
+    complete = [run_id for _, run_id, status in runs if status == "complete"]
+    stale = [run_id for mtime, run_id, status in runs if status != "complete" and mtime < cutoff]
+    removed = 0
+    for run_id in complete[RUNS_KEEP:] + stale:
+        shutil.rmtree(os.path.join(RUNS_DIR, run_id), ignore_errors=True)
+        removed += 1
+    return removed
@@ -0,0 +1,268 @@
+"""
+Control registry compiled from versioned catalog files.
+
+Catalogs are JSON (or YAML, when PyYAML is installed) files in
+CONTROL_CATALOG_DIRS, shaped like app/catalogs/vendorguard-core.json:
+
+    {"catalog": "<name>", "version": "<version>", "controls": [
+        {"control_id": ..., "name": ..., "description": ...,
+         "frameworks": ["SOC2", ...], "category": ..., "weight": 1.0}, ...]}
+
+They are compiled into an immutable RegistrySnapshot indexed by ID, framework
+and category, with a content hash per control. The registry re-checks file
+mtimes at most every CONTROL_CATALOG_RELOAD_S seconds, swaps in a new snapshot
+when anything changed, and tells listeners which control IDs changed so they
+can drop cached per-control artifacts.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+try:
+    import yaml
+except ImportError:  # YAML catalogs are optional
+    yaml = None
+
+from ..config import CONTROL_CATALOG_DIRS, CONTROL_CATALOG_RELOAD_S
+from .cache import LRUCache
+
+_CATALOG_EXTENSIONS = (".json", ".yaml", ".yml")
+# Filters come from query strings, so the per-snapshot memo is bounded
+_FILTER_CACHE_SIZE = 64
+# Fields that define a control; the content hash covers exactly these
+_CONTENT_FIELDS = ("control_id", "name", "description", "framework", "category", "weight")
+
+
+def matching_frameworks(names: Iterable[str], framework: str) -> FrozenSet[str]:
+    """Upper-cased framework names a filter selects: the exact name when it is one, else every name containing it."""
+    key = framework.upper()
+    names = {n.upper() for n in names}
+    if key in names:
+        return frozenset((key,))
+    # Not a framework name: keep the old substring semantics ("ISO" matches ISO27001)
+    return frozenset(n for n in names if key in n)
+
+
+def _normalize_control(raw: Dict[str, Any], catalog: str, version: str) -> Dict[str, Any]:
+    frameworks = raw.get("frameworks", raw.get("framework")) or []
+    if isinstance(frameworks, str):
+        frameworks = frameworks.split(",")
+    frameworks = [str(f).strip() for f in frameworks if str(f).strip()]
+
+    control = {
+        "control_id": str(raw["control_id"]),
+        "name": str(raw["name"]),
+        "description": str(raw["description"]),
+        # Comma-joined, as stored on results and reports
+        "framework": ",".join(frameworks),
+        "category": str(raw.get("category") or ""),
+        "weight": float(raw.get("weight", 1.0)),
+    }
+    content = json.dumps({k: control[k] for k in _CONTENT_FIELDS}, sort_keys=True)
+    control["content_hash"] = hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+    control["catalog"] = catalog
+    control["catalog_version"] = version
+    return control
+
+
+def _read_catalog(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            doc = json.load(f)
+        else:
+            doc = yaml.safe_load(f)
+    if isinstance(doc, list):
+        doc = {"controls": doc}
+    if not isinstance(doc, dict) or not isinstance(doc.get("controls"), list):
+        raise ValueError("catalog must be a list of controls or an object with a 'controls' list")
+    return doc
+
+
+class RegistrySnapshot:
+    """Immutable compiled view of every loaded catalog.
+
+    Control dicts are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, controls: Iterable[Dict[str, Any]], catalogs: Iterable[Dict[str, Any]]):
+        self.controls: Tuple[Dict[str, Any], ...] = tuple(controls)
+        self.catalogs: Tuple[Dict[str, Any], ...] = tuple(catalogs)
+
+        by_framework: Dict[str, List[Dict[str, Any]]] = {}
+        by_category: Dict[str, List[Dict[str, Any]]] = {}
+        framework_names: Dict[str, str] = {}
+        category_names: Dict[str, str] = {}
+        for c in self.controls:
+            for fw in c["framework"].split(","):
+                if fw:
+                    by_framework.setdefault(fw.upper(), []).append(c)
+                    framework_names.setdefault(fw.upper(), fw)
+            if c["category"]:
+                by_category.setdefault(c["category"].lower(), []).append(c)
+                category_names.setdefault(c["category"].lower(), c["category"])
+
+        self.by_id = MappingProxyType({c["control_id"]: c for c in self.controls})
+        self.by_framework = MappingProxyType({k: tuple(v) for k, v in by_framework.items()})
+        self.by_category = MappingProxyType({k: tuple(v) for k, v in by_category.items()})
+        self.frameworks: Tuple[str, ...] = tuple(sorted(framework_names.values()))
+        self.categories: Tuple[str, ...] = tuple(sorted(category_names.values()))
+        self.hashes = MappingProxyType({c["control_id"]: c["content_hash"] for c in self.controls})
+        self.fingerprint = hashlib.sha256(
+            "\n".join(f"{cid}:{h}" for cid, h in sorted(self.hashes.items())).encode("utf-8")
+        ).hexdigest()
+        # Filter results are memoized; safe because the snapshot never changes
+        self._filtered = LRUCache(_FILTER_CACHE_SIZE)
+
+    def get(self, control_id: str) -> Optional[Dict[str, Any]]:
+        return self.by_id.get(control_id)
+
+    def _by_framework(self, framework: str) -> Tuple[Dict[str, Any], ...]:
+        key = framework.upper()
+        if key in self.by_framework:
+            return self.by_framework[key]
+        matching = matching_frameworks(self.by_framework, framework)
+        return tuple(c for c in self.controls if not matching.isdisjoint(c["framework"].upper().split(",")))
+
+    def filter(self, framework: Optional[str] = None, category: Optional[str] = None) -> Tuple[Dict[str, Any], ...]:
+        """Controls matching the framework and/or category, in catalog order."""
+        key = ((framework or "").upper(), (category or "").lower())
+        cached = self._filtered.get(key)
+        if cached is not None:
+            return cached
+
+        result = self.controls
+        if framework:
+            result = self._by_framework(framework)
+        if category:
+            in_category = self.by_category.get(key[1], ())
+            if framework:
+                ids = {c["control_id"] for c in in_category}
+                result = tuple(c for c in result if c["control_id"] in ids)
+            else:
+                result = in_category
+
+        self._filtered.put(key, result)
+        return result
+
+
+class ControlRegistry:
+    """Loads catalogs and keeps the current snapshot fresh."""
+
+    def __init__(self, dirs: List[str], reload_interval_s: float = 2.0):
+        self._dirs = list(dirs)
+        self._reload_interval_s = reload_interval_s
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[FrozenSet[str]], None]] = []
+        self._snapshot: Optional[RegistrySnapshot] = None
+        self._signature: Optional[Tuple[Any, ...]] = None
+        self._checked_at = 0.0
+
+    def _catalog_files(self) -> List[str]:
+        files = []
+        for d in self._dirs:
+            if not os.path.isdir(d):
+                continue
+            for name in sorted(os.listdir(d)):
+                if name.endswith(_CATALOG_EXTENSIONS):
+                    files.append(os.path.join(d, name))
+        return files
+
+    @staticmethod
+    def _signature_of(files: List[str]) -> Tuple[Any, ...]:
+        sig = []
+        for path in files:
+            try:
+                st = os.stat(path)
+                sig.append((path, st.st_mtime_ns, st.st_size))
+            except OSError:
+                continue
+        return tuple(sig)
+
+    def _compile(self, files: List[str]) -> Optional[RegistrySnapshot]:
+        """Build a snapshot, or None if any catalog could not be read (e.g. caught mid-write)."""
+        controls: Dict[str, Dict[str, Any]] = {}
+        catalogs = []
+        for path in files:
+            if yaml is None and not path.endswith(".json"):
+                print(f"Warning: PyYAML is not installed; skipping control catalog {path}")
+                continue
+            try:
+                doc = _read_catalog(path)
+            except Exception as e:
+                print(f"Warning: Failed to load control catalog {path}: {e}")
+                return None
+
+            name = str(doc.get("catalog") or os.path.splitext(os.path.basename(path))[0])
+            version = str(doc.get("version") or "0")
+            loaded = 0
+            for raw in doc["controls"]:
+                try:
+                    control = _normalize_control(raw, name, version)
+                except (KeyError, TypeError, ValueError) as e:
+                    print(f"Warning: Skipping invalid control in {path}: {e}")
+                    continue
+                if control["control_id"] in controls:
+                    print(f"Warning: {path} overrides control {control['control_id']}")
+                controls[control["control_id"]] = control
+                loaded += 1
+            catalogs.append({"catalog": name, "version": version, "path": path, "controls": loaded})
+
+        if not controls:
+            print(f"Warning: No controls loaded from {self._dirs}")
+        return RegistrySnapshot(controls.values(), catalogs)
+
+    def snapshot(self) -> RegistrySnapshot:
+        """Current snapshot, re-checking catalog files if the reload interval has passed."""
+        if self._snapshot is None or time.monotonic() - self._checked_at >= self._reload_interval_s:
+            self.refresh()
+        return self._snapshot or RegistrySnapshot((), ())
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reload catalogs if any file was added, removed or modified. Returns whether it swapped."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            files = self._catalog_files()
+            signature = self._signature_of(files)
+            if not force and signature == self._signature and self._snapshot is not None:
+                return False
+            new = self._compile(files)
+            if new is None:
+                # Keep serving the previous snapshot until the broken file changes again
+                self._signature = signature
+                return False
+            old = self._snapshot
+            self._snapshot, self._signature = new, signature
+            listeners = list(self._listeners)
+
+        if old is not None:
+            changed = frozenset(
+                cid for cid in set(old.hashes) | set(new.hashes)
+                if old.hashes.get(cid) != new.hashes.get(cid)
+            )
+            if changed:
+                for listener in listeners:
+                    try:
+                        listener(changed)
+                    except Exception as e:
+                        print(f"Warning: Control registry listener failed: {e}")
+        return True
+
+    def add_listener(self, listener: Callable[[FrozenSet[str]], None]) -> None:
+        """Call listener(changed_control_ids) whenever a reload changes, adds or removes controls."""
+        with self._lock:
+            self._listeners.append(listener)
+
+
+_REGISTRY = ControlRegistry(CONTROL_CATALOG_DIRS, CONTROL_CATALOG_RELOAD_S)
+
+
+def get_registry() -> ControlRegistry:
+    return _REGISTRY
+
+
+def get_controls(framework: Optional[str] = None, category: Optional[str] = None) -> Tuple[Dict[str, Any], ...]:
+    return _REGISTRY.snapshot().filter(framework, category)
@@ -0,0 +1,99 @@
+"""
+Near-duplicate chunk elimination between parsing and embedding.
+
+Vendor packets repeat the same legal boilerplate, confidentiality notices and
+section preambles across pages and across documents. Each chunk gets a 64-bit
+SimHash over word shingles; chunks within a small Hamming distance of an
+earlier chunk are collapsed into it. The surviving chunk keeps a `sources`
+list with every (doc_id, page, clause_hash) it stands for, so citations to
+the collapsed locations still resolve.
+"""
+import re
+from hashlib import blake2b, sha256
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Four 16-bit bands: by pigeonhole, two hashes within distance 3 share a band
+_BANDS = 4
+_BAND_BITS = 64 // _BANDS
+_BAND_MASK = (1 << _BAND_BITS) - 1
+
+
+def _shingles(words: List[str], size: int = 3) -> List[str]:
+    if len(words) <= size:
+        return [" ".join(words)]
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def simhash(words: List[str]) -> int:
+    """64-bit SimHash of the word 3-shingles of a chunk."""
+    hashes = np.fromiter(
+        (int.from_bytes(blake2b(s.encode("utf8"), digest_size=8).digest(), "little") for s in _shingles(words)),
+        dtype=np.uint64,
+    )
+    # bits[i, j] = bit j of shingle hash i; keep bit j when set in a majority of shingles
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    majority = (2 * bits.sum(axis=0, dtype=np.int64) > len(hashes)).astype(np.uint8)
+    return int(np.packbits(majority, bitorder="little").view(np.uint64)[0])
+
+
+def _source(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    return {"doc_id": chunk.get("doc_id"), "page": chunk.get("page"), "clause_hash": chunk.get("clause_hash")}
+
+
+def dedupe_chunks(
+    chunks: List[Dict[str, Any]],
+    max_distance: int = 3,
+    min_words: int = 8,
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """Collapse exact and near-duplicate chunks across a vendor's packet.
+
+    Chunks shorter than `min_words` are only collapsed on an exact (normalised)
+    match, since SimHash is unreliable on a handful of shingles.
+
+    Returns (kept_chunks, stats). Kept chunks are the first occurrence of each
+    group, in original order, with a `sources` list of every location collapsed
+    into them.
+    """
+    kept: List[Dict[str, Any]] = []
+    exact: Dict[str, int] = {}
+    fingerprints: List[int] = []
+    bands: List[Dict[int, List[int]]] = [{} for _ in range(_BANDS)]
+    stats = {"input": len(chunks), "exact_duplicates": 0, "near_duplicates": 0}
+
+    for chunk in chunks:
+        words = _WORD_RE.findall((chunk.get("text") or "").lower())
+        norm_key = sha256(" ".join(words).encode("utf8")).hexdigest()
+
+        match = exact.get(norm_key)
+        if match is not None:
+            stats["exact_duplicates"] += 1
+        fp = None
+        if match is None and len(words) >= min_words:
+            fp = simhash(words)
+            candidates = set()
+            for b in range(_BANDS):
+                candidates.update(bands[b].get((fp >> (b * _BAND_BITS)) & _BAND_MASK, ()))
+            for k in sorted(candidates):
+                if fingerprints[k] is not None and bin(fingerprints[k] ^ fp).count("1") <= max_distance:
+                    match = k
+                    stats["near_duplicates"] += 1
+                    break
+
+        if match is not None:
+            kept[match]["sources"].append(_source(chunk))
+            continue
+
+        idx = len(kept)
+        kept.append(dict(chunk, sources=[_source(chunk)]))
+        exact[norm_key] = idx
+        fingerprints.append(fp)
+        if fp is not None:
+            for b in range(_BANDS):
+                bands[b].setdefault((fp >> (b * _BAND_BITS)) & _BAND_MASK, []).append(idx)
+
+    stats["output"] = len(kept)
+    return kept, stats
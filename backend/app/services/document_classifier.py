@@ -3,87 +3,97 @@ Document Type Classifier
 Automatically detects document types based on filename and content patterns.
 """
 import re
-from typing import Optional
+from typing import Iterable, List, Optional, Tuple
 from ..models.schemas import DocumentType
 
-
-def classify_document_type(filename: str, content_preview: Optional[str] = None) -> DocumentType:
-    """
-    Classify document type based on filename patterns and optional content preview.
-    
-    Args:
-        filename: The document filename
-        content_preview: Optional preview of document content (first 2000 chars)
-    
-    Returns:
-        DocumentType enum value
-    """
-    filename_lower = filename.lower()
-    
-    # SOC2 patterns
-    soc2_patterns = [
+# Filename patterns per type, in precedence order: the first type with any match wins
+FILENAME_PATTERNS = (
+    (DocumentType.SOC2, (
         r'soc.?2', r'type.?2', r'soc.?ii', r'system.?organization.?controls',
         r'service.?organization.?control', r'audit.?report', r'attestation'
-    ]
-    if any(re.search(pattern, filename_lower) for pattern in soc2_patterns):
-        return DocumentType.SOC2
-    
-    # ISO patterns
-    iso_patterns = [
+    )),
+    (DocumentType.ISO, (
         r'iso.?27001', r'iso.?27002', r'iso.?27017', r'iso.?27018',
         r'iso.?27701', r'information.?security.?management',
         r'isms', r'certification'
-    ]
-    if any(re.search(pattern, filename_lower) for pattern in iso_patterns):
-        return DocumentType.ISO
-    
-    # SLA patterns
-    sla_patterns = [
+    )),
+    (DocumentType.SLA, (
         r'sla', r'service.?level.?agreement', r'service.?agreement',
         r'performance.?agreement', r'operational.?level.?agreement'
-    ]
-    if any(re.search(pattern, filename_lower) for pattern in sla_patterns):
-        return DocumentType.SLA
-    
-    # Contract patterns
-    contract_patterns = [
+    )),
+    (DocumentType.CONTRACT, (
         r'contract', r'agreement', r'msa', r'master.?service',
         r'terms.?of.?service', r'terms.?and.?conditions', r'engagement.?letter'
-    ]
-    if any(re.search(pattern, filename_lower) for pattern in contract_patterns):
-        return DocumentType.CONTRACT
-    
-    # Privacy Policy patterns
-    privacy_patterns = [
+    )),
+    (DocumentType.PRIVACY_POLICY, (
         r'privacy.?policy', r'privacy.?notice', r'data.?protection',
         r'gdpr', r'ccpa', r'privacy.?statement'
-    ]
-    if any(re.search(pattern, filename_lower) for pattern in privacy_patterns):
-        return DocumentType.PRIVACY_POLICY
-    
-    # Security Policy patterns
-    security_patterns = [
+    )),
+    (DocumentType.SECURITY_POLICY, (
         r'security.?policy', r'information.?security', r'cyber.?security',
         r'security.?standards', r'security.?framework'
-    ]
-    if any(re.search(pattern, filename_lower) for pattern in security_patterns):
-        return DocumentType.SECURITY_POLICY
-    
-    # Content-based classification if preview available
-    if content_preview:
-        content_lower = content_preview.lower()
-        
-        # Check for SOC2 indicators in content
-        if any(term in content_lower for term in ['trust services criteria', 'tsc', 'cc6.1', 'cc7.1', 'common criteria']):
-            return DocumentType.SOC2
-        
-        # Check for ISO indicators
-        if any(term in content_lower for term in ['iso/iec 27001', 'iso 27001', 'isms', 'information security management system']):
-            return DocumentType.ISO
-        
-        # Check for SLA indicators
-        if any(term in content_lower for term in ['service level', 'uptime', 'availability target', 'sla']):
-            return DocumentType.SLA
-    
-    return DocumentType.OTHER
+    )),
+)
+
+# Content terms, consulted only when the filename matches nothing; same precedence rule
+CONTENT_TERMS = (
+    (DocumentType.SOC2, ('trust services criteria', 'tsc', 'cc6.1', 'cc7.1', 'common criteria')),
+    (DocumentType.ISO, ('iso/iec 27001', 'iso 27001', 'isms', 'information security management system')),
+    (DocumentType.SLA, ('service level', 'uptime', 'availability target', 'sla')),
+)
+
+# One named group per type inside a zero-width lookahead, so a single finditer pass
+# reports the highest-precedence type starting at every position of the filename.
+_FILENAME_RE = re.compile("(?=" + "|".join(
+    f"(?P<{doc_type.name}>{'|'.join(patterns)})" for doc_type, patterns in FILENAME_PATTERNS
+) + ")")
+_RANK = {doc_type.name: rank for rank, (doc_type, _) in enumerate(FILENAME_PATTERNS)}
+
+
+def _classify_filename(filename_lower: str) -> Optional[DocumentType]:
+    best = len(FILENAME_PATTERNS)
+    for match in _FILENAME_RE.finditer(filename_lower):
+        rank = _RANK[match.lastgroup]
+        if rank < best:
+            best = rank
+            if rank == 0:
+                break
+    return FILENAME_PATTERNS[best][0] if best < len(FILENAME_PATTERNS) else None
+
+
+def _classify_content(content_lower: str) -> Optional[DocumentType]:
+    # Substring checks run in C and beat a combined regex over a 2000-char preview
+    for doc_type, terms in CONTENT_TERMS:
+        if any(term in content_lower for term in terms):
+            return doc_type
+    return None
+
+
+def classify_document_type(filename: str, content_preview: Optional[str] = None) -> DocumentType:
+    """
+    Classify document type based on filename patterns and optional content preview.
+
+    Args:
+        filename: The document filename
+        content_preview: Optional preview of document content (first 2000 chars)
+
+    Returns:
+        DocumentType enum value
+    """
+    doc_type = _classify_filename(filename.lower())
+    if doc_type is None and content_preview:
+        doc_type = _classify_content(content_preview.lower())
+    return doc_type or DocumentType.OTHER
+
+
+def classify_documents(documents: Iterable[Tuple[str, Optional[str]]]) -> List[DocumentType]:
+    """
+    Classify a whole packet at once.
 
+    Args:
+        documents: (filename, content_preview) pairs; the preview may be None
+
+    Returns:
+        One DocumentType per document, in input order
+    """
+    return [classify_document_type(filename, preview) for filename, preview in documents]
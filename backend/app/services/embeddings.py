@@ -1,5 +1,8 @@
 import math
 import hashlib
+import time
+from .metrics import EMBED_BATCH_SECONDS, EMBED_FALLBACKS_TOTAL, EMBED_TEXTS_TOTAL
+from . import run_profile
 from ..config import EMBEDDING_PROVIDER, GOOGLE_API_KEY, EMBEDDING_DIM, GEMINI_EMBEDDING_MODEL
 
 # Lazy initialization function
@@ -15,48 +18,56 @@ def _get_genai_client():
             return None
     return None
 
-def embed_texts(texts):
-    """
-    Returns list[list[float]] embeddings.
+def _fold_to_dim(vec, target_dim: int):
+    """Deterministically fold a larger embedding down to target_dim.
+
+    This preserves the configured Qdrant vector size even if the provider
+    returns a higher-dimensional vector (e.g., 3072).
     """
-    def _fold_to_dim(vec, target_dim: int):
-        """Deterministically fold a larger embedding down to target_dim.
+    out = [0.0] * target_dim
+    counts = [0] * target_dim
+    for i, v in enumerate(vec):
+        j = i % target_dim
+        out[j] += float(v)
+        counts[j] += 1
+    for j in range(target_dim):
+        if counts[j]:
+            out[j] /= counts[j]
+    return out
 
-        This preserves the configured Qdrant vector size even if the provider
-        returns a higher-dimensional vector (e.g., 3072).
-        """
-        out = [0.0] * target_dim
-        counts = [0] * target_dim
-        for i, v in enumerate(vec):
-            j = i % target_dim
-            out[j] += float(v)
-            counts[j] += 1
-        for j in range(target_dim):
-            if counts[j]:
-                out[j] /= counts[j]
-        return out
 
-    def _enforce_dim(vec):
-        if vec is None:
-            return None
-        if len(vec) != EMBEDDING_DIM:
-            # If the provider returns a larger vector, fold it down to the configured size.
-            # This keeps Qdrant schema stable (e.g., fixed at 768) across provider changes.
-            if len(vec) > EMBEDDING_DIM:
-                return _fold_to_dim(vec, EMBEDDING_DIM)
-            raise ValueError(
-                f"Embedding dimension mismatch: got {len(vec)}, expected {EMBEDDING_DIM}. "
-                "Provider returned a smaller vector than configured; update EMBEDDING_DIM or the embedding model."
-            )
-        return vec
+def _enforce_dim(vec):
+    if vec is None:
+        return None
+    if len(vec) != EMBEDDING_DIM:
+        # If the provider returns a larger vector, fold it down to the configured size.
+        # This keeps Qdrant schema stable (e.g., fixed at 768) across provider changes.
+        if len(vec) > EMBEDDING_DIM:
+            return _fold_to_dim(vec, EMBEDDING_DIM)
+        raise ValueError(
+            f"Embedding dimension mismatch: got {len(vec)}, expected {EMBEDDING_DIM}. "
+            "Provider returned a smaller vector than configured; update EMBEDDING_DIM or the embedding model."
+        )
+    return vec
+
 
-    def _deterministic_fallback(text: str):
-        # Stable SHA256-based fallback; tile digest to required dimension and normalize to [0,1]
-        digest = hashlib.sha256(text.encode("utf-8")).digest()
-        needed_bytes = EMBEDDING_DIM
-        repeated = (digest * math.ceil(needed_bytes / len(digest)))[:needed_bytes]
-        return [b / 255.0 for b in repeated]
+def _deterministic_fallback(text: str):
+    # Stable SHA256-based fallback; tile digest to required dimension and normalize to [0,1]
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    needed_bytes = EMBEDDING_DIM
+    repeated = (digest * math.ceil(needed_bytes / len(digest)))[:needed_bytes]
+    return [b / 255.0 for b in repeated]
 
+
+def embed_texts(texts, strict=False):
+    """
+    Returns list[list[float]] embeddings.
+
+    A provider error is replaced by the deterministic fallback vector, unless `strict`
+    is set: then it is raised, so callers that cache vectors never keep a fallback.
+    With no provider configured every vector is a fallback, and strict has no effect.
+    """
+    started = time.perf_counter()
     if EMBEDDING_PROVIDER == "gemini":
         client = _get_genai_client()
         if client is not None:
@@ -73,15 +84,28 @@ def embed_texts(texts):
                         # Get the first embedding's values
                         embedding_values = response.embeddings[0].values
                         embeddings.append(_enforce_dim(embedding_values))
+                        EMBED_TEXTS_TOTAL.inc(source="provider")
                     else:
                         raise ValueError("No embeddings in response")
                 except Exception as e:
+                    if strict:
+                        raise
                     print(f"Error generating embedding: {e}")
                     embeddings.append(_deterministic_fallback(text))
+                    EMBED_TEXTS_TOTAL.inc(source="fallback")
+                    EMBED_FALLBACKS_TOTAL.inc(reason="error")
+                    run_profile.count("embedding_fallbacks")
+            EMBED_BATCH_SECONDS.observe(time.perf_counter() - started)
+            run_profile.count("embedded_texts", len(texts))
             return embeddings
     
     # Local deterministic fallback embeddings (not production-grade)
     vectors = []
     for t in texts:
         vectors.append(_deterministic_fallback(t))
+    EMBED_TEXTS_TOTAL.inc(len(vectors), source="fallback")
+    EMBED_FALLBACKS_TOTAL.inc(len(vectors), reason="no_provider")
+    EMBED_BATCH_SECONDS.observe(time.perf_counter() - started)
+    run_profile.count("embedded_texts", len(texts))
+    run_profile.count("embedding_fallbacks", len(vectors))
     return vectors
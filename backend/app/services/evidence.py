@@ -0,0 +1,156 @@
+"""
+Evidence drill-down: resolve a cited chunk back to its full text and source page.
+
+Page renders are PNGs of the uploaded PDF page with the chunk's text
+highlighted, cached in a size-bounded DiskCache keyed by document version,
+page, clause and size. A reviewer paging through a report reads from disk
+after the first view, and thumbnails of every control's top evidence are
+rendered in the background as soon as an analysis is saved.
+"""
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+from .cache import DiskCache
+from ..config import (
+    EVIDENCE_CACHE_DIR,
+    EVIDENCE_CACHE_MAX_MB,
+    EVIDENCE_PAGE_DPI,
+    EVIDENCE_THUMB_DPI,
+    UPLOAD_DIR,
+)
+
+RENDER_SIZES = {"page": EVIDENCE_PAGE_DPI, "thumb": EVIDENCE_THUMB_DPI}
+
+# Highlight search runs on short phrases: whole chunks rarely match verbatim
+# across line breaks, hyphenation and the whitespace normalization of chunking
+_PHRASE_WORDS = 8
+_SENTENCE_RE = re.compile(r"(?<=[.!?;:])\s+")
+_UNSAFE_KEY_RE = re.compile(r"[^A-Za-z0-9_-]")
+
+_CACHE = DiskCache(EVIDENCE_CACHE_DIR, EVIDENCE_CACHE_MAX_MB * 1024 * 1024, name="evidence_renders")
+# One thread: prerendering is background work and must not crowd out requests
+_PRERENDER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="evidence-prerender")
+
+
+def get_evidence_cache() -> DiskCache:
+    return _CACHE
+
+
+def source_path(vendor_id: str, doc_id: str) -> Optional[str]:
+    """Uploaded PDF behind a doc_id (its file name under UPLOAD_DIR/<vendor_id>), if present."""
+    if not doc_id or os.path.basename(doc_id) != doc_id or doc_id in (".", ".."):
+        return None
+    root = os.path.realpath(UPLOAD_DIR)
+    path = os.path.realpath(os.path.join(root, vendor_id, doc_id))
+    if not path.startswith(root + os.sep) or not os.path.isfile(path):
+        return None
+    return path
+
+
+def _point_payload(point: Any) -> Dict[str, Any]:
+    payload = dict(getattr(point, "payload", None) or {})
+    payload["point_id"] = getattr(point, "id", None)
+    return payload
+
+
+def resolve_chunk(
+    qwrap,
+    vendor_id: str,
+    doc_id: str,
+    clause_hash: str,
+    point_id: Optional[int] = None,
+) -> Optional[Dict[str, Any]]:
+    """Payload of the cited chunk: by point ID when the evidence carries one, else by clause_hash."""
+    if point_id is not None:
+        for point in qwrap.get_point(point_id) or []:
+            payload = getattr(point, "payload", None) or {}
+            if (payload.get("vendor_id"), payload.get("doc_id"), payload.get("clause_hash")) == (
+                vendor_id, doc_id, clause_hash
+            ):
+                return _point_payload(point)
+    point = qwrap.find_chunk(vendor_id, doc_id, clause_hash)
+    return _point_payload(point) if point is not None else None
+
+
+def chunk_text(payload: Dict[str, Any]) -> str:
+    # Points stored before the full text was kept only have the 800-character preview
+    return payload.get("text") or payload.get("preview") or ""
+
+
+def _phrases(text: str) -> Iterable[str]:
+    for sentence in _SENTENCE_RE.split(text or ""):
+        words = sentence.split()
+        for start in range(0, len(words), _PHRASE_WORDS):
+            phrase = " ".join(words[start:start + _PHRASE_WORDS])
+            if len(phrase) >= 12:
+                yield phrase
+
+
+def render_key(path: str, page: int, clause_hash: Optional[str], size: str) -> str:
+    """Cache key of a render; changes whenever the source file is replaced."""
+    st = os.stat(path)
+    version = hashlib.sha1(f"{path}:{st.st_mtime_ns}:{st.st_size}".encode("utf-8")).hexdigest()[:16]
+    clause = _UNSAFE_KEY_RE.sub("_", clause_hash or "none")[:32]
+    return f"{version}-p{page}-{clause}-{size}.png"
+
+
+def render_page(path: str, page: int, text: Optional[str], size: str = "page") -> bytes:
+    """PNG of one (1-based) page with every phrase of text that occurs on it highlighted."""
+    with fitz.open(path) as doc:
+        if page < 1 or page > doc.page_count:
+            raise IndexError(f"page {page} out of range")
+        pdf_page = doc.load_page(page - 1)
+        if text:
+            textpage = pdf_page.get_textpage()
+            quads = []
+            for phrase in _phrases(text):
+                quads.extend(pdf_page.search_for(phrase, quads=True, textpage=textpage))
+            if quads:
+                # Annotations live only in this in-memory copy; the upload is never modified
+                pdf_page.add_highlight_annot(quads)
+        return pdf_page.get_pixmap(dpi=RENDER_SIZES[size]).tobytes("png")
+
+
+def cached_render(
+    path: str, page: int, clause_hash: Optional[str], size: str, text: Optional[str]
+) -> str:
+    """Path of the cached render, producing it first on a miss."""
+    key = render_key(path, page, clause_hash, size)
+    cached = _CACHE.get(key)
+    if cached is not None:
+        return cached
+    return _CACHE.put(key, render_page(path, page, text, size))
+
+
+def _prerender(vendor_id: str, items: List[Tuple[str, int, str, str]]) -> None:
+    rendered = 0
+    for doc_id, page, clause_hash, text in items:
+        path = source_path(vendor_id, doc_id)
+        if path is None:
+            continue
+        try:
+            cached_render(path, page, clause_hash, "thumb", text)
+            rendered += 1
+        except Exception as e:
+            print(f"Warning: evidence thumbnail failed for {doc_id} p{page}: {e}")
+    print(f"Prerendered {rendered} evidence thumbnails for {vendor_id}")
+
+
+def prerender_thumbnails(vendor_id: str, report: Dict[str, Any], chunks: List[Dict[str, Any]]) -> None:
+    """Queue thumbnails for each control's top evidence; chunks supply the text to highlight."""
+    texts = {(c.get("doc_id"), c.get("clause_hash")): c.get("text") for c in chunks}
+    items: Dict[Tuple[str, int, str], str] = {}
+    for control in report.get("controls", []):
+        for ev in control.get("top_evidence") or []:
+            clause_hash = ev.get("clause_hash")
+            if not clause_hash:
+                continue
+            key = (ev.get("doc"), int(ev.get("page") or 0), clause_hash)
+            items.setdefault(key, texts.get((key[0], clause_hash)) or ev.get("excerpt") or "")
+    if items:
+        _PRERENDER.submit(_prerender, vendor_id, [k + (text,) for k, text in items.items()])
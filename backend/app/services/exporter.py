@@ -0,0 +1,178 @@
+"""
+Report export rendering as byte streams.
+
+Renderers are generators so responses can start before a report is fully
+serialized. tee_to_cache copies a stream into the export artifact cache while
+it is being sent, so the next download of the same (analysis, format) is a
+plain file response. iter_zip packs any number of such streams into a ZIP
+written straight to the response, one entry at a time.
+"""
+import csv
+import io
+import json
+import zipfile
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+from .cache import DiskCache
+from ..config import EXPORT_CACHE_DIR, EXPORT_CACHE_MAX_MB
+
+# Bump when a renderer's output changes so cached artifacts and ETags roll over
+EXPORT_FORMAT_VERSION = 2
+
+# Yield to the response in chunks of about this many bytes
+STREAM_CHUNK_BYTES = 64 * 1024
+
+CSV_HEADER = ["Control ID", "Control Name", "Frameworks", "Status", "Confidence (%)", "Risk Level"]
+
+_CACHE = DiskCache(EXPORT_CACHE_DIR, EXPORT_CACHE_MAX_MB * 1024 * 1024, name="exports")
+
+
+def get_export_cache() -> DiskCache:
+    return _CACHE
+
+
+def csv_rows(report: Dict[str, Any]) -> Iterator[List[Any]]:
+    for control in report.get("controls", []):
+        frameworks = control.get("frameworks", [])
+        if isinstance(frameworks, list):
+            frameworks_str = ",".join(frameworks)
+        else:
+            frameworks_str = str(frameworks or "")
+        yield [
+            control.get("control_id", ""),
+            control.get("control_name", ""),
+            frameworks_str,
+            control.get("status", ""),
+            control.get("confidence", 0),
+            control.get("risk_level", ""),
+        ]
+
+
+def iter_csv(rows: Iterable[List[Any]], header: List[str] = CSV_HEADER) -> Iterator[bytes]:
+    """Encode rows as CSV, yielding roughly STREAM_CHUNK_BYTES at a time."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() >= STREAM_CHUNK_BYTES:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def iter_json(report: Dict[str, Any]) -> Iterator[bytes]:
+    parts: List[str] = []
+    size = 0
+    for part in json.JSONEncoder(indent=2).iterencode(report):
+        parts.append(part)
+        size += len(part)
+        if size >= STREAM_CHUNK_BYTES:
+            yield "".join(parts).encode("utf-8")
+            parts, size = [], 0
+    if parts:
+        yield "".join(parts).encode("utf-8")
+
+
+def render(report: Dict[str, Any], fmt: str) -> Iterator[bytes]:
+    if fmt == "csv":
+        return iter_csv(csv_rows(report))
+    if fmt == "json":
+        return iter_json(report)
+    raise ValueError(f"Unsupported export format: {fmt}")
+
+
+def artifact_key(row_id: int, fmt: str) -> str:
+    return f"analysis-{row_id}-v{EXPORT_FORMAT_VERSION}.{fmt}"
+
+
+def tee_to_cache(chunks: Iterable[bytes], key: str) -> Iterator[bytes]:
+    """Yield chunks while writing them to the artifact cache; a partial stream is never cached."""
+    with _CACHE.open_write(key) as f:
+        for chunk in chunks:
+            f.write(chunk)
+            yield chunk
+
+
+def iter_artifact(row_id: int, fmt: str, load_report: Callable[[], Dict[str, Any]]) -> Iterator[bytes]:
+    """The cached artifact of an analysis if present, else a fresh render (not cached).
+
+    load_report is only called on a cache miss.
+    """
+    path = _CACHE.get(artifact_key(row_id, fmt))
+    if path is None:
+        yield from render(load_report(), fmt)
+        return
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(STREAM_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+
+
+# --- multi-report streams -------------------------------------------------
+
+BULK_CSV_HEADER = ["Vendor ID", "Vendor Name", "Analysis Timestamp", "Overall Risk Score"] + CSV_HEADER
+
+
+def bulk_csv_rows(report: Dict[str, Any]) -> Iterator[List[Any]]:
+    prefix = [
+        report.get("vendor_id", ""),
+        report.get("vendor_name") or "",
+        report.get("analysis_timestamp", ""),
+        report.get("overall_risk_score", ""),
+    ]
+    for row in csv_rows(report):
+        yield prefix + row
+
+
+def iter_ndjson(reports: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    for report in reports:
+        yield json.dumps(report, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable write target collecting ZIP output until the generator hands it on."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(entries: Iterable[Tuple[str, Iterable[bytes]]]) -> Iterator[bytes]:
+    """Stream a ZIP of (name, chunks) entries without a temporary file.
+
+    zipfile writes data descriptors when the target cannot seek, so each entry is
+    compressed and emitted as its chunks arrive; only the central directory (one
+    small record per entry) is held until the end.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        for name, chunks in entries:
+            with zf.open(name, "w") as dest:
+                for chunk in chunks:
+                    dest.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
@@ -0,0 +1,326 @@
+"""
+SQLite-backed analysis history.
+
+One row per saved analysis holding its summary columns, the full UI report,
+the raw per-control results and the run's performance profile
+(services/run_profile.py). The database runs in WAL mode so readers
+never block the writer. Appends are single IMMEDIATE transactions, which
+makes them atomic across threads and uvicorn worker processes sharing the
+file. Listing a vendor's history is an indexed (vendor_id, analysis_timestamp)
+range scan with a LIMIT.
+
+Legacy `{vendor_id}_history.json` files under HISTORY_DIR are imported once,
+the first time the database is opened. The JSON files are left in place.
+Portfolio rollups (services/portfolio.py) are updated in the same transaction
+as each append.
+"""
+import glob
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config import HISTORY_DIR, HISTORY_DB_PATH
+from .metrics import HISTORY_WRITE_SECONDS
+from .portfolio import ROLLUP_SCHEMA, rebuild_rollups, update_rollups
+
+# 2: portfolio rollup tables
+# 3: analyses.profile
+# 4: vendor_control_latest.frameworks (framework-filtered analyses merge into the rollups)
+SCHEMA_VERSION = 4
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    vendor_id TEXT NOT NULL,
+    vendor_name TEXT,
+    analysis_timestamp TEXT NOT NULL,
+    risk_score REAL,
+    document_count INTEGER NOT NULL DEFAULT 0,
+    control_count INTEGER NOT NULL DEFAULT 0,
+    report TEXT,
+    results TEXT,
+    profile TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_analyses_vendor_ts ON analyses (vendor_id, analysis_timestamp);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_SUMMARY_COLUMNS = "vendor_id, vendor_name, analysis_timestamp, risk_score, document_count, control_count"
+
+
+def as_of_bound(as_of: str) -> str:
+    """Upper bound on analysis_timestamp for an as-of lookup, in the stored (naive UTC ISO) form.
+
+    A bare date covers that whole day; an offset is converted to UTC. Raises ValueError
+    for anything that is not an ISO date or timestamp.
+    """
+    value = datetime.fromisoformat(as_of.strip())
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    if len(as_of.strip()) == 10:
+        value = value.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return value.isoformat()
+
+
+def _summary(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "vendor_id": row["vendor_id"],
+        "vendor_name": row["vendor_name"],
+        "analysis_timestamp": row["analysis_timestamp"],
+        "risk_score": row["risk_score"],
+        "document_count": row["document_count"],
+        "control_count": row["control_count"],
+    }
+
+
+class HistoryStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; write paths open their own IMMEDIATE transactions
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self._initialize(conn)
+                    self._initialized = True
+        return conn
+
+    def _initialize(self, conn: sqlite3.Connection) -> None:
+        conn.executescript(_SCHEMA + ROLLUP_SCHEMA)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            columns = {r["name"] for r in conn.execute("PRAGMA table_info(analyses)")}
+            if "profile" not in columns:
+                conn.execute("ALTER TABLE analyses ADD COLUMN profile TEXT")
+            columns = {r["name"] for r in conn.execute("PRAGMA table_info(vendor_control_latest)")}
+            if "frameworks" not in columns:
+                conn.execute("ALTER TABLE vendor_control_latest ADD COLUMN frameworks TEXT")
+            row = conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+            imported = 0
+            if row is None:
+                imported = self._import_json_history(conn)
+                conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (str(imported),))
+            row = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+            if imported or row is None or int(row["value"]) < 4:
+                rebuild_rollups(conn)
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # --- writes ----------------------------------------------------------
+
+    def _insert(
+        self,
+        conn: sqlite3.Connection,
+        vendor_id: str,
+        report: Dict[str, Any],
+        results: Optional[List[Dict[str, Any]]],
+        replace: bool = True,
+        summary: Optional[Dict[str, Any]] = None,
+        profile: Optional[Dict[str, Any]] = None,
+    ) -> Optional[int]:
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        summary = summary or {}
+        cur = conn.execute(
+            f"""{verb} INTO analyses
+                (vendor_id, vendor_name, analysis_timestamp, risk_score, document_count,
+                 control_count, report, results, profile, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (
+                vendor_id,
+                report.get("vendor_name"),
+                report.get("analysis_timestamp") or datetime.utcnow().isoformat(),
+                report.get("overall_risk_score", summary.get("risk_score")),
+                summary.get("document_count", len(report.get("documents_analyzed") or [])),
+                summary.get("control_count", len(report.get("controls") or [])),
+                json.dumps(report) if report.get("controls") is not None else None,
+                json.dumps(results) if results is not None else None,
+                json.dumps(profile) if profile is not None else None,
+                datetime.utcnow().isoformat(),
+            ),
+        )
+        return cur.lastrowid if cur.rowcount else None
+
+    def append(
+        self,
+        vendor_id: str,
+        report: Dict[str, Any],
+        results: Optional[List[Dict[str, Any]]] = None,
+        profile: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        """Atomically record one analysis (replacing one with the same vendor and timestamp)."""
+        conn = self._connect()
+        with HISTORY_WRITE_SECONDS.time():
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                replaced = conn.execute(
+                    "SELECT analysis_timestamp, risk_score FROM analyses WHERE vendor_id = ? AND analysis_timestamp = ?",
+                    (vendor_id, report.get("analysis_timestamp")),
+                ).fetchone()
+                row_id = self._insert(conn, vendor_id, report, results, profile=profile)
+                update_rollups(conn, vendor_id, report, tuple(replaced) if replaced is not None else None)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return row_id
+
+    def _import_json_history(self, conn: sqlite3.Connection) -> int:
+        """Copy legacy per-vendor JSON history (and the full report files it points at) into the table."""
+        imported = 0
+        for history_file in glob.glob(os.path.join(HISTORY_DIR, "*_history.json")):
+            vendor_id = os.path.basename(history_file)[: -len("_history.json")]
+            try:
+                with open(history_file, "r") as f:
+                    entries = json.load(f)
+            except Exception as e:
+                print(f"Warning: Skipping unreadable history file {history_file}: {e}")
+                continue
+            for entry in entries:
+                timestamp = entry.get("analysis_timestamp") or ""
+                base = os.path.join(HISTORY_DIR, f"{vendor_id}_{timestamp.replace(':', '-')}")
+                report = _read_json(f"{base}.json") or {
+                    "vendor_id": vendor_id,
+                    "vendor_name": entry.get("vendor_name"),
+                    "analysis_timestamp": timestamp,
+                }
+                results = _read_json(f"{base}.results.json")
+                if self._insert(conn, vendor_id, report, results, replace=False, summary=entry):
+                    imported += 1
+        if imported:
+            print(f"Imported {imported} analyses from JSON history into {self.path}")
+        return imported
+
+    # --- reads -----------------------------------------------------------
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection, for read queries (e.g. portfolio rollups)."""
+        return self._connect()
+
+    def list_vendor(self, vendor_id: str, limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+        """Most recent analyses first."""
+        rows = self._connect().execute(
+            f"""SELECT {_SUMMARY_COLUMNS} FROM analyses
+                WHERE vendor_id = ?
+                ORDER BY analysis_timestamp DESC
+                LIMIT ? OFFSET ?""",
+            (vendor_id, limit, offset),
+        ).fetchall()
+        return [_summary(r) for r in rows]
+
+    def _row(
+        self, vendor_id: str, timestamp: Optional[str], columns: str, as_of: Optional[str] = None
+    ) -> Optional[sqlite3.Row]:
+        conn = self._connect()
+        if as_of is not None:
+            return conn.execute(
+                f"""SELECT {columns} FROM analyses WHERE vendor_id = ? AND analysis_timestamp <= ?
+                    ORDER BY analysis_timestamp DESC LIMIT 1""",
+                (vendor_id, as_of_bound(as_of)),
+            ).fetchone()
+        if timestamp is None:
+            # Latest analysis via the per-vendor pointer kept in the vendor_latest rollup
+            timestamp_sql = "(SELECT analysis_timestamp FROM vendor_latest WHERE vendor_id = ?)"
+            params: Tuple[Any, ...] = (vendor_id, vendor_id)
+        else:
+            timestamp_sql = "?"
+            params = (vendor_id, timestamp)
+        return conn.execute(
+            f"SELECT {columns} FROM analyses WHERE vendor_id = ? AND analysis_timestamp = {timestamp_sql}",
+            params,
+        ).fetchone()
+
+    def get_version(
+        self, vendor_id: str, timestamp: Optional[str] = None, as_of: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Row ID, timestamp and write time of one analysis, without loading its report.
+
+        Picks the analysis at `timestamp`, else the latest at or before `as_of`, else the latest.
+        The row ID changes whenever the analysis is rewritten, so it identifies a report version.
+        """
+        row = self._row(
+            vendor_id, timestamp,
+            "id, vendor_id, vendor_name, analysis_timestamp, risk_score, created_at, report IS NOT NULL AS has_report",
+            as_of=as_of if timestamp is None else None,
+        )
+        return dict(row) if row is not None else None
+
+    def get_report_by_id(self, row_id: int) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT report FROM analyses WHERE id = ?", (row_id,)).fetchone()
+        if row is None or row["report"] is None:
+            return None
+        return json.loads(row["report"])
+
+    def get_summary(self, vendor_id: str, timestamp: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        row = self._row(vendor_id, timestamp, _SUMMARY_COLUMNS)
+        return _summary(row) if row is not None else None
+
+    def get_report(self, vendor_id: str, timestamp: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Full UI report of one analysis (latest when timestamp is None)."""
+        row = self._row(vendor_id, timestamp, "report")
+        if row is None or row["report"] is None:
+            return None
+        return json.loads(row["report"])
+
+    def get_results(
+        self, vendor_id: str, timestamp: Optional[str] = None
+    ) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """(UI report, raw per-control results), or None if either was not stored."""
+        row = self._row(vendor_id, timestamp, "report, results")
+        if row is None or row["report"] is None or row["results"] is None:
+            return None
+        return json.loads(row["report"]), json.loads(row["results"])
+
+    def get_profile(self, vendor_id: str, timestamp: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Performance profile of one analysis (latest when timestamp is None), if one was recorded."""
+        row = self._row(vendor_id, timestamp, "analysis_timestamp, profile")
+        if row is None or row["profile"] is None:
+            return None
+        return {"analysis_timestamp": row["analysis_timestamp"], **json.loads(row["profile"])}
+
+
+def _read_json(path: str) -> Optional[Any]:
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Warning: Failed to read {path}: {e}")
+        return None
+
+
+_STORE: Optional[HistoryStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_history_store() -> HistoryStore:
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                _STORE = HistoryStore(HISTORY_DB_PATH)
+    return _STORE
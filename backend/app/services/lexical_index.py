@@ -0,0 +1,201 @@
+"""
+Lexical (BM25) inverted index over a vendor's document chunks.
+
+Complements dense retrieval in Qdrant: exact terms such as "MFA" or
+"penetration test" are matched directly, and a control whose key terms appear
+nowhere in the packet can be recognised without an LLM call.
+"""
+import gzip
+import json
+import math
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..config import INDEX_DIR
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Generic English plus the boilerplate wording every control description uses
+_STOPWORDS = frozenset(
+    """
+    a an and are as at be been by can for from has have in into is it its of on or
+    that the their them they this to was were will with within without per etc
+    vendor vendors must shall should ensure implement appropriate provide maintain
+    including based all any such
+    """.split()
+)
+
+INDEX_VERSION = 3
+
+
+def _stem(token: str) -> str:
+    """Very light suffix stripping so "tests"/"testing"/"tested" share a term."""
+    if len(token) > 5 and token.endswith("ing"):
+        return token[:-3]
+    if len(token) > 4 and token.endswith("ed"):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, split on non-alphanumerics, drop stopwords and stem."""
+    return [_stem(t) for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+class LexicalIndex:
+    """BM25 index keyed by chunk; each entry keeps enough metadata to cite evidence."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # docs[i] = [doc_id, page, clause_hash, doc_type, text, sources]
+        self.docs: List[List[Any]] = []
+        self.doc_lens: List[int] = []
+        # term -> {doc_index: term_frequency}
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self._total_len = 0
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add_chunks(self, chunks: Iterable[Dict[str, Any]]) -> None:
+        """Index chunks, replacing anything previously indexed for the same doc_ids."""
+        chunks = list(chunks)
+        self.remove_docs({c.get("doc_id") for c in chunks})
+        for c in chunks:
+            idx = len(self.docs)
+            terms = tokenize(c.get("text", ""))
+            self.docs.append([
+                c.get("doc_id"),
+                c.get("page"),
+                c.get("clause_hash"),
+                c.get("doc_type"),
+                c.get("text") or "",  # whole chunk, so a hit's snippet contains what it matched
+                c.get("sources") if len(c.get("sources") or []) > 1 else None,
+            ])
+            self.doc_lens.append(len(terms))
+            self._total_len += len(terms)
+            for t in terms:
+                tf = self.postings.setdefault(t, {})
+                tf[idx] = tf.get(idx, 0) + 1
+
+    def remove_docs(self, doc_ids) -> None:
+        """Drop all chunks of the given documents and compact the index."""
+        doc_ids = {d for d in doc_ids if d}
+        if not doc_ids or not self.docs:
+            return
+        keep = [i for i, d in enumerate(self.docs) if d[0] not in doc_ids]
+        if len(keep) == len(self.docs):
+            return
+        remap = {old: new for new, old in enumerate(keep)}
+        self.docs = [self.docs[i] for i in keep]
+        self.doc_lens = [self.doc_lens[i] for i in keep]
+        self._total_len = sum(self.doc_lens)
+        postings: Dict[str, Dict[int, int]] = {}
+        for term, tf in self.postings.items():
+            kept = {remap[i]: n for i, n in tf.items() if i in remap}
+            if kept:
+                postings[term] = kept
+        self.postings = postings
+
+    def search(self, query: str, limit: int = 20, min_score: float = 0.0) -> List[Tuple[float, Dict[str, Any]]]:
+        """Return up to `limit` (score, evidence) pairs ordered by BM25 score."""
+        n_docs = len(self.docs)
+        if not n_docs:
+            return []
+        avg_len = (self._total_len / n_docs) or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            tf = self.postings.get(term)
+            if not tf:
+                continue
+            df = len(tf)
+            idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            for idx, freq in tf.items():
+                norm = self.k1 * (1.0 - self.b + self.b * self.doc_lens[idx] / avg_len)
+                scores[idx] = scores.get(idx, 0.0) + idf * freq * (self.k1 + 1.0) / (freq + norm)
+
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+        results = []
+        for idx, score in ranked:
+            if score < min_score or len(results) >= limit:
+                break
+            doc_id, page, clause_hash, doc_type, text, sources = self.docs[idx]
+            results.append((score, {
+                "doc_id": doc_id,
+                "doc_type": doc_type,
+                "page": page,
+                "clause_hash": clause_hash,
+                "text": text,
+                "sources": sources,
+            }))
+        return results
+
+    def to_dict(self) -> Dict[str, Any]:
+        # Postings are flattened to [doc, tf, doc, tf, ...] to keep the file small
+        return {
+            "version": INDEX_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "docs": self.docs,
+            "doc_lens": self.doc_lens,
+            "postings": {
+                t: [x for pair in sorted(tf.items()) for x in pair]
+                for t, tf in self.postings.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LexicalIndex":
+        index = cls(k1=data.get("k1", 1.2), b=data.get("b", 0.75))
+        index.docs = data.get("docs", [])
+        index.doc_lens = data.get("doc_lens", [])
+        index._total_len = sum(index.doc_lens)
+        index.postings = {
+            t: dict(zip(flat[::2], flat[1::2]))
+            for t, flat in data.get("postings", {}).items()
+        }
+        return index
+
+
+def _index_path(vendor_id: str) -> str:
+    return os.path.join(INDEX_DIR, f"{vendor_id}.bm25.json.gz")
+
+
+def load_vendor_index(vendor_id: str) -> Optional[LexicalIndex]:
+    """Load a vendor's index from disk, or None if it has not been built."""
+    path = _index_path(vendor_id)
+    if not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"Warning: Failed to load lexical index for {vendor_id}: {e}")
+        return None
+    if data.get("version") != INDEX_VERSION:
+        return None
+    return LexicalIndex.from_dict(data)
+
+
+def save_vendor_index(vendor_id: str, index: LexicalIndex) -> None:
+    """Atomically write a vendor's index as compact gzipped JSON."""
+    path = _index_path(vendor_id)
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(index.to_dict(), f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def build_vendor_index(vendor_id: str, chunks: List[Dict[str, Any]]) -> LexicalIndex:
+    """Merge freshly extracted chunks into the vendor's on-disk index and persist it."""
+    index = load_vendor_index(vendor_id) or LexicalIndex()
+    index.add_chunks(chunks)
+    try:
+        save_vendor_index(vendor_id, index)
+    except Exception as e:
+        print(f"Warning: Failed to save lexical index for {vendor_id}: {e}")
+    return index
@@ -1,5 +1,134 @@
-from ..config import LLM_PROVIDER, GOOGLE_API_KEY, GEMINI_LLM_MODEL
-import json
+from ..config import (
+    LLM_PROVIDER,
+    GOOGLE_API_KEY,
+    GEMINI_LLM_MODEL,
+    EVIDENCE_TOKEN_BUDGET,
+    LLM_MAX_OUTPUT_TOKENS,
+    LLM_THINKING_BUDGET,
+    LLM_PARSE_RETRIES,
+    LLM_CASCADE_ENABLED,
+    GEMINI_TRIAGE_MODEL,
+    CASCADE_CONFIDENCE_THRESHOLD,
+    CASCADE_EVIDENCE_LOW,
+    CASCADE_EVIDENCE_HIGH,
+    LLM_CALL_DEADLINE_S,
+    LLM_HEDGE_ENABLED,
+    LLM_HEDGE_PERCENTILE,
+    LLM_HEDGE_INITIAL_DELAY_S,
+    LLM_HEDGE_MIN_DELAY_S,
+    LLM_MAX_WORKERS,
+    LLM_BREAKER_ERROR_RATE,
+    LLM_BREAKER_WINDOW,
+    LLM_BREAKER_MIN_CALLS,
+    LLM_BREAKER_COOLDOWN_S,
+)
+from ..models.schemas import ControlClassification
+from .metrics import LLM_CONTROL_SECONDS, LLM_EVENTS_TOTAL, LLM_REQUEST_SECONDS, LLM_TOKENS_TOTAL
+from .prompt_builder import build_evidence_block
+from .resilience import CircuitBreaker, CircuitOpenError, LatencyTracker, hedged_call
+from concurrent.futures import ThreadPoolExecutor
+from pydantic import ValidationError
+import threading
+import time
+
+
+# Process-wide counters for structured-output and transport health
+_COUNTERS = {
+    "calls": 0,
+    "parse_failures": 0,
+    "truncations": 0,
+    "retries": 0,
+    "call_failures": 0,
+    "hedges": 0,
+    "hedge_wins": 0,
+    "breaker_rejections": 0,
+}
+_COUNTERS_LOCK = threading.Lock()
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=LLM_MAX_WORKERS, thread_name_prefix="llm")
+_LATENCY = LatencyTracker()
+_BREAKER = CircuitBreaker(
+    error_rate=LLM_BREAKER_ERROR_RATE,
+    window=LLM_BREAKER_WINDOW,
+    min_calls=LLM_BREAKER_MIN_CALLS,
+    cooldown_s=LLM_BREAKER_COOLDOWN_S,
+)
+
+
+def _count(name, n=1):
+    with _COUNTERS_LOCK:
+        _COUNTERS[name] += n
+    LLM_EVENTS_TOTAL.inc(n, event=name)
+
+
+def get_llm_counters():
+    """Snapshot of LLM call/parse counters since process start."""
+    with _COUNTERS_LOCK:
+        return dict(_COUNTERS)
+
+
+def get_breaker():
+    """The process-wide LLM circuit breaker (shared by all analyses)."""
+    return _BREAKER
+
+
+def _hedge_delay():
+    if not LLM_HEDGE_ENABLED:
+        return None
+    observed = _LATENCY.percentile(LLM_HEDGE_PERCENTILE)
+    return max(LLM_HEDGE_MIN_DELAY_S, observed if observed is not None else LLM_HEDGE_INITIAL_DELAY_S)
+
+
+def _generate(client, usage, **kwargs):
+    """generate_content behind the circuit breaker, with a deadline and one hedged duplicate."""
+    if not _BREAKER.allow():
+        _count("breaker_rejections")
+        raise CircuitOpenError("LLM circuit breaker is open")
+    started = time.perf_counter()
+    try:
+        resp, info = hedged_call(
+            lambda: client.models.generate_content(**kwargs),
+            _EXECUTOR,
+            deadline_s=LLM_CALL_DEADLINE_S,
+            hedge_delay_s=_hedge_delay(),
+        )
+    except Exception:
+        _BREAKER.record_failure()
+        _count("call_failures")
+        raise
+    elapsed = time.perf_counter() - started
+    _BREAKER.record_success()
+    _LATENCY.add(elapsed)
+    LLM_REQUEST_SECONDS.observe(elapsed, model=kwargs.get("model", ""))
+    if info["hedged"]:
+        usage["hedges"] += 1
+        _count("hedges")
+    if info["hedge_won"]:
+        usage["hedge_wins"] += 1
+        _count("hedge_wins")
+    return resp, elapsed
+
+
+# HTTP statuses and gRPC codes of failures that are worth retrying later
+_TRANSIENT_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+_TRANSIENT_CODES = ("RESOURCE_EXHAUSTED", "UNAVAILABLE", "DEADLINE_EXCEEDED", "INTERNAL")
+
+
+def is_transient_error(exc):
+    """Whether a failed call may succeed later (quota, outage, timeout) rather than never."""
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    try:
+        import httpx
+        if isinstance(exc, httpx.TransportError):
+            return True
+    except ImportError:
+        pass
+    code = getattr(exc, "code", None)
+    if isinstance(code, int):
+        return code in _TRANSIENT_STATUSES
+    text = str(exc).upper()
+    return text[:3].isdigit() and int(text[:3]) in _TRANSIENT_STATUSES or any(c in text for c in _TRANSIENT_CODES)
 
 
 # Lazy initialization - Gemini only
@@ -8,22 +137,55 @@ def _get_genai_client():
     if LLM_PROVIDER == "gemini" and GOOGLE_API_KEY:
         try:
             from google import genai
-            client = genai.Client(api_key=GOOGLE_API_KEY)
+            # Transport timeout matches the call deadline so abandoned attempts free their worker
+            client = genai.Client(
+                api_key=GOOGLE_API_KEY,
+                http_options={"timeout": int(LLM_CALL_DEADLINE_S * 1000)},
+            )
             return client
         except Exception as e:
             print(f"Failed to initialize Gemini client: {e}")
             return None
     return None
 
-def classify_control_with_gemini(control_id, control_text, evidences, max_output_tokens=2048, temperature=0.0):
-    # Gemini models don't use separate system prompts - include instructions in the main prompt
-    evidence_text = ""
-    for i, e in enumerate(evidences, start=1):
-        snippet = e.get("snippet","").replace("\n"," ").strip()
-        if snippet:
-            evidence_text += f"{i}) Document: {e.get('doc_id', 'unknown')}, Page: {e.get('page', 'unknown')}\n   Text: \"{snippet}\"\n\n"
 
-    prompt = (
+def _new_usage(evidence_stats):
+    return {
+        "prompt_tokens": 0,
+        "output_tokens": 0,
+        "thinking_tokens": 0,
+        "latency_ms": 0.0,
+        "attempts": 0,
+        "retries": 0,
+        "parse_failures": 0,
+        "hedges": 0,
+        "hedge_wins": 0,
+        **evidence_stats,
+    }
+
+
+def _add_response_usage(usage, resp, latency_ms, model=""):
+    """Add the provider-reported token counts of one call to the running usage."""
+    meta = getattr(resp, "usage_metadata", None)
+    usage["attempts"] += 1
+    for kind, attr in (("prompt", "prompt_token_count"), ("output", "candidates_token_count"),
+                       ("thinking", "thoughts_token_count")):
+        tokens = getattr(meta, attr, None) or 0
+        usage[f"{kind}_tokens"] += tokens
+        if tokens:
+            LLM_TOKENS_TOTAL.inc(tokens, model=model, kind=kind)
+    usage["latency_ms"] = round(usage["latency_ms"] + latency_ms, 1)
+
+
+def _finish_reason(resp):
+    candidates = getattr(resp, "candidates", None) or []
+    reason = getattr(candidates[0], "finish_reason", None) if candidates else None
+    return getattr(reason, "name", None) or (str(reason) if reason is not None else None)
+
+
+def _build_prompt(control_id, control_text, evidence_text):
+    # Gemini models don't use separate system prompts - include instructions in the main prompt
+    return (
         "Analyze evidence to classify a security control as Covered, Partial, or Missing.\n\n"
         "Classification Rules:\n"
         "- Covered: Evidence clearly shows the control is fully implemented as described\n"
@@ -34,173 +196,220 @@ def classify_control_with_gemini(control_id, control_text, evidences, max_output
         "- Consider synonyms and related security practices\n"
         "- If evidence mentions the concept but with different wording, it may still be Covered or Partial\n"
         "- Be lenient with terminology - vendors may use different terms for the same concept\n"
-        "- Use ONLY provided evidence, but interpret it intelligently\n\n"
+        "- Use ONLY provided evidence, but interpret it intelligently\n"
+        "- Keep the rationale to at most three sentences citing specific evidence\n"
+        "- Confidence is a number between 0.0 and 1.0\n\n"
         f"Control ID: {control_id}\n"
         f"Control Name: {control_text}\n\n"
-        f"Evidence Items:\n{evidence_text if evidence_text else 'No evidence provided.'}\n\n"
-        "Return JSON only (no markdown):\n"
-        '{"control_id":"' + control_id + '","classification":"Covered|Partial|Missing","confidence":0.0-1.0,"rationale":"detailed explanation citing specific evidence","followup_questions":["q1","q2"]}'
+        f"Evidence Items:\n{evidence_text if evidence_text else 'No evidence provided.'}\n"
     )
 
+
+def _parse_classification(resp):
+    """Single strict parse of a schema-constrained response.
+
+    Raises ValidationError (or ValueError on an empty body) when the output does
+    not match ControlClassification; there is no partial salvage.
+    """
+    parsed = getattr(resp, "parsed", None)
+    if isinstance(parsed, ControlClassification):
+        return parsed
+    text = getattr(resp, "text", None)
+    if not text:
+        raise ValueError("Empty LLM response")
+    return ControlClassification.model_validate_json(text)
+
+
+# Models that cannot turn thinking off, with the smallest budget they accept
+_MIN_THINKING_BUDGET = (
+    ("gemini-2.5-pro", 128),
+)
+
+
+def _thinking_budget(model):
+    """LLM_THINKING_BUDGET, raised to the model's minimum where a zero budget is rejected."""
+    name = model.rsplit("/", 1)[-1]
+    for prefix, minimum in _MIN_THINKING_BUDGET:
+        if name.startswith(prefix):
+            return max(LLM_THINKING_BUDGET, minimum)
+    return LLM_THINKING_BUDGET
+
+
+def classify_control_with_gemini(
+    control_id,
+    control_text,
+    evidences,
+    max_output_tokens=LLM_MAX_OUTPUT_TOKENS,
+    temperature=0.0,
+    evidence_token_budget=EVIDENCE_TOKEN_BUDGET,
+    model=GEMINI_LLM_MODEL,
+):
+    evidence_text, evidence_stats = build_evidence_block(control_text, evidences, evidence_token_budget)
+    prompt = _build_prompt(control_id, control_text, evidence_text)
+
     client = _get_genai_client()
     if client is None:
-        return {
-            "control_id": control_id,
-            "classification": "Missing",
-            "confidence": 0.0,
-            "rationale": "LLM provider not configured (missing Google API key).",
-            "evidence": evidences,
-            "followup_questions": []
-        }
+        return _create_error_response(
+            control_id, evidences, "LLM provider not configured (missing Google API key)."
+        )
 
-    try:
-        from google.genai import types
-        resp = client.models.generate_content(
-            model=GEMINI_LLM_MODEL,
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=temperature,
-                max_output_tokens=max_output_tokens,
+    from google.genai import types
+
+    usage = _new_usage(evidence_stats)
+    thinking_budget = _thinking_budget(model)
+    error = None
+    truncated = False
+    for attempt in range(LLM_PARSE_RETRIES + 1):
+        if attempt:
+            usage["retries"] += 1
+            _count("retries")
+        try:
+            resp, elapsed = _generate(
+                client,
+                usage,
+                model=model,
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    temperature=temperature,
+                    # Thinking tokens are billed against max_output_tokens on 2.5 models
+                    max_output_tokens=max_output_tokens + thinking_budget,
+                    thinking_config=types.ThinkingConfig(thinking_budget=thinking_budget),
+                    response_mime_type="application/json",
+                    response_schema=ControlClassification,
+                )
             )
-        )
-        text = resp.text
-    except Exception as e:
-        return {
-            "control_id": control_id,
-            "classification": "Missing",
-            "confidence": 0.0,
-            "rationale": f"LLM call failed: {str(e)}",
-            "evidence": evidences,
-            "followup_questions": []
-        }
+        except CircuitOpenError as e:
+            result = _create_error_response(control_id, evidences, str(e), retryable=True)
+            result["circuit_open"] = True
+            result["usage"] = usage
+            return result
+        except Exception as e:
+            result = _create_error_response(
+                control_id, evidences, f"LLM call failed: {str(e)}", retryable=is_transient_error(e)
+            )
+            result["usage"] = usage
+            return result
+        _count("calls")
+        _add_response_usage(usage, resp, elapsed * 1000, model)
 
-    if not text:
-        return {
-            "control_id": control_id,
-            "classification": "Missing",
-            "confidence": 0.0,
-            "rationale": "Empty LLM response",
-            "evidence": evidences,
-            "followup_questions": []
-        }
-
-    # Clean the text - remove markdown code blocks if present
-    cleaned_text = text.strip()
-    
-    # Remove markdown code block markers (```json ... ``` or ``` ... ```)
-    if cleaned_text.startswith("```"):
-        first_newline = cleaned_text.find("\n")
-        if first_newline != -1:
-            cleaned_text = cleaned_text[first_newline + 1:]
-        if cleaned_text.endswith("```"):
-            cleaned_text = cleaned_text[:-3]
-        cleaned_text = cleaned_text.strip()
-    
-    # Try parsing JSON directly first
-    try:
-        parsed = json.loads(cleaned_text)
-        return _validate_parsed_response(parsed, control_id, evidences)
-    except json.JSONDecodeError:
-        pass
-    
-    # If direct parsing fails, try to extract and fix incomplete JSON
-    import re
-    
-    # Find the JSON object start
-    json_start = cleaned_text.find('{')
-    if json_start == -1:
-        return _create_error_response(control_id, text, evidences, "No JSON object found")
-    
-    # Extract from first { to end, then try to complete it
-    json_candidate = cleaned_text[json_start:]
-    
-    # Try to find complete JSON by matching braces
-    brace_count = 0
-    end_pos = -1
-    in_string = False
-    escape_next = False
-    
-    for i, char in enumerate(json_candidate):
-        if escape_next:
-            escape_next = False
-            continue
-        if char == '\\':
-            escape_next = True
-            continue
-        if char == '"' and not escape_next:
-            in_string = not in_string
-            continue
-        if in_string:
-            continue
-        if char == '{':
-            brace_count += 1
-        elif char == '}':
-            brace_count -= 1
-            if brace_count == 0:
-                end_pos = i + 1
-                break
-    
-    if end_pos > 0:
         try:
-            complete_json = json_candidate[:end_pos]
-            parsed = json.loads(complete_json)
-            return _validate_parsed_response(parsed, control_id, evidences)
-        except json.JSONDecodeError:
-            pass
-    
-    # If still failing, try to extract what we can and build a partial response
-    # Extract classification if present
-    classification_match = re.search(r'"classification"\s*:\s*"([^"]+)"', cleaned_text)
-    confidence_match = re.search(r'"confidence"\s*:\s*([0-9.]+)', cleaned_text)
-    rationale_match = re.search(r'"rationale"\s*:\s*"([^"]*)', cleaned_text)
-    
-    if classification_match:
-        classification = classification_match.group(1)
-        confidence = float(confidence_match.group(1)) if confidence_match else 0.5
-        rationale = rationale_match.group(1) if rationale_match else "Response was truncated but classification found"
-        if len(rationale) > 500:
-            rationale = rationale[:500] + "..."
-        
-        return {
-            "control_id": control_id,
-            "classification": classification,
-            "confidence": confidence,
-            "rationale": rationale,
-            "followup_questions": []
-        }
-    
-    return _create_error_response(control_id, text, evidences, "Could not extract JSON")
-
-def _validate_parsed_response(parsed, control_id, evidences):
-    """Validate and fix parsed JSON response"""
-    if "followup_questions" not in parsed:
-        parsed["followup_questions"] = []
-    elif not isinstance(parsed.get("followup_questions"), list):
-        parsed["followup_questions"] = []
-    
-    # Ensure all required fields exist
-    if "control_id" not in parsed:
-        parsed["control_id"] = control_id
-    if "classification" not in parsed:
-        parsed["classification"] = "Missing"
-    if "confidence" not in parsed:
-        parsed["confidence"] = 0.0
-    if "rationale" not in parsed:
-        parsed["rationale"] = "No rationale provided"
-    
-    # Truncate rationale if too long
-    if len(parsed.get("rationale", "")) > 1000:
-        parsed["rationale"] = parsed["rationale"][:1000] + "..."
-    
-    return parsed
-
-def _create_error_response(control_id, text, evidences, error_msg):
-    """Create an error response"""
+            parsed = _parse_classification(resp)
+        except (ValidationError, ValueError) as e:
+            usage["parse_failures"] += 1
+            _count("parse_failures")
+            error = e
+            truncated = _finish_reason(resp) == "MAX_TOKENS"
+            if not truncated:
+                # A temperature-0 re-send returns the same output; only truncation is retried
+                break
+            # Truncated mid-object: the only fix is more room, not a re-roll
+            _count("truncations")
+            max_output_tokens *= 2
+            continue
+
+        result = parsed.model_dump()
+        result["control_id"] = control_id
+        if len(result["rationale"]) > 1000:
+            result["rationale"] = result["rationale"][:1000] + "..."
+        result["usage"] = usage
+        return result
+
+    # Still truncated after every retry: a later run (or a larger LLM_MAX_OUTPUT_TOKENS) may fit it
+    result = _create_error_response(control_id, evidences, f"Unparseable LLM output: {error}", retryable=truncated)
+    result["parse_error"] = True
+    result["usage"] = usage
+    return result
+
+
+def _escalation_reason(result, evidences):
+    """Why a triage answer should be re-checked by the stronger model, or None to accept it."""
+    if result.get("error"):
+        return "triage_error"
+    classification = result.get("classification")
+    if classification == "Partial":
+        return "partial"
+    if float(result.get("confidence") or 0.0) < CASCADE_CONFIDENCE_THRESHOLD:
+        return "low_confidence"
+    scores = [e["similarity_score"] for e in evidences or [] if e.get("similarity_score") is not None]
+    best = max(scores) if scores else 0.0
+    if classification == "Covered" and best < CASCADE_EVIDENCE_LOW:
+        return "covered_on_weak_evidence"
+    if classification == "Missing" and best >= CASCADE_EVIDENCE_HIGH:
+        return "missing_despite_strong_evidence"
+    return None
+
+
+def _merge_usage(first, second):
+    """Sum the per-call counters of two classifications of the same evidence block."""
+    merged = dict(second)
+    for key, value in first.items():
+        if isinstance(value, (int, float)) and not key.startswith("evidence_"):
+            merged[key] = merged.get(key, 0) + value
+    merged["latency_ms"] = round(merged.get("latency_ms", 0.0), 1)
+    return merged
+
+
+def _tier_record(tier, model, result):
+    return {
+        "tier": tier,
+        "model": model,
+        "classification": result.get("classification"),
+        "confidence": result.get("confidence"),
+        "latency_ms": (result.get("usage") or {}).get("latency_ms", 0.0),
+    }
+
+
+def classify_control_tiered(control_id, control_text, evidences, **kwargs):
+    """Classify with GEMINI_TRIAGE_MODEL and escalate uncertain answers to GEMINI_LLM_MODEL.
+
+    The returned dict carries `tiers` (one record per model consulted) and, when
+    escalated, `escalation_reason`; `usage` covers both calls.
+    """
+    triage = classify_control_with_gemini(control_id, control_text, evidences, model=GEMINI_TRIAGE_MODEL, **kwargs)
+    tiers = [_tier_record("triage", GEMINI_TRIAGE_MODEL, triage)]
+    reason = _escalation_reason(triage, evidences)
+    if reason is None:
+        triage["tiers"] = tiers
+        return triage
+
+    strong = classify_control_with_gemini(control_id, control_text, evidences, model=GEMINI_LLM_MODEL, **kwargs)
+    tiers.append(_tier_record("strong", GEMINI_LLM_MODEL, strong))
+    strong["usage"] = _merge_usage(triage.get("usage") or {}, strong.get("usage") or {})
+    strong["tiers"] = tiers
+    strong["escalation_reason"] = reason
+    return strong
+
+
+def _outcome(result):
+    if result.get("circuit_open"):
+        return "circuit_open"
+    if result.get("parse_error"):
+        return "parse_error"
+    if result.get("error"):
+        return "error"
+    return "ok"
+
+
+def classify_control(control_id, control_text, evidences, **kwargs):
+    """Entry point used by the analyzer: cascade when enabled, otherwise the main model only."""
+    started = time.perf_counter()
+    if LLM_CASCADE_ENABLED:
+        result = classify_control_tiered(control_id, control_text, evidences, **kwargs)
+    else:
+        result = classify_control_with_gemini(control_id, control_text, evidences, **kwargs)
+    LLM_CONTROL_SECONDS.observe(time.perf_counter() - started, outcome=_outcome(result or {}))
+    return result
+
+
+def _create_error_response(control_id, evidences, error_msg, retryable=False):
+    """Create an error response; `retryable` marks provider failures a resumed run should try again"""
     return {
         "control_id": control_id,
         "classification": "Missing",
         "confidence": 0.0,
-        "rationale": f"{error_msg}. Raw: {text[:300]}",
+        "rationale": error_msg,
         "evidence": evidences,
-        "followup_questions": []
+        "followup_questions": [],
+        "error": True,
+        "retryable": retryable,
     }
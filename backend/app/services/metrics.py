@@ -0,0 +1,242 @@
+"""
+In-process Prometheus metrics.
+
+A small registry of counters, gauges and histograms, rendered in the
+Prometheus text exposition format (0.0.4) by GET /metrics; no client library
+or push gateway is needed. Values live in this process, so with several
+workers each one is scraped separately.
+
+Instruments are module-level objects defined below; labels are passed as
+keyword arguments at each observation:
+
+    QDRANT_SECONDS.observe(elapsed, op="search")
+    with ANALYSIS_STAGE_SECONDS.time(stage="embed"):
+        ...
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Prometheus client defaults; fits sub-second operations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# LLM calls and whole pipeline stages take seconds to minutes
+SLOW_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        return lines + self._samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    @contextmanager
+    def track_inprogress(self, **labels) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the duration of the block, whether or not it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(s[0]), s[1], s[2])) for k, s in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                le = (("le", _format_value(bound)),)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+# --- pipeline instruments ---------------------------------------------------
+
+ANALYSES_IN_PROGRESS = Gauge(
+    "vendorguard_analyses_in_progress", "Analyses currently executing in this process.")
+ANALYSES_TOTAL = Counter(
+    "vendorguard_analyses_total", "Finished analyses by outcome.", ["status"])
+ANALYSIS_STAGE_SECONDS = Histogram(
+    "vendorguard_analysis_stage_seconds", "Wall time of each analysis pipeline stage.", ["stage"],
+    buckets=SLOW_BUCKETS)
+
+PDF_PAGE_EXTRACT_SECONDS = Histogram(
+    "vendorguard_pdf_page_extract_seconds", "Text block extraction time per PDF page.")
+PDF_PAGES_TOTAL = Counter(
+    "vendorguard_pdf_pages_total", "PDF pages extracted.")
+
+EMBED_BATCH_SECONDS = Histogram(
+    "vendorguard_embedding_batch_seconds", "Time to embed one batch of texts.", buckets=SLOW_BUCKETS)
+EMBED_TEXTS_TOTAL = Counter(
+    "vendorguard_embedding_texts_total", "Texts embedded, by source of the vector.", ["source"])
+EMBED_FALLBACKS_TOTAL = Counter(
+    "vendorguard_embedding_fallbacks_total",
+    "Texts given a deterministic fallback vector instead of a provider embedding.", ["reason"])
+
+QDRANT_SECONDS = Histogram(
+    "vendorguard_qdrant_seconds", "Qdrant request latency by operation.", ["op"])
+QDRANT_ERRORS_TOTAL = Counter(
+    "vendorguard_qdrant_errors_total", "Failed Qdrant requests by operation.", ["op"])
+
+LLM_REQUEST_SECONDS = Histogram(
+    "vendorguard_llm_request_seconds", "Latency of one LLM generate call (including a hedge).", ["model"],
+    buckets=SLOW_BUCKETS)
+LLM_CONTROL_SECONDS = Histogram(
+    "vendorguard_llm_control_seconds", "Time to classify one control, across retries and cascade tiers.",
+    ["outcome"], buckets=SLOW_BUCKETS)
+LLM_EVENTS_TOTAL = Counter(
+    "vendorguard_llm_events_total",
+    "LLM call events: calls, retries, parse_failures, truncations, call_failures, hedges, hedge_wins, "
+    "breaker_rejections.", ["event"])
+LLM_TOKENS_TOTAL = Counter(
+    "vendorguard_llm_tokens_total", "Tokens reported by the LLM provider.", ["model", "kind"])
+
+HISTORY_WRITE_SECONDS = Histogram(
+    "vendorguard_history_write_seconds", "Time to append one analysis (with rollups) to the history store.")
+
+CACHE_REQUESTS_TOTAL = Counter(
+    "vendorguard_cache_requests_total", "Cache lookups by cache and result (hit or miss).", ["cache", "result"])
@@ -1,40 +1,153 @@
 import fitz
 import os
 import re
+from collections import Counter
 from hashlib import sha256
+from .metrics import PDF_PAGE_EXTRACT_SECONDS, PDF_PAGES_TOTAL
+from . import run_profile
+from ..config import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+
+# Fraction of the page height treated as header/footer band
+MARGIN_RATIO = 0.08
+
+_DIGITS_RE = re.compile(r"\d+")
+_SPACE_RE = re.compile(r"\s+")
+_HYPHEN_WRAP_RE = re.compile(r"(?<=[a-z])-\n(?=[a-z])")
+# Sentence boundary: terminal punctuation followed by whitespace and a capital/digit/bullet
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?;:])\s+(?=[A-Z0-9(\"'•\-])")
+_PAGE_NUMBER_RE = re.compile(r"^(page\s*)?#(\s*(of|/)\s*#)?$|^[-–—\s]*#[-–—\s]*$")
+
 
 def ensure_dir(path):
     if not os.path.exists(path):
         os.makedirs(path, exist_ok=True)
 
-def extract_text_chunks(pdf_path, min_len=20, max_len=1200):
+
+def _margin_key(text):
+    """Normalise a header/footer candidate so "Page 3 of 40" matches "Page 4 of 40"."""
+    return _SPACE_RE.sub(" ", _DIGITS_RE.sub("#", text.lower())).strip()
+
+
+def _page_blocks(page):
+    """Return (text, in_margin, margin_key) for each text block on the page, in reading order."""
+    height = page.rect.height or 1.0
+    top, bottom = height * MARGIN_RATIO, height * (1.0 - MARGIN_RATIO)
+    blocks = []
+    for x0, y0, x1, y1, text, _block_no, block_type in page.get_text("blocks", sort=True):
+        if block_type != 0 or not text.strip():
+            continue
+        in_margin = y1 <= top or y0 >= bottom
+        blocks.append((text, in_margin, _margin_key(text) if in_margin else None))
+    return blocks
+
+
+def _running_margins(pages_blocks):
+    """Keys of margin blocks that repeat on at least half the pages (min. two)."""
+    counts = Counter()
+    for blocks in pages_blocks:
+        counts.update({key for _text, in_margin, key in blocks if in_margin})
+    min_pages = max(2, (len(pages_blocks) + 1) // 2)
+    return {key for key, n in counts.items() if n >= min_pages}
+
+
+def _body_blocks(blocks, running):
+    for text, in_margin, key in blocks:
+        if in_margin and (key in running or _PAGE_NUMBER_RE.match(key)):
+            continue
+        yield text
+
+
+def _sentences(block_text):
+    """Split one PyMuPDF block (a paragraph) into sentences.
+
+    Line wraps inside the block are joined first, so sentences that span
+    several lines stay whole.
+    """
+    text = _SPACE_RE.sub(" ", _HYPHEN_WRAP_RE.sub("", block_text)).strip()
+    if not text:
+        return []
+    return [s for s in _SENTENCE_SPLIT_RE.split(text) if s]
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English prose)."""
+    return (len(text) + 3) // 4
+
+
+def _pieces(sentence, max_tokens):
+    """Yield (text, tokens) pieces of a sentence, splitting oversized ones on word boundaries."""
+    tokens = estimate_tokens(sentence)
+    if tokens <= max_tokens:
+        yield sentence, tokens
+        return
+    max_chars = max_tokens * 4
+    start, n = 0, len(sentence)
+    while start < n:
+        end = min(start + max_chars, n)
+        if end < n:
+            cut = sentence.rfind(" ", start, end)
+            if cut > start:
+                end = cut
+        piece = sentence[start:end].strip()
+        if piece:
+            yield piece, estimate_tokens(piece)
+        start = end
+
+
+def _pack(sentences, max_tokens, overlap_tokens):
+    """Greedily pack sentences into chunks of at most max_tokens, in one pass.
+
+    The trailing sentences of each chunk (up to overlap_tokens) are repeated at
+    the start of the next so clauses straddling a boundary are retrievable.
+    """
+    buf, buf_tokens = [], 0
+    for sentence in sentences:
+        for piece, tokens in _pieces(sentence, max_tokens):
+            if buf and buf_tokens + tokens > max_tokens:
+                yield " ".join(text for text, _ in buf)
+                carry, carry_tokens = [], 0
+                for text, t in reversed(buf):
+                    if carry_tokens + t > overlap_tokens or carry_tokens + t + tokens > max_tokens:
+                        break
+                    carry.append((text, t))
+                    carry_tokens += t
+                buf, buf_tokens = carry[::-1], carry_tokens
+            buf.append((piece, tokens))
+            buf_tokens += tokens
+    if buf:
+        yield " ".join(text for text, _ in buf)
+
+
+def extract_text_chunks(pdf_path, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS, min_len=20):
+    """Extract retrieval chunks from a PDF.
+
+    Body blocks of each page are split into sentences and packed into chunks of
+    up to `max_tokens` (estimated), with `overlap_tokens` of trailing context
+    carried between consecutive chunks of a page. Chunks never span pages so
+    each one cites a single page.
+    """
     try:
         doc = fitz.open(pdf_path)
     except Exception:
         return []
-    chunks = []
+    # Running headers/footers and page numbers are detected from block positions
+    # across all pages and dropped before chunking.
+    pages_blocks = []
     for page_no in range(len(doc)):
-        page = doc.load_page(page_no)
-        text = page.get_text("text")
-        if not text or not text.strip():
-            continue
-        parts = re.split(r"\n{2,}|\.\s+", text)
+        with PDF_PAGE_EXTRACT_SECONDS.time():
+            pages_blocks.append(_page_blocks(doc.load_page(page_no)))
+    PDF_PAGES_TOTAL.inc(len(pages_blocks))
+    run_profile.count("pdf_pages", len(pages_blocks))
+    doc.close()
+    running = _running_margins(pages_blocks)
+    chunks = []
+    for page_no, blocks in enumerate(pages_blocks):
+        sentences = (s for text in _body_blocks(blocks, running) for s in _sentences(text))
         idx = 0
-        for part in parts:
-            part = part.strip()
-            if len(part) < min_len:
+        for text in _pack(sentences, max_tokens, overlap_tokens):
+            if len(text) < min_len:
                 continue
-            while len(part) > max_len:
-                chunk = part[:max_len]
-                last = chunk.rfind(". ")
-                if last > int(max_len*0.6):
-                    chunk = chunk[:last+1]
-                h = sha256(chunk.encode("utf8")).hexdigest()
-                chunks.append({"page": page_no+1, "chunk_index": idx, "text": chunk, "clause_hash": h})
-                part = part[len(chunk):].strip()
-                idx += 1
-            if part:
-                h = sha256(part.encode("utf8")).hexdigest()
-                chunks.append({"page": page_no+1, "chunk_index": idx, "text": part, "clause_hash": h})
-                idx += 1
-    return chunks
\ No newline at end of file
+            h = sha256(text.encode("utf8")).hexdigest()
+            chunks.append({"page": page_no+1, "chunk_index": idx, "text": text, "clause_hash": h})
+            idx += 1
+    return chunks
@@ -0,0 +1,303 @@
+"""
+PDF rendering of analysis reports (AnalysisReportUI dicts) with PyMuPDF.
+
+A report is laid out as a sequence of small HTML stories - the executive
+summary, the control table in blocks, then one section per control - placed
+one after another and flowed onto a new page whenever the current one fills.
+Pages go out through a DocumentWriter as they complete, so only the story being
+placed is ever laid out, however many controls the report has.
+
+Layout is CPU-bound and holds the GIL, so renders run in a process pool. Output
+is cached in the export cache keyed by a hash of the rendered content, and
+concurrent requests for the same report share a single render.
+"""
+import hashlib
+import html
+import json
+import multiprocessing
+import os
+import threading
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, List, Optional
+
+import fitz  # PyMuPDF
+
+from .exporter import EXPORT_FORMAT_VERSION, get_export_cache
+from .scoring import risk_level
+from ..config import PDF_RENDER_TIMEOUT_S, PDF_RENDER_WORKERS
+
+_PAGE = fitz.paper_rect("a4")
+_MARGIN = 48
+_BODY = fitz.Rect(_MARGIN, _MARGIN, _PAGE.x1 - _MARGIN, _PAGE.y1 - _MARGIN - 16)
+_FOOTER = fitz.Rect(_MARGIN, _PAGE.y1 - _MARGIN - 8, _PAGE.x1 - _MARGIN, _PAGE.y1 - _MARGIN + 24)
+_SECTION_GAP = 10
+
+# Rows per control-table block; each block is its own story with a repeated header
+TABLE_BLOCK_ROWS = 40
+# Evidence excerpts longer than this are cut in the PDF (the JSON export keeps them whole)
+EXCERPT_CHARS = 600
+
+_RISK_COLORS = {"High": "#c0392b", "Medium": "#d68910", "Low": "#1e8449"}
+
+_CSS = """
+* { font-family: sans-serif; font-size: 9.5pt; color: #222; }
+h1 { font-size: 18pt; margin: 0 0 4pt 0; }
+h2 { font-size: 13pt; margin: 10pt 0 4pt 0; }
+h3 { font-size: 11pt; margin: 6pt 0 2pt 0; }
+p { margin: 2pt 0; }
+ul { margin: 1pt 0 3pt 0; }
+.muted { color: #666; }
+.footer { color: #666; font-size: 8pt; margin: 0; }
+.score { font-size: 28pt; font-weight: bold; }
+.label { font-weight: bold; }
+.excerpt { color: #444; font-style: italic; margin-left: 10pt; }
+table { border-collapse: collapse; width: 100%; }
+th { background-color: #eee; text-align: left; }
+th, td { border: 0.5pt solid #999; padding: 2pt 3pt; font-size: 8.5pt; }
+"""
+
+
+def _e(value: Any) -> str:
+    return html.escape(str(value if value is not None else ""))
+
+
+def _risk(level: Optional[str]) -> str:
+    return f'<span style="color: {_RISK_COLORS.get(level, "#222")}; font-weight: bold">{_e(level)}</span>'
+
+
+def _frameworks(control: Dict[str, Any]) -> str:
+    frameworks = control.get("frameworks") or []
+    return ", ".join(frameworks) if isinstance(frameworks, list) else str(frameworks)
+
+
+def _also_at(ev: Dict[str, Any]) -> str:
+    """Other locations of a near-duplicate excerpt, e.g. "; also b.pdf p.7"."""
+    others = [
+        f"{s.get('doc_id')} p.{s.get('page')}" for s in ev.get("sources") or []
+        if (s.get("doc_id"), s.get("page")) != (ev.get("doc"), ev.get("page"))
+    ]
+    return f"; also {', '.join(others)}" if others else ""
+
+
+def _summary_html(report: Dict[str, Any]) -> str:
+    controls = report.get("controls", [])
+    score = float(report.get("overall_risk_score") or 0.0)
+    statuses = Counter(c.get("status") for c in controls)
+    levels = Counter(c.get("risk_level") for c in controls)
+    parts = [
+        "<h1>Vendor Risk Report</h1>",
+        f"<p><span class='label'>Vendor:</span> {_e(report.get('vendor_name') or report.get('vendor_id'))}"
+        f" <span class='muted'>({_e(report.get('vendor_id'))})</span></p>",
+        f"<p><span class='label'>Analysis:</span> {_e(report.get('analysis_timestamp') or 'n/a')}</p>",
+        "<h2>Executive summary</h2>",
+        f"<p><span class='score'>{score:.1f}</span> <span class='muted'>/ 100 overall risk</span>"
+        f" &#8212; {_risk(risk_level(score))}</p>",
+        f"<p>{len(controls)} controls assessed: "
+        + ", ".join(f"{statuses.get(s, 0)} {s.lower()}" for s in ("Covered", "Partial", "Missing"))
+        + ".</p>",
+        "<p>Control risk: "
+        + ", ".join(f"{_risk(l)} {levels.get(l, 0)}" for l in ("High", "Medium", "Low"))
+        + "</p>",
+    ]
+    documents = report.get("documents_analyzed") or []
+    if documents:
+        parts.append("<h3>Documents analyzed</h3><ul>")
+        for doc in documents:
+            details = ", ".join(str(d) for d in (doc.get("doc_type"), doc.get("page_count") and f"{doc['page_count']} pages") if d)
+            parts.append(f"<li>{_e(doc.get('filename'))}" + (f" <span class='muted'>({_e(details)})</span>" if details else "") + "</li>")
+        parts.append("</ul>")
+    return "".join(parts)
+
+
+def _table_html(controls: List[Dict[str, Any]], first: bool) -> str:
+    rows = "".join(
+        f"<tr><td>{_e(c.get('control_id'))}</td><td>{_e(c.get('control_name'))}</td>"
+        f"<td>{_e(_frameworks(c))}</td><td>{_e(c.get('status'))}</td>"
+        f"<td>{_e(c.get('confidence'))}%</td><td>{_risk(c.get('risk_level'))}</td></tr>"
+        for c in controls
+    )
+    heading = "<h2>Controls</h2>" if first else ""
+    return (
+        f"{heading}<table><tr><th>ID</th><th>Control</th><th>Frameworks</th><th>Status</th>"
+        f"<th>Confidence</th><th>Risk</th></tr>{rows}</table>"
+    )
+
+
+def _list_html(title: str, items: Iterable[str]) -> str:
+    items = [i for i in items if i]
+    if not items:
+        return ""
+    return f"<p class='label'>{_e(title)}</p><ul>" + "".join(f"<li>{_e(i)}</li>" for i in items) + "</ul>"
+
+
+def _control_html(control: Dict[str, Any], first: bool) -> str:
+    parts = ["<h2>Control details</h2>"] if first else []
+    parts.append(f"<h3>{_e(control.get('control_id'))} &#8212; {_e(control.get('control_name'))}</h3>")
+    parts.append(
+        f"<p>{_e(control.get('status'))}, {_e(control.get('confidence'))}% confidence, "
+        f"{_risk(control.get('risk_level'))} risk <span class='muted'>({_e(_frameworks(control))})</span></p>"
+    )
+    parts.append(_list_html("Key findings", control.get("key_findings") or []))
+    parts.append(_list_html("Missing requirements", control.get("missing_requirements") or []))
+    evidence = control.get("top_evidence") or []
+    if evidence:
+        parts.append("<p class='label'>Evidence</p>")
+        for ev in evidence:
+            excerpt = str(ev.get("excerpt") or "")
+            if len(excerpt) > EXCERPT_CHARS:
+                excerpt = excerpt[:EXCERPT_CHARS].rstrip() + "..."
+            parts.append(
+                f"<p>{_e(ev.get('doc'))}, page {_e(ev.get('page'))}{_e(_also_at(ev))}</p>"
+                f"<p class='excerpt'>{_e(excerpt)}</p>"
+            )
+    parts.append(_list_html("Recommended actions", control.get("recommended_actions") or []))
+    return "".join(parts)
+
+
+class _PageFlow:
+    """Places stories top to bottom, starting a new page whenever one fills."""
+
+    def __init__(self, writer: "fitz.DocumentWriter", footer: str):
+        self.writer = writer
+        self.footer = footer
+        self.pages = 0
+        self.device = None
+        self.y = _BODY.y0
+
+    def _new_page(self) -> None:
+        self._end_page()
+        self.device = self.writer.begin_page(_PAGE)
+        self.pages += 1
+        self.y = _BODY.y0
+
+    def _end_page(self) -> None:
+        if self.device is None:
+            return
+        story = fitz.Story(f"<p class='footer'>{_e(self.footer)} &#8212; page {self.pages}</p>", user_css=_CSS)
+        story.place(_FOOTER)
+        story.draw(self.device)
+        self.writer.end_page()
+        self.device = None
+
+    def add(self, content: str) -> None:
+        if self.device is None:
+            self._new_page()
+        story = fitz.Story(content, user_css=_CSS)
+        while True:
+            fresh_page = self.y == _BODY.y0
+            more, filled = story.place(fitz.Rect(_BODY.x0, self.y, _BODY.x1, _BODY.y1))
+            story.draw(self.device)
+            filled = fitz.Rect(filled)
+            self.y = filled.y1 + _SECTION_GAP if not filled.is_empty else self.y
+            if not more:
+                return
+            if fresh_page and filled.is_empty:
+                # Nothing fits even on an empty page; drop the rest rather than loop
+                return
+            self._new_page()
+
+    def close(self) -> int:
+        self._end_page()
+        self.writer.close()
+        return self.pages
+
+
+def render_pdf(report: Dict[str, Any], path: str) -> int:
+    """Write the report as a PDF to path; returns the page count. Runs in a pool worker."""
+    vendor = report.get("vendor_name") or report.get("vendor_id") or ""
+    flow = _PageFlow(fitz.DocumentWriter(path), f"VendorGuard risk report: {vendor}")
+    flow.add(_summary_html(report))
+    controls = report.get("controls", [])
+    for start in range(0, len(controls), TABLE_BLOCK_ROWS):
+        flow.add(_table_html(controls[start:start + TABLE_BLOCK_ROWS], first=start == 0))
+    for i, control in enumerate(controls):
+        flow.add(_control_html(control, first=i == 0))
+    return flow.close()
+
+
+def report_content_hash(report: Dict[str, Any]) -> str:
+    """Hash of everything the PDF shows; run metadata is left out so re-saved copies share a render."""
+    content = {k: v for k, v in report.items() if k != "metadata"}
+    encoded = json.dumps(content, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:24]
+
+
+def pdf_cache_key(report: Dict[str, Any]) -> str:
+    return f"report-{report_content_hash(report)}-v{EXPORT_FORMAT_VERSION}.pdf"
+
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_INFLIGHT: Dict[str, Future] = {}
+# Re-entrant: a render that finishes immediately runs its callback under the caller's hold
+_LOCK = threading.RLock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _POOL
+    with _LOCK:
+        if _POOL is None:
+            # spawn, not fork: the server process has live threads and SQLite connections
+            _POOL = ProcessPoolExecutor(max_workers=max(1, PDF_RENDER_WORKERS),
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _POOL
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _start_render(key: str, report: Dict[str, Any]) -> Future:
+    global _POOL
+    cache = get_export_cache()
+    tmp_path = cache.temp_path(key)
+    result: Future = Future()
+
+    def publish(render: Future) -> None:
+        global _POOL
+        try:
+            pages = render.result()
+            path = cache.commit(key, tmp_path)
+            print(f"Rendered PDF {key}: {pages} pages")
+            result.set_result(path)
+        except BaseException as exc:
+            _remove(tmp_path)
+            if isinstance(exc, BrokenProcessPool):
+                # A worker died (e.g. out of memory); start a fresh pool next time
+                with _LOCK:
+                    _POOL = None
+            result.set_exception(exc)
+        finally:
+            with _LOCK:
+                _INFLIGHT.pop(key, None)
+
+    _INFLIGHT[key] = result
+    try:
+        _get_pool().submit(render_pdf, report, tmp_path).add_done_callback(publish)
+    except BaseException:
+        _INFLIGHT.pop(key, None)
+        _remove(tmp_path)
+        with _LOCK:
+            _POOL = None
+        raise
+    return result
+
+
+def get_report_pdf(report: Dict[str, Any], timeout: float = PDF_RENDER_TIMEOUT_S) -> str:
+    """Path of the report's PDF, rendering it in the worker pool on a cache miss.
+
+    Raises concurrent.futures.TimeoutError after timeout seconds; the render
+    carries on and is cached when it completes.
+    """
+    key = pdf_cache_key(report)
+    path = get_export_cache().get(key)
+    if path is not None:
+        return path
+    with _LOCK:
+        future = _INFLIGHT.get(key) or _start_render(key, report)
+    return future.result(timeout=timeout)
+
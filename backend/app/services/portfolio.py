@@ -0,0 +1,424 @@
+"""
+Portfolio rollups over the analysis history database.
+
+Maintained incrementally inside the same transaction that stores an analysis
+(see history_store.HistoryStore.append), so portfolio queries never scan the
+analyses themselves:
+
+    vendor_latest             latest score, risk level and status counts per vendor
+    vendor_control_latest     each vendor's latest status per control
+    control_status_counts     Covered/Partial/Missing vendor counts per control
+    vendor_framework_coverage each vendor's latest status counts per framework
+    risk_trend_daily          analyses and risk-score sums per day (and per risk level)
+
+Only the most recent analysis of a vendor feeds the "latest" tables; every
+analysis feeds the daily trend. An unfiltered analysis replaces the vendor's
+per-control rows; a framework-filtered one (metadata["framework_filter"])
+upserts just the controls it assessed, so a SOC2-only rerun leaves the
+vendor's other controls in place. Per-framework coverage and the vendor's
+status counts are always recomputed from the merged per-control rows, while
+the risk score is that of the latest analysis as run.
+"""
+import json
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+
+from .scoring import risk_level
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vendor_latest (
+    vendor_id TEXT PRIMARY KEY,
+    vendor_name TEXT,
+    analysis_timestamp TEXT NOT NULL,
+    risk_score REAL,
+    risk_level TEXT,
+    control_count INTEGER NOT NULL DEFAULT 0,
+    covered INTEGER NOT NULL DEFAULT 0,
+    partial INTEGER NOT NULL DEFAULT 0,
+    missing INTEGER NOT NULL DEFAULT 0,
+    analysis_count INTEGER NOT NULL DEFAULT 0,
+    first_analysis_timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_vendor_latest_score ON vendor_latest (risk_score);
+CREATE INDEX IF NOT EXISTS idx_vendor_latest_level ON vendor_latest (risk_level, risk_score);
+CREATE INDEX IF NOT EXISTS idx_vendor_latest_ts ON vendor_latest (analysis_timestamp);
+CREATE TABLE IF NOT EXISTS vendor_control_latest (
+    vendor_id TEXT NOT NULL,
+    control_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    risk_level TEXT NOT NULL,
+    confidence INTEGER,
+    frameworks TEXT,
+    PRIMARY KEY (vendor_id, control_id)
+);
+CREATE INDEX IF NOT EXISTS idx_vendor_control_lookup ON vendor_control_latest (control_id, risk_level, status);
+CREATE TABLE IF NOT EXISTS control_status_counts (
+    control_id TEXT PRIMARY KEY,
+    control_name TEXT,
+    covered INTEGER NOT NULL DEFAULT 0,
+    partial INTEGER NOT NULL DEFAULT 0,
+    missing INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS vendor_framework_coverage (
+    vendor_id TEXT NOT NULL,
+    framework TEXT NOT NULL,
+    covered INTEGER NOT NULL DEFAULT 0,
+    partial INTEGER NOT NULL DEFAULT 0,
+    missing INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (vendor_id, framework)
+);
+CREATE INDEX IF NOT EXISTS idx_framework_coverage_fw ON vendor_framework_coverage (framework);
+CREATE TABLE IF NOT EXISTS risk_trend_daily (
+    day TEXT PRIMARY KEY,
+    analyses INTEGER NOT NULL DEFAULT 0,
+    risk_sum REAL NOT NULL DEFAULT 0,
+    high INTEGER NOT NULL DEFAULT 0,
+    medium INTEGER NOT NULL DEFAULT 0,
+    low INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+_ROLLUP_TABLES = (
+    "vendor_latest",
+    "vendor_control_latest",
+    "control_status_counts",
+    "vendor_framework_coverage",
+    "risk_trend_daily",
+)
+
+# Report status -> rollup count column
+_STATUS_COLUMNS = {"Covered": "covered", "Partial": "partial", "Missing": "missing"}
+
+
+# --- maintenance (called inside the history store's write transaction) ----
+
+
+def _add_trend(conn: sqlite3.Connection, timestamp: str, score: Optional[float], sign: int) -> None:
+    if score is None or not timestamp:
+        return
+    level = (risk_level(score) or "low").lower()
+    conn.execute(
+        f"""INSERT INTO risk_trend_daily (day, analyses, risk_sum, {level}) VALUES (?, ?, ?, ?)
+            ON CONFLICT(day) DO UPDATE SET
+                analyses = analyses + excluded.analyses,
+                risk_sum = risk_sum + excluded.risk_sum,
+                {level} = {level} + excluded.{level}""",
+        (timestamp[:10], sign, sign * score, sign),
+    )
+
+
+def _merge_vendor_controls(
+    conn: sqlite3.Connection, vendor_id: str, controls: List[Dict[str, Any]], replace: bool
+) -> Dict[str, int]:
+    """Fold an analysis's controls into the vendor's latest per-control rows.
+
+    With `replace` the vendor's rows are swapped wholesale; otherwise only the controls
+    present are upserted. Per-framework rows are recomputed from the merged control rows.
+    Returns the vendor's merged status counts.
+    """
+    stale = "SELECT control_id, status FROM vendor_control_latest WHERE vendor_id = ?"
+    params: List[Any] = [vendor_id]
+    if not replace:
+        ids = [c.get("control_id") for c in controls if c.get("control_id")]
+        stale += f" AND control_id IN ({','.join('?' * len(ids))})"
+        params.extend(ids)
+    for control_id, status in conn.execute(stale, params).fetchall():
+        column = _STATUS_COLUMNS[status]
+        conn.execute(f"UPDATE control_status_counts SET {column} = {column} - 1 WHERE control_id = ?", (control_id,))
+        conn.execute(
+            "DELETE FROM vendor_control_latest WHERE vendor_id = ? AND control_id = ?", (vendor_id, control_id)
+        )
+
+    for c in controls:
+        column = _STATUS_COLUMNS.get(c.get("status"))
+        control_id = c.get("control_id")
+        if column is None or not control_id:
+            continue
+        conn.execute(
+            """INSERT OR REPLACE INTO vendor_control_latest
+                   (vendor_id, control_id, status, risk_level, confidence, frameworks)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (vendor_id, control_id, c["status"], c.get("risk_level") or "High", c.get("confidence"),
+             ",".join(c.get("frameworks") or [])),
+        )
+        conn.execute(
+            f"""INSERT INTO control_status_counts (control_id, control_name, {column}) VALUES (?, ?, 1)
+                ON CONFLICT(control_id) DO UPDATE SET
+                    {column} = {column} + 1,
+                    control_name = COALESCE(excluded.control_name, control_name)""",
+            (control_id, c.get("control_name")),
+        )
+
+    counts = {"covered": 0, "partial": 0, "missing": 0}
+    frameworks: Dict[str, Dict[str, int]] = {}
+    for status, fws in conn.execute(
+        "SELECT status, frameworks FROM vendor_control_latest WHERE vendor_id = ?", (vendor_id,)
+    ).fetchall():
+        column = _STATUS_COLUMNS[status]
+        counts[column] += 1
+        for fw in filter(None, (fws or "").split(",")):
+            frameworks.setdefault(fw, {"covered": 0, "partial": 0, "missing": 0})[column] += 1
+
+    conn.execute("DELETE FROM vendor_framework_coverage WHERE vendor_id = ?", (vendor_id,))
+    conn.executemany(
+        """INSERT INTO vendor_framework_coverage (vendor_id, framework, covered, partial, missing)
+           VALUES (?, ?, ?, ?, ?)""",
+        [(vendor_id, fw, n["covered"], n["partial"], n["missing"]) for fw, n in frameworks.items()],
+    )
+    return counts
+
+
+def update_rollups(
+    conn: sqlite3.Connection,
+    vendor_id: str,
+    report: Dict[str, Any],
+    replaced: Optional[Tuple[str, Optional[float]]] = None,
+) -> None:
+    """Fold one stored analysis into the rollups.
+
+    `replaced` is (analysis_timestamp, risk_score) of a row this analysis overwrote, if any.
+    """
+    timestamp = report.get("analysis_timestamp") or ""
+    score = report.get("overall_risk_score")
+    if replaced is not None:
+        _add_trend(conn, replaced[0], replaced[1], -1)
+    _add_trend(conn, timestamp, score, 1)
+
+    current = conn.execute(
+        "SELECT analysis_timestamp FROM vendor_latest WHERE vendor_id = ?", (vendor_id,)
+    ).fetchone()
+    new_analysis = 0 if replaced is not None else 1
+    if current is not None and timestamp < current[0]:
+        # An older analysis arriving late (e.g. imported history): only the totals move
+        conn.execute(
+            """UPDATE vendor_latest SET
+                   analysis_count = analysis_count + ?,
+                   first_analysis_timestamp = MIN(COALESCE(first_analysis_timestamp, ?), ?)
+               WHERE vendor_id = ?""",
+            (new_analysis, timestamp, timestamp, vendor_id),
+        )
+        return
+
+    controls = report.get("controls")
+    framework_filter = (report.get("metadata") or {}).get("framework_filter")
+    # A summary-only history entry (legacy import without its report file) has no per-control data
+    counts = _merge_vendor_controls(conn, vendor_id, controls or [], replace=not framework_filter)
+    if controls is None:
+        control_count = report.get("control_count") or 0
+    else:
+        control_count = counts["covered"] + counts["partial"] + counts["missing"]
+
+    conn.execute(
+        """INSERT INTO vendor_latest
+               (vendor_id, vendor_name, analysis_timestamp, risk_score, risk_level, control_count,
+                covered, partial, missing, analysis_count, first_analysis_timestamp)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+           ON CONFLICT(vendor_id) DO UPDATE SET
+               vendor_name = COALESCE(excluded.vendor_name, vendor_name),
+               analysis_timestamp = excluded.analysis_timestamp,
+               risk_score = excluded.risk_score,
+               risk_level = excluded.risk_level,
+               control_count = excluded.control_count,
+               covered = excluded.covered,
+               partial = excluded.partial,
+               missing = excluded.missing,
+               analysis_count = analysis_count + ?,
+               first_analysis_timestamp = MIN(COALESCE(first_analysis_timestamp, excluded.first_analysis_timestamp),
+                                              excluded.first_analysis_timestamp)""",
+        (
+            vendor_id, report.get("vendor_name"), timestamp, score, risk_level(score), control_count,
+            counts["covered"], counts["partial"], counts["missing"], 1, timestamp,
+            new_analysis,
+        ),
+    )
+
+
+def rebuild_rollups(conn: sqlite3.Connection) -> int:
+    """Recompute every rollup from the analyses table; used on upgrade. Returns analyses folded in."""
+    for table in _ROLLUP_TABLES:
+        conn.execute(f"DELETE FROM {table}")
+    n = 0
+    for row in conn.execute(
+        """SELECT vendor_id, vendor_name, analysis_timestamp, risk_score, control_count, report
+           FROM analyses ORDER BY analysis_timestamp"""
+    ).fetchall():
+        report = json.loads(row["report"]) if row["report"] else {
+            "vendor_name": row["vendor_name"],
+            "control_count": row["control_count"],
+        }
+        report["analysis_timestamp"] = row["analysis_timestamp"]
+        report["overall_risk_score"] = row["risk_score"]
+        update_rollups(conn, row["vendor_id"], report)
+        n += 1
+    return n
+
+
+# --- queries --------------------------------------------------------------
+
+VENDOR_SORT_COLUMNS = (
+    "risk_score", "vendor_name", "vendor_id", "analysis_timestamp",
+    "covered", "partial", "missing", "analysis_count",
+)
+TREND_BUCKETS = {
+    "day": "day",
+    "week": "strftime('%Y-W%W', day)",
+    "month": "substr(day, 1, 7)",
+    "quarter": "substr(day, 1, 4) || '-Q' || ((CAST(substr(day, 6, 2) AS INTEGER) + 2) / 3)",
+}
+
+
+def _page(conn: sqlite3.Connection, select: str, count: str, params: List[Any], limit: int, offset: int) -> Dict[str, Any]:
+    total = conn.execute(count, params).fetchone()[0]
+    rows = conn.execute(f"{select} LIMIT ? OFFSET ?", params + [limit, offset]).fetchall()
+    return {"total": total, "limit": limit, "offset": offset, "items": [dict(r) for r in rows]}
+
+
+def list_vendors(
+    conn: sqlite3.Connection,
+    risk_level: Optional[str] = None,
+    min_score: Optional[float] = None,
+    max_score: Optional[float] = None,
+    search: Optional[str] = None,
+    control_id: Optional[str] = None,
+    control_status: Optional[str] = None,
+    control_risk_level: Optional[str] = None,
+    sort: str = "risk_score",
+    order: str = "desc",
+    limit: int = 50,
+    offset: int = 0,
+) -> Dict[str, Any]:
+    """Page of vendors by their latest analysis, filtered and sorted."""
+    where, params = [], []
+    joins = ""
+    if risk_level:
+        where.append("v.risk_level = ?")
+        params.append(risk_level.capitalize())
+    if min_score is not None:
+        where.append("v.risk_score >= ?")
+        params.append(min_score)
+    if max_score is not None:
+        where.append("v.risk_score <= ?")
+        params.append(max_score)
+    if search:
+        where.append("(v.vendor_id LIKE ? OR v.vendor_name LIKE ?)")
+        params.extend([f"%{search}%", f"%{search}%"])
+    if control_id:
+        joins = "JOIN vendor_control_latest c ON c.vendor_id = v.vendor_id AND c.control_id = ?"
+        params.insert(0, control_id)
+        if control_status:
+            where.append("c.status = ?")
+            params.append(control_status.capitalize())
+        if control_risk_level:
+            where.append("c.risk_level = ?")
+            params.append(control_risk_level.capitalize())
+
+    sort = sort if sort in VENDOR_SORT_COLUMNS else "risk_score"
+    direction = "ASC" if order.lower() == "asc" else "DESC"
+    clause = f"WHERE {' AND '.join(where)}" if where else ""
+    control_columns = ", c.status AS control_status, c.risk_level AS control_risk_level" if control_id else ""
+    return _page(
+        conn,
+        f"""SELECT v.*{control_columns} FROM vendor_latest v {joins} {clause}
+            ORDER BY v.{sort} {direction}, v.vendor_id""",
+        f"SELECT COUNT(*) FROM vendor_latest v {joins} {clause}",
+        params, limit, offset,
+    )
+
+
+def summary(conn: sqlite3.Connection) -> Dict[str, Any]:
+    row = conn.execute(
+        """SELECT COUNT(*) AS vendors, AVG(risk_score) AS avg_risk_score,
+                  SUM(analysis_count) AS analyses FROM vendor_latest"""
+    ).fetchone()
+    by_level = {
+        level: n for level, n in conn.execute(
+            "SELECT risk_level, COUNT(*) FROM vendor_latest WHERE risk_level IS NOT NULL GROUP BY risk_level"
+        ).fetchall()
+    }
+    avg = row["avg_risk_score"]
+    return {
+        "vendors": row["vendors"],
+        "analyses": row["analyses"] or 0,
+        "avg_risk_score": round(avg, 2) if avg is not None else None,
+        "risk_levels": {level: by_level.get(level, 0) for level in ("High", "Medium", "Low")},
+    }
+
+
+def control_status(
+    conn: sqlite3.Connection,
+    sort: str = "missing",
+    order: str = "desc",
+    limit: int = 100,
+    offset: int = 0,
+) -> Dict[str, Any]:
+    """Per-control Covered/Partial/Missing vendor counts across the portfolio."""
+    sort = sort if sort in ("control_id", "covered", "partial", "missing") else "missing"
+    direction = "ASC" if order.lower() == "asc" else "DESC"
+    return _page(
+        conn,
+        f"""SELECT control_id, control_name, covered, partial, missing,
+                   covered + partial + missing AS vendors
+            FROM control_status_counts WHERE covered + partial + missing > 0
+            ORDER BY {sort} {direction}, control_id""",
+        "SELECT COUNT(*) FROM control_status_counts WHERE covered + partial + missing > 0",
+        [], limit, offset,
+    )
+
+
+def framework_coverage(conn: sqlite3.Connection, framework: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Per-framework control coverage across every vendor's latest analysis."""
+    params: List[Any] = []
+    clause = ""
+    if framework:
+        clause = "WHERE framework = ?"
+        params.append(framework)
+    rows = conn.execute(
+        f"""SELECT framework, COUNT(*) AS vendors, SUM(covered) AS covered,
+                   SUM(partial) AS partial, SUM(missing) AS missing
+            FROM vendor_framework_coverage {clause}
+            GROUP BY framework ORDER BY framework""",
+        params,
+    ).fetchall()
+    out = []
+    for r in rows:
+        total = r["covered"] + r["partial"] + r["missing"]
+        item = dict(r)
+        item["coverage"] = round(r["covered"] / total, 4) if total else 0.0
+        out.append(item)
+    return out
+
+
+def risk_trend(
+    conn: sqlite3.Connection,
+    bucket: str = "month",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Average risk score and risk-level counts of all analyses, per time bucket."""
+    expr = TREND_BUCKETS.get(bucket, TREND_BUCKETS["month"])
+    where, params = [], []
+    if start:
+        where.append("day >= ?")
+        params.append(start[:10])
+    if end:
+        where.append("day <= ?")
+        params.append(end[:10])
+    clause = f"WHERE {' AND '.join(where)}" if where else ""
+    rows = conn.execute(
+        f"""SELECT {expr} AS bucket, SUM(analyses) AS analyses, SUM(risk_sum) AS risk_sum,
+                   SUM(high) AS high, SUM(medium) AS medium, SUM(low) AS low
+            FROM risk_trend_daily {clause}
+            GROUP BY bucket HAVING SUM(analyses) > 0 ORDER BY bucket""",
+        params,
+    ).fetchall()
+    return [
+        {
+            "bucket": r["bucket"],
+            "analyses": r["analyses"],
+            "avg_risk_score": round(r["risk_sum"] / r["analyses"], 2),
+            "high": r["high"],
+            "medium": r["medium"],
+            "low": r["low"],
+        }
+        for r in rows
+    ]
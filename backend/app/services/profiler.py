@@ -0,0 +1,178 @@
+"""
+On-demand profiling of a single request.
+
+Two modes:
+  sample   - a background thread reads the request thread's stack from
+             sys._current_frames() every PROFILE_SAMPLE_INTERVAL_MS and counts
+             identical stacks. The output is in collapsed-stack format
+             ("frame;frame;frame count" per line), ready for flamegraph.pl or
+             speedscope. Overhead is one stack walk per interval, so it is safe
+             for production traffic.
+  cprofile - deterministic cProfile of the request thread, saved as a pstats
+             dump (python -m pstats, snakeviz). Precise call counts, but every
+             Python call is slowed down.
+
+Only the thread serving the request is profiled; work handed to shared pools
+(LLM calls, the PDF render processes) shows up as the frame waiting on it.
+"""
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from ..config import PROFILE_DIR, PROFILE_KEEP, PROFILE_SAMPLE_INTERVAL_MS
+
+MODES = {"sample": ".collapsed", "cprofile": ".pstats"}
+
+# cProfile hooks the interpreter's profile function; one deterministic profile at a time
+_CPROFILE_LOCK = threading.Lock()
+
+_UNSAFE_RE = re.compile(r"[^A-Za-z0-9_.-]")
+_PROFILE_ID_RE = re.compile(r"^[A-Za-z0-9_.-]+$")
+# Frames are labelled relative to the backend package or site-packages, not by absolute path
+_ROOTS = sorted(
+    {os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))}
+    | {p for p in sys.path if p and p.endswith(("site-packages", "dist-packages"))},
+    key=len, reverse=True,
+)
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+def _short_path(path: str) -> str:
+    for root in _ROOTS:
+        if path.startswith(root + os.sep):
+            return path[len(root) + 1:]
+    return os.path.basename(path)
+
+
+def _frame_label(code) -> str:
+    # No ";" (the frame separator) in labels
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+class StackSampler:
+    """Counts the stacks of one thread, sampled at a fixed interval from a daemon thread."""
+
+    def __init__(self, thread_id: int, interval_s: float):
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        labels: Dict[Any, str] = {}
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            stack: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            del frame
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def write(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+def profile_path(profile_id: str) -> Optional[str]:
+    """File of a stored profile, or None for unknown or malformed IDs."""
+    if not _PROFILE_ID_RE.match(profile_id or "") or os.path.splitext(profile_id)[1] not in MODES.values():
+        return None
+    path = os.path.join(PROFILE_DIR, profile_id)
+    return path if os.path.isfile(path) else None
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Stored profiles, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    entries = []
+    for name in os.listdir(PROFILE_DIR):
+        ext = os.path.splitext(name)[1]
+        if ext not in MODES.values():
+            continue
+        st = os.stat(os.path.join(PROFILE_DIR, name))
+        entries.append({
+            "profile_id": name,
+            "mode": next(mode for mode, e in MODES.items() if e == ext),
+            "size_bytes": st.st_size,
+            "created_at": datetime.utcfromtimestamp(st.st_mtime).isoformat(),
+        })
+    entries.sort(key=lambda e: e["created_at"], reverse=True)
+    return entries
+
+
+def _prune() -> None:
+    for entry in list_profiles()[PROFILE_KEEP:]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, entry["profile_id"]))
+        except OSError:
+            pass
+
+
+@contextmanager
+def profile_request(mode: str, label: str) -> Iterator[Dict[str, Any]]:
+    """Profile the calling thread for the duration of the block.
+
+    Yields a dict holding the stored profile's ID; its duration (and, for
+    sampling, the sample count) are filled in when the block exits, whether or
+    not it raised. Raises ProfilerBusy if cProfile is already in use.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown profile mode {mode!r}; expected one of {sorted(MODES)}")
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    profile_id = f"{stamp}-{_UNSAFE_RE.sub('_', label)[:48]}-{uuid.uuid4().hex[:6]}{MODES[mode]}"
+    path = os.path.join(PROFILE_DIR, profile_id)
+    info: Dict[str, Any] = {"profile_id": profile_id, "mode": mode}
+    sampler = profiler = None
+    if mode == "sample":
+        sampler = StackSampler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL_MS / 1000.0)
+        sampler.start()
+    else:
+        if not _CPROFILE_LOCK.acquire(blocking=False):
+            raise ProfilerBusy("Another request is already running under cProfile")
+        profiler = cProfile.Profile()
+        profiler.enable()
+    started = time.perf_counter()
+    try:
+        yield info
+    finally:
+        if sampler is not None:
+            sampler.stop()
+            sampler.write(path)
+            info["samples"] = sampler.samples
+        else:
+            profiler.disable()
+            _CPROFILE_LOCK.release()
+            profiler.dump_stats(path)
+        info["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        print(f"Stored {mode} profile {profile_id} ({info['duration_ms']} ms)")
+        _prune()
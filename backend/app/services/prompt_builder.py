@@ -0,0 +1,122 @@
+"""
+Evidence block construction for control classification prompts.
+
+Retrieved snippets overlap heavily (chunk overlap, near-identical clauses in
+different documents) and most of each snippet is unrelated to the control.
+The builder drops redundant snippets, keeps the sentences of each snippet that
+share the most terms with the control, and fits the result into a token
+budget shared out by similarity score.
+"""
+import re
+from typing import Any, Dict, List, Tuple
+
+from .lexical_index import tokenize
+from .parser import estimate_tokens
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?;:])\s+")
+
+# Below this many tokens a snippet is not worth including at all
+MIN_SNIPPET_TOKENS = 40
+# Snippets sharing this fraction of their terms with an earlier one are dropped
+OVERLAP_RATIO = 0.8
+
+
+def _weight(e: Dict[str, Any], default: float) -> float:
+    s = e.get("similarity_score")
+    try:
+        return max(float(s), 0.01) if s is not None else default
+    except (TypeError, ValueError):
+        return default
+
+
+def _is_redundant(terms: set, selected: List[set]) -> bool:
+    if not terms:
+        return True
+    for other in selected:
+        if len(terms & other) >= OVERLAP_RATIO * min(len(terms), len(other)):
+            return True
+    return False
+
+
+def _focus(snippet: str, query_terms: set, max_tokens: int) -> str:
+    """Keep the sentences most relevant to the query, in document order, within max_tokens."""
+    if estimate_tokens(snippet) <= max_tokens:
+        return snippet
+    sentences = [s for s in _SENTENCE_RE.split(snippet) if s.strip()]
+    overlap = [len(query_terms.intersection(tokenize(s))) for s in sentences]
+    ranked = sorted(range(len(sentences)), key=lambda i: (overlap[i], -i), reverse=True)
+    chosen, used = [], 0
+    for i in ranked:
+        if chosen and not overlap[i]:
+            # Unrelated sentences are not worth their tokens once something relevant is kept
+            break
+        t = estimate_tokens(sentences[i])
+        if used + t > max_tokens:
+            continue
+        chosen.append(i)
+        used += t
+    if not chosen:
+        # A single sentence longer than the allowance: hard-cut on a word boundary
+        cut = snippet[: max_tokens * 4].rsplit(" ", 1)[0]
+        return cut + " …"
+    chosen.sort()
+    parts = [sentences[chosen[0]]]
+    for prev, cur in zip(chosen, chosen[1:]):
+        parts.append(("… " if cur != prev + 1 else "") + sentences[cur])
+    return " ".join(parts)
+
+
+def build_evidence_block(
+    query: str,
+    evidences: List[Dict[str, Any]],
+    token_budget: int,
+) -> Tuple[str, Dict[str, int]]:
+    """Render evidences as a numbered prompt block within `token_budget` tokens.
+
+    Evidences are taken in the given (retrieval) order; each one's share of the
+    budget is proportional to its similarity score, with lexical-only hits
+    weighted at the median dense score.
+
+    Returns (text, stats) where stats counts candidates, kept items and tokens.
+    """
+    query_terms = set(tokenize(query))
+    candidates: List[Tuple[Dict[str, Any], str]] = []
+    selected_terms: List[set] = []
+    seen_keys = set()
+    for e in evidences or []:
+        snippet = (e.get("snippet") or "").replace("\n", " ").strip()
+        key = (e.get("doc_id"), e.get("clause_hash"))
+        if not snippet or key in seen_keys:
+            continue
+        terms = set(tokenize(snippet))
+        if _is_redundant(terms, selected_terms):
+            continue
+        seen_keys.add(key)
+        selected_terms.append(terms)
+        candidates.append((e, snippet))
+
+    scores = sorted(float(e["similarity_score"]) for e, _ in candidates if e.get("similarity_score") is not None)
+    default_weight = scores[len(scores) // 2] if scores else 0.5
+    total_weight = sum(_weight(e, default_weight) for e, _ in candidates) or 1.0
+
+    lines: List[str] = []
+    remaining = token_budget
+    for e, snippet in candidates:
+        if remaining < MIN_SNIPPET_TOKENS:
+            break
+        share = int(token_budget * _weight(e, default_weight) / total_weight)
+        allowance = min(remaining, max(MIN_SNIPPET_TOKENS, share))
+        text = _focus(snippet, query_terms, allowance)
+        remaining -= estimate_tokens(text)
+        lines.append(
+            f"{len(lines) + 1}) Document: {e.get('doc_id', 'unknown')}, Page: {e.get('page', 'unknown')}\n"
+            f"   Text: \"{text}\"\n"
+        )
+
+    stats = {
+        "evidence_candidates": len(evidences or []),
+        "evidence_items": len(lines),
+        "evidence_tokens": token_budget - remaining,
+    }
+    return "\n".join(lines), stats
+
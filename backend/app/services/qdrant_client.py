@@ -1,6 +1,25 @@
+import time
+from contextlib import contextmanager
 from qdrant_client import QdrantClient
+from .metrics import QDRANT_ERRORS_TOTAL, QDRANT_SECONDS
+from . import run_profile
 from ..config import QDRANT_URL, QDRANT_API_KEY, EMBEDDING_DIM
 
+
+@contextmanager
+def _observed(op):
+    started = time.perf_counter()
+    try:
+        with QDRANT_SECONDS.time(op=op):
+            yield
+    except Exception:
+        QDRANT_ERRORS_TOTAL.inc(op=op)
+        raise
+    finally:
+        run_profile.count(f"qdrant_{op}_calls")
+        run_profile.count(f"qdrant_{op}_ms", (time.perf_counter() - started) * 1000)
+
+
 class QdrantClientWrapper:
     def __init__(self, collection_name="vendor_chunks"):
         self.client = None
@@ -45,9 +64,11 @@ class QdrantClientWrapper:
 
     def upsert_points(self, points):
         client = self._get_client()
-        client.upsert(collection_name=self.collection_name, points=points)
+        with _observed("upsert"):
+            client.upsert(collection_name=self.collection_name, points=points)
 
-    def search(self, query_vector, limit=10, with_payload=True, vendor_id=None, score_threshold=0.3):
+    def search(self, query_vector, limit=10, with_payload=True, vendor_id=None, score_threshold=0.3,
+               doc_type=None, doc_id=None, offset=0):
         """
         Search for similar vectors with optional filtering.
         
@@ -58,29 +79,55 @@ class QdrantClientWrapper:
             vendor_id: Filter by vendor_id
             score_threshold: Minimum similarity score (0.0-1.0 for cosine similarity)
                             Higher values = more strict (only very similar results)
+            doc_type: Filter by document type
+            doc_id: Filter by document
+            offset: Number of top results to skip (paging)
         """
         client = self._get_client()
         query_filter = None
-        if vendor_id:
+        conditions = [(k, v) for k, v in (("vendor_id", vendor_id), ("doc_type", doc_type), ("doc_id", doc_id)) if v]
+        if conditions:
             from qdrant_client.models import Filter, FieldCondition, MatchValue
             query_filter = Filter(
                 must=[
                     FieldCondition(
-                        key="vendor_id",
-                        match=MatchValue(value=vendor_id)
+                        key=key,
+                        match=MatchValue(value=value)
                     )
+                    for key, value in conditions
                 ]
             )
-        res = client.query_points(
-            collection_name=self.collection_name,
-            query=query_vector,
-            limit=limit,
-            with_payload=with_payload,
-            query_filter=query_filter,
-            score_threshold=score_threshold
-        )
+        with _observed("search"):
+            res = client.query_points(
+                collection_name=self.collection_name,
+                query=query_vector,
+                limit=limit,
+                offset=offset or None,
+                with_payload=with_payload,
+                query_filter=query_filter,
+                score_threshold=score_threshold
+            )
         return res.points
 
     def get_point(self, point_id):
         client = self._get_client()
-        return client.retrieve(collection_name=self.collection_name, ids=[point_id])
+        with _observed("retrieve"):
+            return client.retrieve(collection_name=self.collection_name, ids=[point_id])
+
+    def find_chunk(self, vendor_id, doc_id, clause_hash):
+        """First point of a vendor's document with the given clause_hash, or None."""
+        from qdrant_client.models import Filter, FieldCondition, MatchValue
+        client = self._get_client()
+        conditions = [
+            FieldCondition(key=key, match=MatchValue(value=value))
+            for key, value in (("vendor_id", vendor_id), ("doc_id", doc_id), ("clause_hash", clause_hash))
+        ]
+        with _observed("scroll"):
+            points, _ = client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=Filter(must=conditions),
+                limit=1,
+                with_payload=True,
+                with_vectors=False,
+            )
+        return points[0] if points else None
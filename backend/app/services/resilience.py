@@ -0,0 +1,161 @@
+"""
+Tail-latency and failure controls for provider calls.
+
+- LatencyTracker: rolling window of successful call latencies, used to pick
+  the hedge delay from an observed percentile.
+- hedged_call: runs a call with a deadline and, if it has not answered after
+  the hedge delay, fires one duplicate; the first successful response wins.
+- CircuitBreaker: opens when the recent error rate crosses a threshold so
+  callers fail fast instead of each waiting for its own timeout.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the provider while the breaker is open."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when no attempt answered within the per-call deadline."""
+
+
+class LatencyTracker:
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float, min_samples: int = 10) -> Optional[float]:
+        """q-th quantile (0-1) of recent latencies, or None until min_samples are seen."""
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """Rolling-window error-rate breaker with a half-open probe after a cooldown."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, error_rate: float = 0.5, window: int = 20, min_calls: int = 5, cooldown_s: float = 30.0):
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.cooldown_s = cooldown_s
+        self._outcomes = deque(maxlen=window)  # True = failure
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._rejections = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self) -> None:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown_s:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """Whether a call may proceed; in half-open state only a single probe is let through."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self._rejections += 1
+            return False
+
+    def seconds_until_retry(self) -> float:
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.cooldown_s - (time.monotonic() - self._opened_at))
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._state = self.CLOSED
+                self._outcomes.clear()
+            self._outcomes.append(False)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._outcomes.append(True)
+            if self._state == self.HALF_OPEN:
+                self._trip()
+                return
+            failures = sum(self._outcomes)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.error_rate:
+                self._trip()
+
+    def _trip(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._maybe_half_open()
+            return {
+                "state": self._state,
+                "recent_calls": len(self._outcomes),
+                "recent_failures": sum(self._outcomes),
+                "rejections": self._rejections,
+            }
+
+
+def hedged_call(
+    fn: Callable[[], Any],
+    executor: ThreadPoolExecutor,
+    deadline_s: float,
+    hedge_delay_s: Optional[float],
+) -> Tuple[Any, Dict[str, bool]]:
+    """Call fn with a deadline, hedging once after hedge_delay_s (None disables hedging).
+
+    Returns (result, info) where info has `hedged` and `hedge_won`. Raises the
+    last attempt's exception if every attempt failed, or DeadlineExceeded.
+    Abandoned attempts are left to finish in the executor; their results are ignored.
+    """
+    deadline = time.monotonic() + deadline_s
+    primary = executor.submit(fn)
+    pending = {primary}
+    info = {"hedged": False, "hedge_won": False}
+    last_error: Optional[BaseException] = None
+
+    if hedge_delay_s is not None and hedge_delay_s < deadline_s:
+        done, _ = wait(pending, timeout=hedge_delay_s)
+        if not done:
+            pending.add(executor.submit(fn))
+            info["hedged"] = True
+
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                info["hedge_won"] = future is not primary
+                return future.result(), info
+            last_error = future.exception()
+
+    if pending:
+        raise DeadlineExceeded(f"No response within {deadline_s:.0f}s")
+    raise last_error
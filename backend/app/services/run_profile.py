@@ -0,0 +1,166 @@
+"""
+Per-analysis performance profile.
+
+An analysis opens a RunProfile with start_profile(). Code running below it in
+the same context records into it through the module-level helpers (stage,
+count, record_cache, control_timer), which do nothing when no profile is
+active, so services shared with ad-hoc requests (search, rescore, exports)
+need no special casing.
+
+The finished profile is stored next to the analysis in history
+(analyses.profile) and served by GET /analyze/{vendor_id}/profile, so a slow
+run can be diagnosed after the fact.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional
+
+from .metrics import ANALYSIS_STAGE_SECONDS
+
+# Bump when the shape of to_dict() changes
+PROFILE_VERSION = 1
+
+# Controls listed under "slowest_controls"
+SLOWEST_CONTROLS = 5
+
+_ACTIVE: ContextVar[Optional["RunProfile"]] = ContextVar("vendorguard_run_profile", default=None)
+
+
+def _new_control() -> Dict[str, Any]:
+    return {
+        "retrieval_ms": 0.0,
+        "llm_ms": 0.0,
+        "llm_calls": 0,
+        "prompt_tokens": 0,
+        "output_tokens": 0,
+        "evidence": 0,
+        "outcome": None,
+    }
+
+
+class RunProfile:
+    """Timings and counters of one analysis run."""
+
+    def __init__(self, vendor_id: str, run_id: Optional[str] = None):
+        self.vendor_id = vendor_id
+        self.run_id = run_id
+        self.started_at = datetime.utcnow().isoformat()
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages: Dict[str, float] = {}
+        self.counts: Dict[str, float] = {}
+        self.caches: Dict[str, Dict[str, int]] = {}
+        self.controls: Dict[str, Dict[str, Any]] = {}
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds * 1000
+
+    def count(self, name: str, n: float = 1) -> None:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def cache(self, name: str, hit: bool) -> None:
+        with self._lock:
+            stats = self.caches.setdefault(name, {"hits": 0, "misses": 0})
+            stats["hits" if hit else "misses"] += 1
+
+    def control(self, control_id: str) -> Dict[str, Any]:
+        with self._lock:
+            return self.controls.setdefault(control_id, _new_control())
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            controls = {cid: dict(c) for cid, c in self.controls.items()}
+            for c in controls.values():
+                c["retrieval_ms"] = round(c["retrieval_ms"], 1)
+                c["llm_ms"] = round(c["llm_ms"], 1)
+            caches = {}
+            for name, stats in self.caches.items():
+                total = stats["hits"] + stats["misses"]
+                caches[name] = {**stats, "hit_ratio": round(stats["hits"] / total, 3) if total else None}
+            slowest = sorted(controls, key=lambda cid: controls[cid]["retrieval_ms"] + controls[cid]["llm_ms"],
+                             reverse=True)[:SLOWEST_CONTROLS]
+            return {
+                "version": PROFILE_VERSION,
+                "vendor_id": self.vendor_id,
+                "run_id": self.run_id,
+                "started_at": self.started_at,
+                "total_ms": round((time.perf_counter() - self._started) * 1000, 1),
+                "stages_ms": {name: round(ms, 1) for name, ms in self.stages.items()},
+                "classification_ms": {
+                    "retrieval": round(sum(c["retrieval_ms"] for c in controls.values()), 1),
+                    "llm": round(sum(c["llm_ms"] for c in controls.values()), 1),
+                },
+                "llm": {
+                    "calls": sum(c["llm_calls"] for c in controls.values()),
+                    "prompt_tokens": sum(c["prompt_tokens"] for c in controls.values()),
+                    "output_tokens": sum(c["output_tokens"] for c in controls.values()),
+                },
+                "counts": {name: round(n, 1) if isinstance(n, float) else n for name, n in self.counts.items()},
+                "caches": caches,
+                "slowest_controls": slowest,
+                "controls": controls,
+            }
+
+
+def current_profile() -> Optional[RunProfile]:
+    return _ACTIVE.get()
+
+
+@contextmanager
+def start_profile(vendor_id: str, run_id: Optional[str] = None) -> Iterator[RunProfile]:
+    """Make a new profile the active one for the duration of the block."""
+    profile = RunProfile(vendor_id, run_id)
+    token = _ACTIVE.set(profile)
+    try:
+        yield profile
+    finally:
+        _ACTIVE.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a pipeline stage into the active profile and the stage histogram."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        ANALYSIS_STAGE_SECONDS.observe(elapsed, stage=name)
+        profile = _ACTIVE.get()
+        if profile is not None:
+            profile.add_stage(name, elapsed)
+
+
+def count(name: str, n: float = 1) -> None:
+    profile = _ACTIVE.get()
+    if profile is not None:
+        profile.count(name, n)
+
+
+def record_cache(name: str, hit: bool) -> None:
+    profile = _ACTIVE.get()
+    if profile is not None:
+        profile.cache(name, hit)
+
+
+def control_entry(control_id: str) -> Optional[Dict[str, Any]]:
+    """The active profile's record for a control (created on first use), or None."""
+    profile = _ACTIVE.get()
+    return profile.control(control_id) if profile is not None else None
+
+
+@contextmanager
+def control_timer(control_id: str, field: str) -> Iterator[None]:
+    """Add the block's duration (ms) to a control's field in the active profile."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        entry = control_entry(control_id)
+        if entry is not None:
+            entry[field] += (time.perf_counter() - started) * 1000
@@ -0,0 +1,82 @@
+"""
+Risk scoring over per-control classification results.
+
+Kept separate from the analyzer so a stored analysis can be re-scored (other
+weights, another framework view) without touching retrieval or the LLM.
+"""
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from .control_registry import matching_frameworks
+
+# Share of a control's weight credited as "safe" per classification
+STATUS_VALUES = {"Covered": 1.0, "Partial": 0.5, "Missing": 0.0}
+
+
+def filter_by_framework(results: Sequence[Dict[str, Any]], framework_filter: Optional[str]) -> List[Dict[str, Any]]:
+    """Results in a framework view, matched like the registry's filter over the results' own frameworks."""
+    if not framework_filter:
+        return list(results)
+    frameworks = [{fw.upper() for fw in (r.get("framework") or "").split(",") if fw} for r in results]
+    matching = matching_frameworks(set().union(*frameworks), framework_filter)
+    return [r for r, fws in zip(results, frameworks) if not matching.isdisjoint(fws)]
+
+
+def resolve_weights(
+    results: Sequence[Dict[str, Any]],
+    overrides: Optional[Mapping[str, float]] = None,
+) -> np.ndarray:
+    """Per-result weights; overrides are keyed by control_id or, failing that, category."""
+    overrides = overrides or {}
+    weights = np.empty(len(results), dtype=np.float64)
+    for i, r in enumerate(results):
+        if r.get("control_id") in overrides:
+            weights[i] = overrides[r["control_id"]]
+        elif r.get("category") in overrides:
+            weights[i] = overrides[r["category"]]
+        else:
+            weights[i] = r.get("weight") or 0.0
+    return weights
+
+
+def risk_score(
+    classifications: Sequence[str],
+    confidences: Sequence[float],
+    weights: Sequence[float],
+) -> float:
+    """Overall risk (0-100): 100 minus the confidence-scaled, weighted share of safe controls."""
+    values = np.fromiter((STATUS_VALUES.get(c, 0.0) for c in classifications), dtype=np.float64,
+                         count=len(classifications))
+    conf = np.asarray(confidences, dtype=np.float64)
+    w = np.asarray(weights, dtype=np.float64)
+    total = w.sum()
+    safety = float(np.dot(values * conf, w) / total) if total else 0.0
+    return round((1.0 - safety) * 100, 2)
+
+
+def score_results(
+    results: Sequence[Dict[str, Any]],
+    overrides: Optional[Mapping[str, float]] = None,
+) -> float:
+    """Risk score for stored ControlResult dicts (see schemas.ControlResult)."""
+    return risk_score(
+        [r.get("classification") for r in results],
+        [float(r.get("confidence") or 0.0) for r in results],
+        resolve_weights(results, overrides),
+    )
+
+
+# Same bands as the frontend's RiskScoreCard
+HIGH_RISK_SCORE = 70.0
+MEDIUM_RISK_SCORE = 40.0
+
+
+def risk_level(score: Optional[float]) -> Optional[str]:
+    if score is None:
+        return None
+    if score >= HIGH_RISK_SCORE:
+        return "High"
+    if score >= MEDIUM_RISK_SCORE:
+        return "Medium"
+    return "Low"
@@ -0,0 +1,122 @@
+"""
+Ad-hoc semantic search over a vendor's indexed chunks.
+
+Query embeddings are cached by query text, so a repeated or paged query costs
+no embedding call. Whole result pages are cached too, keyed by the vendor's
+ingestion stamp: a file that mark_ingested() rewrites only once an analysis has
+finished upserting its points. Pages cached while an upsert is still running
+carry the old stamp, so every worker process stops serving them as soon as the
+new points are searchable. mark_ingested() also drops them eagerly in this
+process.
+"""
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from .cache import LRUCache
+from ..config import INDEX_DIR, SEARCH_EMBED_CACHE_SIZE, SEARCH_RESULT_CACHE_SIZE
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Search results show more than an evidence excerpt but less than the full chunk
+SNIPPET_CHARS = 400
+
+_QUERY_VECTORS = LRUCache(SEARCH_EMBED_CACHE_SIZE, name="search_query_vectors")
+_RESULT_PAGES = LRUCache(SEARCH_RESULT_CACHE_SIZE, name="search_results")
+
+
+def normalize_query(query: str) -> str:
+    return _WHITESPACE_RE.sub(" ", query or "").strip()
+
+
+def invalidate_vendor(vendor_id: str) -> int:
+    """Drop cached result pages for a vendor; returns how many were dropped."""
+    return _RESULT_PAGES.discard_where(lambda key: key[0] == vendor_id)
+
+
+def _stamp_path(vendor_id: str) -> str:
+    return os.path.join(INDEX_DIR, f"{vendor_id}.ingested")
+
+
+def ingestion_stamp(vendor_id: str) -> Optional[int]:
+    """Modification time (ns) of the vendor's ingestion stamp, or None before the first ingestion."""
+    try:
+        return os.stat(_stamp_path(vendor_id)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def mark_ingested(vendor_id: str) -> None:
+    """Record that a vendor's points are in Qdrant; call after every upsert."""
+    with open(_stamp_path(vendor_id), "w") as f:
+        f.write(str(time.time_ns()))
+    invalidate_vendor(vendor_id)
+
+
+def query_vector(query: str) -> Optional[List[float]]:
+    """The query's embedding, or None while the provider is failing (nothing is cached then)."""
+    from .embeddings import embed_texts
+
+    qvec = _QUERY_VECTORS.get(query)
+    if qvec is None:
+        try:
+            qvecs = embed_texts([query], strict=True)
+        except Exception as e:
+            print(f"Warning: Failed to embed search query: {e}")
+            return None
+        qvec = qvecs[0] if qvecs else None
+        if qvec is not None:
+            _QUERY_VECTORS.put(query, qvec)
+    return qvec
+
+
+def _to_result(hit: Any) -> Dict[str, Any]:
+    payload = getattr(hit, "payload", None) or {}
+    text = payload.get("text") or payload.get("preview") or ""
+    return {
+        "doc_id": payload.get("doc_id"),
+        "doc_type": payload.get("doc_type"),
+        "page": payload.get("page"),
+        "clause_hash": payload.get("clause_hash"),
+        "point_id": getattr(hit, "id", None),
+        "score": round(float(getattr(hit, "score", 0.0) or 0.0), 4),
+        "snippet": text[:SNIPPET_CHARS],
+    }
+
+
+def search_chunks(
+    qwrap,
+    vendor_id: str,
+    query: str,
+    doc_type: Optional[str] = None,
+    doc_id: Optional[str] = None,
+    limit: int = 10,
+    offset: int = 0,
+    min_score: float = 0.3,
+) -> Dict[str, Any]:
+    """One page of a vendor's chunks ranked by similarity to a free-text query."""
+    started = time.perf_counter()
+    query = normalize_query(query)
+    key = (vendor_id, ingestion_stamp(vendor_id), query, doc_type, doc_id, limit, offset, min_score)
+    page = _RESULT_PAGES.get(key)
+    cached = page is not None
+    if page is None:
+        qvec = query_vector(query)
+        hits = []
+        if qvec is not None:
+            hits = qwrap.search(qvec, limit=limit, with_payload=True, vendor_id=vendor_id,
+                                score_threshold=min_score, doc_type=doc_type, doc_id=doc_id, offset=offset)
+        page = [_to_result(h) for h in hits]
+        if qvec is not None:
+            # A page from a failed embedding is empty for now, not for good
+            _RESULT_PAGES.put(key, page)
+    return {
+        "vendor_id": vendor_id,
+        "query": query,
+        "limit": limit,
+        "offset": offset,
+        "results": page,
+        "cached": cached,
+        "took_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
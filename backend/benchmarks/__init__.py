@@ -0,0 +1 @@
+# Offline benchmarks for the backend; run from backend/ with `python -m benchmarks.<name>`
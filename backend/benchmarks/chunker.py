@@ -0,0 +1,91 @@
+"""
+Chunker benchmark: legacy regex splitter vs. the token-budget packer.
+
+Usage (from backend/):
+    python -m benchmarks.chunker [pdf ...] [--repeat N]
+
+Defaults to the bundled sample packets 1.pdf and 2.pdf.
+"""
+import argparse
+import os
+import re
+import statistics
+import time
+from hashlib import sha256
+
+import fitz
+
+from app.services.parser import extract_text_chunks, estimate_tokens
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PDFS = [os.path.join(BACKEND_DIR, "1.pdf"), os.path.join(BACKEND_DIR, "2.pdf")]
+
+
+def legacy_extract_text_chunks(pdf_path, min_len=20, max_len=1200):
+    """The original `re.split` chunker, kept verbatim for comparison."""
+    try:
+        doc = fitz.open(pdf_path)
+    except Exception:
+        return []
+    chunks = []
+    for page_no in range(len(doc)):
+        page = doc.load_page(page_no)
+        text = page.get_text("text")
+        if not text or not text.strip():
+            continue
+        parts = re.split(r"\n{2,}|\.\s+", text)
+        idx = 0
+        for part in parts:
+            part = part.strip()
+            if len(part) < min_len:
+                continue
+            while len(part) > max_len:
+                chunk = part[:max_len]
+                last = chunk.rfind(". ")
+                if last > int(max_len*0.6):
+                    chunk = chunk[:last+1]
+                h = sha256(chunk.encode("utf8")).hexdigest()
+                chunks.append({"page": page_no+1, "chunk_index": idx, "text": chunk, "clause_hash": h})
+                part = part[len(chunk):].strip()
+                idx += 1
+            if part:
+                h = sha256(part.encode("utf8")).hexdigest()
+                chunks.append({"page": page_no+1, "chunk_index": idx, "text": part, "clause_hash": h})
+                idx += 1
+    return chunks
+
+
+def _measure(fn, path, repeat):
+    timings = []
+    chunks = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = fn(path)
+        timings.append(time.perf_counter() - start)
+    tokens = [estimate_tokens(c["text"]) for c in chunks]
+    return {
+        "chunks": len(chunks),
+        "total_tokens": sum(tokens),
+        "mean_tokens": round(statistics.mean(tokens), 1) if tokens else 0,
+        "median_ms": round(statistics.median(timings) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", default=DEFAULT_PDFS)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    header = f"{'file':<12} {'chunker':<8} {'chunks':>7} {'tokens':>7} {'tok/chunk':>10} {'ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for path in args.pdfs:
+        for name, fn in (("legacy", legacy_extract_text_chunks), ("packed", extract_text_chunks)):
+            r = _measure(fn, path, args.repeat)
+            print(f"{os.path.basename(path):<12} {name:<8} {r['chunks']:>7} {r['total_tokens']:>7} "
+                  f"{r['mean_tokens']:>10} {r['median_ms']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+End-to-end benchmark of POST /analyze, fully offline.
+
+The real FastAPI app and pipeline run against benchmarks.fakes: a deterministic
+genai client (optional latency and fault injection) and qdrant-client's local
+mode. Each measured run analyzes one vendor with synthetic packets (plus the
+bundled 1.pdf and 2.pdf with --samples). Stage durations come from the run
+profile stored with each analysis, and peak RSS is sampled per stage.
+
+Usage (from backend/):
+    python -m benchmarks.e2e [--vendors 5] [--packets 3] [--pages 20] [--samples]
+                             [--llm-latency-ms 0] [--llm-jitter-ms 0] [--embed-latency-ms 0]
+                             [--error-rate 0] [--out results.json] [--compare previous.json]
+
+Results are written as JSON (benchmarks/results/e2e-<timestamp>.json by default);
+--compare prints the change of every p50/p95 and throughput figure against an
+earlier result file.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List
+
+from .common import RssSampler, environment, peak_rss_mb, read_results, summarize, write_results
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_PDFS = [os.path.join(BACKEND_DIR, "1.pdf"), os.path.join(BACKEND_DIR, "2.pdf")]
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+
+def _track_stages(sampler: RssSampler) -> None:
+    """Label RSS samples with the pipeline stage that is running."""
+    from app.services import run_profile
+
+    original = run_profile.stage
+
+    @contextmanager
+    def stage(name):
+        sampler.set_label(name)
+        try:
+            with original(name):
+                yield
+        finally:
+            sampler.set_label("other")
+
+    run_profile.stage = stage
+
+
+def _run_one(http, vendor_id: str, files: List[str]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    r = http.post(f"/api/analyze/{vendor_id}", json={
+        "vendor_name": vendor_id, "file_paths": files, "force_rerun": True,
+    })
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if r.status_code != 200:
+        raise RuntimeError(f"analyze {vendor_id} failed: {r.status_code} {r.text[:300]}")
+    profile = http.get(f"/api/analyze/{vendor_id}/profile").json()
+    counts = profile.get("counts", {})
+    return {
+        "vendor_id": vendor_id,
+        "ms": round(elapsed_ms, 1),
+        "risk_score": r.json()["overall_risk_score"],
+        "pages": counts.get("pdf_pages", 0),
+        "chunks": counts.get("chunks", 0),
+        "controls": len(profile.get("controls", {})),
+        "llm_calls": profile.get("llm", {}).get("calls", 0),
+        "stages_ms": profile.get("stages_ms", {}),
+    }
+
+
+def run(args) -> Dict[str, Any]:
+    # app.config reads the environment at import time
+    os.environ["UPLOAD_DIR"] = os.path.join(args.workdir, "uploads")
+    os.environ.setdefault("EVIDENCE_PRERENDER", "true" if args.prerender else "false")
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from . import fakes
+
+    fake = fakes.install(fakes.FakeGenAIClient(
+        llm_latency_ms=args.llm_latency_ms,
+        llm_jitter_ms=args.llm_jitter_ms,
+        embed_latency_ms=args.embed_latency_ms,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    ))
+
+    packets_dir = os.path.join(args.workdir, "packets")
+    vendors = [f"bench-{i:03d}" for i in range(args.warmup + args.vendors)]
+    files = {
+        v: [fakes.write_synthetic_packet(packets_dir, v, j, args.pages, seed=args.seed) for j in range(args.packets)]
+        + (SAMPLE_PDFS if args.samples else [])
+        for v in vendors
+    }
+
+    runs: List[Dict[str, Any]] = []
+    with TestClient(app) as http, RssSampler() as sampler:
+        _track_stages(sampler)
+        for v in vendors[:args.warmup]:
+            _run_one(http, v, files[v])
+        wall_started = time.perf_counter()
+        for v in vendors[args.warmup:]:
+            runs.append(_run_one(http, v, files[v]))
+            print(f"{v}: {runs[-1]['ms']:.0f} ms, {runs[-1]['chunks']} chunks, {runs[-1]['controls']} controls")
+        wall_s = time.perf_counter() - wall_started
+
+    stage_names = list(dict.fromkeys(name for r in runs for name in r["stages_ms"]))
+    stages = {}
+    for name in stage_names:
+        stages[name] = summarize([r["stages_ms"][name] for r in runs if name in r["stages_ms"]])
+        stages[name]["peak_rss_mb"] = round(sampler.peaks.get(name, 0.0), 1)
+    return {
+        "benchmark": "e2e",
+        "environment": environment(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "workdir")},
+        "runs": runs,
+        "summary": {
+            "analysis_ms": summarize([r["ms"] for r in runs]),
+            "stages_ms": stages,
+            "throughput": {
+                "analyses_per_s": round(len(runs) / wall_s, 3) if wall_s else 0.0,
+                "pages_per_s": round(sum(r["pages"] for r in runs) / wall_s, 1) if wall_s else 0.0,
+                "chunks_per_s": round(sum(r["chunks"] for r in runs) / wall_s, 1) if wall_s else 0.0,
+                "controls_per_s": round(sum(r["controls"] for r in runs) / wall_s, 1) if wall_s else 0.0,
+            },
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "provider": fake.stats(),
+        },
+    }
+
+
+def _print_summary(results: Dict[str, Any]) -> None:
+    summary = results["summary"]
+    header = f"{'stage':<10} {'n':>4} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10} {'peak RSS MB':>12}"
+    print(header)
+    print("-" * len(header))
+    for name, s in summary["stages_ms"].items():
+        print(f"{name:<10} {s['count']:>4} {s['p50']:>10.1f} {s['p95']:>10.1f} {s['max']:>10.1f} {s['peak_rss_mb']:>12.1f}")
+    a = summary["analysis_ms"]
+    print(f"{'analysis':<10} {a['count']:>4} {a['p50']:>10.1f} {a['p95']:>10.1f} {a['max']:>10.1f} "
+          f"{summary['peak_rss_mb']:>12.1f}")
+    print("throughput: " + ", ".join(f"{k}={v}" for k, v in summary["throughput"].items()))
+    print("provider: " + ", ".join(f"{k}={v}" for k, v in summary["provider"].items()))
+
+
+def _delta(new: float, old: float) -> str:
+    if not old:
+        return "n/a"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def _print_comparison(results: Dict[str, Any], previous: Dict[str, Any]) -> None:
+    new, old = results["summary"], previous["summary"]
+    print(f"\nvs. {previous['environment']['timestamp']} (latency: lower is better, throughput: higher is better)")
+    rows = [("analysis", new["analysis_ms"], old.get("analysis_ms", {}))]
+    rows += [(name, s, old.get("stages_ms", {}).get(name, {})) for name, s in new["stages_ms"].items()]
+    for name, s, o in rows:
+        print(f"{name:<10} p50 {s['p50']:>10.1f} ({_delta(s['p50'], o.get('p50', 0))})"
+              f"  p95 {s['p95']:>10.1f} ({_delta(s['p95'], o.get('p95', 0))})")
+    for key, value in new["throughput"].items():
+        print(f"{key:<16} {value:>10} ({_delta(value, old.get('throughput', {}).get(key, 0))})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vendors", type=int, default=5, help="measured analyses (one vendor each)")
+    parser.add_argument("--warmup", type=int, default=1, help="unmeasured analyses run first")
+    parser.add_argument("--packets", type=int, default=3, help="synthetic PDFs per vendor")
+    parser.add_argument("--pages", type=int, default=20, help="pages per synthetic PDF")
+    parser.add_argument("--samples", action="store_true", help="also analyze the bundled 1.pdf and 2.pdf")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of provider calls that fail")
+    parser.add_argument("--prerender", action="store_true", help="keep evidence thumbnail prerendering on")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="where uploads and packets go (a temporary directory by default)")
+    parser.add_argument("--out", help="result file (default: benchmarks/results/e2e-<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    keep_workdir = bool(args.workdir)
+    args.workdir = args.workdir or tempfile.mkdtemp(prefix="vendorguard-bench-")
+    try:
+        results = run(args)
+    finally:
+        if not keep_workdir:
+            shutil.rmtree(args.workdir, ignore_errors=True)
+
+    _print_summary(results)
+    if args.compare:
+        _print_comparison(results, read_results(args.compare))
+    out = args.out or os.path.join(RESULTS_DIR, f"e2e-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.json")
+    write_results(out, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Deterministic local stand-ins for the external services, for offline benchmarks.
+
+FakeGenAIClient mimics the slice of `google.genai.Client` the backend uses
+(`models.embed_content` and `models.generate_content`), with configurable
+latency and fault injection. LocalQdrantClient is qdrant-client's in-process
+local mode. install() points the backend at both, so the real pipeline runs
+unchanged without an API key or a Qdrant server.
+
+write_synthetic_packet() produces vendor PDFs of any size whose text is built
+from the control catalog, so retrieval and classification have real work to do.
+
+UPLOAD_DIR (and any other backend settings) must be set in the environment
+before install() is called, since app.config reads them at import time.
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import fitz  # PyMuPDF
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_CONTROL_ID_RE = re.compile(r"Control ID: (\S+)")
+_CONTROL_NAME_RE = re.compile(r"Control Name: (.*)")
+_EVIDENCE_TEXT_RE = re.compile(r'Text: "(.*)"')
+
+
+class FakeProviderError(RuntimeError):
+    pass
+
+
+def hashed_embedding(text: str, dim: int) -> List[float]:
+    """L2-normalized bag of hashed words: overlapping texts get similar vectors."""
+    vec = [0.0] * dim
+    for word in _WORD_RE.findall(text.lower()):
+        vec[zlib.crc32(word.encode("utf-8")) % dim] += 1.0
+    norm = sum(x * x for x in vec) ** 0.5 or 1.0
+    return [x / norm for x in vec]
+
+
+class FakeModels:
+    def __init__(self, owner: "FakeGenAIClient"):
+        self._owner = owner
+
+    def embed_content(self, model: str, contents: Any, config: Any = None):
+        owner = self._owner
+        owner._delay(owner.embed_latency_ms, 0.0)
+        owner._maybe_fail("embed")
+        texts = contents if isinstance(contents, list) else [contents]
+        with owner._lock:
+            owner.embed_calls += 1
+        return SimpleNamespace(
+            embeddings=[SimpleNamespace(values=hashed_embedding(t, owner.embed_dim)) for t in texts]
+        )
+
+    def generate_content(self, model: str, contents: Any, config: Any = None):
+        owner = self._owner
+        owner._delay(owner.llm_latency_ms, owner.llm_jitter_ms)
+        owner._maybe_fail("generate")
+        prompt = contents if isinstance(contents, str) else str(contents)
+        with owner._lock:
+            owner.generate_calls += 1
+        body = _classify(prompt)
+        text = json.dumps(body)
+        if owner._roll(owner.malformed_rate):
+            # Cut off mid-object, the way a truncated or derailed generation looks
+            text = text[:len(text) // 2]
+        usage = SimpleNamespace(
+            prompt_token_count=len(prompt) // 4,
+            candidates_token_count=len(text) // 4,
+            thoughts_token_count=0,
+        )
+        return SimpleNamespace(
+            text=text,
+            parsed=None,
+            usage_metadata=usage,
+            candidates=[SimpleNamespace(finish_reason="STOP")],
+        )
+
+
+def _classify(prompt: str) -> Dict[str, Any]:
+    """Deterministic verdict from how much of the control's name the evidence mentions."""
+    control_id = _CONTROL_ID_RE.search(prompt)
+    name = _CONTROL_NAME_RE.search(prompt)
+    name_words = set(_WORD_RE.findall(name.group(1).lower())) if name else set()
+    evidence = " ".join(_EVIDENCE_TEXT_RE.findall(prompt)).lower()
+    evidence_words = set(_WORD_RE.findall(evidence))
+    items = prompt.count("Document:")
+    overlap = len(name_words & evidence_words) / len(name_words) if name_words else 0.0
+    if items >= 3 and overlap >= 0.5:
+        classification = "Covered"
+    elif items and overlap >= 0.2:
+        classification = "Partial"
+    else:
+        classification = "Missing"
+    return {
+        "control_id": control_id.group(1) if control_id else "unknown",
+        "classification": classification,
+        "confidence": round(0.55 + 0.4 * overlap, 2),
+        "rationale": f"Synthetic verdict from {items} evidence items ({overlap:.0%} term overlap).",
+        "followup_questions": [],
+    }
+
+
+class FakeGenAIClient:
+    """Stand-in for google.genai.Client with latency and fault injection.
+
+    Args:
+        embed_dim: vector size returned by embed_content (EMBEDDING_DIM by default)
+        llm_latency_ms / llm_jitter_ms: generate_content sleeps latency + uniform(0, jitter)
+        embed_latency_ms: embed_content sleeps this long per call
+        error_rate: probability that any call raises FakeProviderError
+        malformed_rate: probability that generate_content returns unparseable JSON
+        seed: seed of the jitter and fault sequence
+    """
+
+    def __init__(
+        self,
+        embed_dim: Optional[int] = None,
+        llm_latency_ms: float = 0.0,
+        llm_jitter_ms: float = 0.0,
+        embed_latency_ms: float = 0.0,
+        error_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        if embed_dim is None:
+            from app.config import EMBEDDING_DIM
+            embed_dim = EMBEDDING_DIM
+        self.embed_dim = embed_dim
+        self.llm_latency_ms = llm_latency_ms
+        self.llm_jitter_ms = llm_jitter_ms
+        self.embed_latency_ms = embed_latency_ms
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.models = FakeModels(self)
+        self.embed_calls = 0
+        self.generate_calls = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _delay(self, latency_ms: float, jitter_ms: float) -> None:
+        if latency_ms <= 0 and jitter_ms <= 0:
+            return
+        with self._lock:
+            jitter = self._random.random() * jitter_ms
+        time.sleep((latency_ms + jitter) / 1000.0)
+
+    def _roll(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < rate
+
+    def _maybe_fail(self, op: str) -> None:
+        if self._roll(self.error_rate):
+            with self._lock:
+                self.errors += 1
+            raise FakeProviderError(f"503 UNAVAILABLE: injected {op} fault")
+
+    def stats(self) -> Dict[str, int]:
+        return {"embed_calls": self.embed_calls, "generate_calls": self.generate_calls, "errors": self.errors}
+
+
+class LocalQdrantClient:
+    """qdrant-client local mode (":memory:" or a path); accepts dict points like the server does.
+
+    Local mode is not thread-safe (concurrent upserts and searches corrupt its
+    numpy storage), so every call is serialized, as the server would.
+    """
+
+    def __init__(self, location: str = ":memory:"):
+        from qdrant_client import QdrantClient
+
+        self._client = QdrantClient(location) if location == ":memory:" else QdrantClient(path=location)
+        self._lock = threading.RLock()
+
+    def upsert(self, collection_name: str, points, **kwargs):
+        from qdrant_client.models import PointStruct
+
+        points = [PointStruct(**p) if isinstance(p, dict) else p for p in points]
+        with self._lock:
+            return self._client.upsert(collection_name=collection_name, points=points, **kwargs)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def locked(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+
+        return locked
+
+
+def install(client: Optional[FakeGenAIClient] = None, qdrant: Optional[LocalQdrantClient] = None) -> FakeGenAIClient:
+    """Route the backend's provider and Qdrant calls to the stand-ins; returns the fake client."""
+    from app.api import analyze
+    from app.services import embeddings, llm
+
+    client = client or FakeGenAIClient()
+    llm._get_genai_client = lambda: client
+    embeddings._get_genai_client = lambda: client
+    # The search and evidence routers share this wrapper instance
+    analyze.qwrap.client = qdrant or LocalQdrantClient()
+    analyze.qwrap._ensure_collection()
+    return client
+
+
+# --- synthetic vendor packets ---------------------------------------------------
+
+_PACKET_KINDS = ("security_policy", "soc2_type2_report", "iso27001_statement", "dpa", "pentest_summary")
+
+_FILLER = (
+    "This document is reviewed annually by the information security steering committee.",
+    "Exceptions are tracked in the risk register with an owner and a remediation date.",
+    "Employees acknowledge this policy during onboarding and at every annual refresher.",
+    "The scope covers production systems, corporate endpoints and third-party services.",
+    "Changes to this document follow the standard change management procedure.",
+)
+
+_STANCES = (
+    "{vendor} implements the following: {text}.",
+    "{vendor} has documented procedures stating that {text}.",
+    "Partially implemented: {text}; full rollout is planned for next quarter.",
+    "Auditors tested that {text} and noted no exceptions.",
+)
+
+
+def _control_statements() -> List[str]:
+    from app.services.control_registry import get_registry
+
+    return [
+        f"{c['name']}: {c['description'][0].lower()}{c['description'][1:]}"
+        for c in get_registry().snapshot().filter(None)
+    ]
+
+
+def write_synthetic_packet(
+    directory: str, vendor: str, index: int, pages: int, seed: int = 0, coverage: float = 0.6
+) -> str:
+    """Write one synthetic vendor PDF and return its path.
+
+    About `coverage` of the control statements appear somewhere in the packet,
+    interleaved with policy boilerplate; identical arguments give identical files.
+    """
+    rng = random.Random(f"{seed}:{vendor}:{index}")
+    statements = [s for s in _control_statements() if rng.random() < coverage]
+    kind = _PACKET_KINDS[index % len(_PACKET_KINDS)]
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{vendor}_{kind}_{index}.pdf")
+    doc = fitz.open()
+    for page_no in range(pages):
+        paragraphs = [f"{kind.replace('_', ' ').title()} - {vendor} - page {page_no + 1}"]
+        for _ in range(6):
+            if statements and rng.random() < 0.5:
+                stance = rng.choice(_STANCES)
+                paragraphs.append(stance.format(vendor=vendor, text=rng.choice(statements)))
+            else:
+                paragraphs.append(" ".join(rng.sample(_FILLER, 3)))
+        page = doc.new_page()
+        page.insert_textbox(page.rect + (54, 54, -54, -54), "\n\n".join(paragraphs), fontsize=10)
+    doc.save(path)
+    doc.close()
+    return path
@@ -0,0 +1,389 @@
+"""
+Load test: how much concurrent traffic one backend instance sustains.
+
+Closed-loop workers send a weighted mix of upload, analyze, history and export
+requests over HTTP. Concurrency ramps through --levels, each level running for
+--duration seconds. Every level reports throughput, error rates, latency
+percentiles per endpoint and peak server RSS. The report names the lowest
+concurrency that reaches (within --min-gain) the best throughput; beyond it,
+more workers only add latency. A level whose error rate exceeds
+--max-error-rate marks the instance as overloaded.
+
+By default the app runs in this process under uvicorn, on a background thread,
+against the offline stand-ins in benchmarks.fakes, so the real HTTP stack and
+threadpool are exercised. To load a separate process instead, start it with
+--serve and point the load generator at it with --url. Workers draw from
+seeded RNGs, so a scenario (--seed, --mix, --levels) replays the same request
+sequence.
+
+Usage (from backend/):
+    python -m benchmarks.load [--levels 1,2,4,8,16] [--duration 10]
+                              [--mix upload=2,analyze=1,history=4,export=3]
+                              [--llm-latency-ms 50] [--out results.json] [--compare previous.json]
+    python -m benchmarks.load --serve --port 8000      # terminal 1
+    python -m benchmarks.load --url http://127.0.0.1:8000    # terminal 2
+"""
+import argparse
+import os
+import random
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+import httpx
+
+from .common import RssSampler, environment, percentile, read_results, rss_mb, write_results
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+DEFAULT_MIX = "upload=2,analyze=1,history=4,export=3"
+
+
+class Scenario:
+    """Everything a worker needs to build its requests; identical for identical arguments."""
+
+    def __init__(self, args, workdir: str):
+        from . import fakes
+
+        self.seed = args.seed
+        self.timeout_s = args.timeout
+        self.mix = _parse_mix(args.mix)
+        self.vendors = [f"load-{i:02d}" for i in range(args.vendors)]
+        packets_dir = os.path.join(workdir, "packets")
+        self.files = {
+            v: [fakes.write_synthetic_packet(packets_dir, v, j, args.pages, seed=args.seed)
+                for j in range(args.packets)]
+            for v in self.vendors
+        }
+        self.upload_body = open(self.files[self.vendors[0]][0], "rb").read()
+
+
+def _parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise SystemExit(f"Unknown operation {name!r} in --mix; expected {sorted(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# --- operations: each returns the HTTP status -------------------------------------
+
+def _upload(http: httpx.Client, scenario: Scenario, vendor: str, worker: int, rng: random.Random) -> int:
+    files = {"file": (f"{vendor}_policy.pdf", scenario.upload_body, "application/pdf")}
+    return http.post(f"/api/upload/{vendor}", files=files).status_code
+
+
+def _analyze(http: httpx.Client, scenario: Scenario, vendor: str, worker: int, rng: random.Random) -> int:
+    # One vendor ID per worker: concurrent re-runs of the same run ID are rejected with 409 by design
+    return http.post(f"/api/analyze/{vendor}-w{worker}", json={
+        "vendor_name": vendor, "file_paths": scenario.files[vendor], "force_rerun": True,
+    }).status_code
+
+
+def _history(http: httpx.Client, scenario: Scenario, vendor: str, worker: int, rng: random.Random) -> int:
+    return http.get(f"/api/history/{vendor}").status_code
+
+
+def _export(http: httpx.Client, scenario: Scenario, vendor: str, worker: int, rng: random.Random) -> int:
+    return http.get(f"/api/export/{vendor}/{rng.choice(('json', 'csv'))}").status_code
+
+
+OPERATIONS: Dict[str, Callable[..., int]] = {
+    "upload": _upload,
+    "analyze": _analyze,
+    "history": _history,
+    "export": _export,
+}
+
+
+def _worker(
+    base_url: str, scenario: Scenario, level: int, index: int, deadline: float,
+    records: List[Tuple[str, Any, float]],
+) -> None:
+    rng = random.Random(f"{scenario.seed}:{level}:{index}")
+    names = list(scenario.mix)
+    weights = [scenario.mix[n] for n in names]
+    with httpx.Client(base_url=base_url, timeout=scenario.timeout_s) as http:
+        while time.perf_counter() < deadline:
+            op = rng.choices(names, weights)[0]
+            vendor = rng.choice(scenario.vendors)
+            started = time.perf_counter()
+            try:
+                status: Any = OPERATIONS[op](http, scenario, vendor, index, rng)
+            except httpx.TimeoutException:
+                status = "timeout"
+            except httpx.HTTPError:
+                status = "connection_error"
+            records.append((op, status, (time.perf_counter() - started) * 1000))
+
+
+def _latency(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    return {
+        "p50": round(percentile(values, 50), 1),
+        "p95": round(percentile(values, 95), 1),
+        "p99": round(percentile(values, 99), 1),
+        "max": round(max(values), 1),
+    }
+
+
+def _level_stats(level: int, elapsed_s: float, records: List[Tuple[str, Any, float]]) -> Dict[str, Any]:
+    def stats(rows):
+        ok = [ms for _, status, ms in rows if isinstance(status, int) and status < 400]
+        rejected = sum(1 for _, status, _ in rows if isinstance(status, int) and 400 <= status < 500)
+        errors = len(rows) - len(ok) - rejected
+        return {
+            "requests": len(rows),
+            "ok": len(ok),
+            "rejected": rejected,
+            "errors": errors,
+            "error_rate": round(errors / len(rows), 4) if rows else 0.0,
+            "throughput_rps": round(len(ok) / elapsed_s, 2) if elapsed_s else 0.0,
+            "latency_ms": _latency(ok),
+        }
+
+    by_op: Dict[str, List[Tuple[str, Any, float]]] = {}
+    for row in records:
+        by_op.setdefault(row[0], []).append(row)
+    failures: Dict[str, int] = {}
+    for _, status, _ in records:
+        if not isinstance(status, int) or status >= 500:
+            failures[str(status)] = failures.get(str(status), 0) + 1
+    return {
+        "concurrency": level,
+        "duration_s": round(elapsed_s, 2),
+        **stats(records),
+        "failures": failures,
+        "endpoints": {op: stats(rows) for op, rows in sorted(by_op.items())},
+    }
+
+
+def _saturation(levels: List[Dict[str, Any]], min_gain: float, max_error_rate: float) -> Dict[str, Any]:
+    """Where adding workers stops paying off.
+
+    Levels up to the first one over max_error_rate are healthy. The knee is the
+    lowest healthy concurrency that reaches within min_gain of the best healthy
+    throughput; the instance is saturated if any level beyond the knee was run.
+    """
+    healthy: List[Dict[str, Any]] = []
+    overloaded_at = None
+    for level in levels:
+        if level["error_rate"] > max_error_rate:
+            overloaded_at = level["concurrency"]
+            break
+        healthy.append(level)
+    if not healthy:
+        return {"saturated": True, "max_useful_concurrency": None, "peak_throughput_rps": 0.0,
+                "overloaded_at": overloaded_at, "reason": "error rate exceeded at the first level"}
+    peak = max(level["throughput_rps"] for level in healthy)
+    knee = next(level for level in healthy if level["throughput_rps"] >= peak * (1 - min_gain))
+    if overloaded_at is not None:
+        reason = f"error rate above {max_error_rate:.1%} from concurrency {overloaded_at}"
+    elif knee is not healthy[-1]:
+        reason = (f"throughput flat ({peak} rps peak) beyond concurrency {knee['concurrency']}; "
+                  f"latency only grows from there")
+    else:
+        reason = "not reached; extend --levels"
+    return {
+        "saturated": knee is not healthy[-1] or overloaded_at is not None,
+        "max_useful_concurrency": knee["concurrency"],
+        "peak_throughput_rps": peak,
+        "overloaded_at": overloaded_at,
+        "reason": reason,
+    }
+
+
+# --- server ----------------------------------------------------------------------
+
+def _install_fakes(args) -> None:
+    from . import fakes
+
+    fakes.install(fakes.FakeGenAIClient(
+        llm_latency_ms=args.llm_latency_ms,
+        llm_jitter_ms=args.llm_jitter_ms,
+        embed_latency_ms=args.embed_latency_ms,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    ))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(args, port: int):
+    import uvicorn
+    from app.main import app
+
+    _install_fakes(args)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, name="uvicorn", daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("uvicorn failed to start")
+        time.sleep(0.05)
+    return server, thread
+
+
+def _serve(args) -> None:
+    import uvicorn
+    from app.main import app
+
+    _install_fakes(args)
+    print(f"Serving with offline stand-ins on http://127.0.0.1:{args.port} (UPLOAD_DIR={os.environ['UPLOAD_DIR']})")
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning", access_log=False)
+
+
+# --- driver ----------------------------------------------------------------------
+
+def _prepare(base_url: str, scenario: Scenario) -> None:
+    """One analysis per vendor, so history and export requests have something to read."""
+    with httpx.Client(base_url=base_url, timeout=scenario.timeout_s) as http:
+        for vendor in scenario.vendors:
+            r = http.post(f"/api/analyze/{vendor}", json={
+                "vendor_name": vendor, "file_paths": scenario.files[vendor], "force_rerun": True,
+            })
+            if r.status_code != 200:
+                raise RuntimeError(f"Setup analysis of {vendor} failed: {r.status_code} {r.text[:300]}")
+
+
+def run(args) -> Dict[str, Any]:
+    scenario = Scenario(args, args.workdir)
+    server = None
+    in_process = not args.url
+    if in_process:
+        port = _free_port()
+        server, thread = _start_server(args, port)
+        base_url = f"http://127.0.0.1:{port}"
+    else:
+        base_url = args.url.rstrip("/")
+
+    levels_out: List[Dict[str, Any]] = []
+    try:
+        _prepare(base_url, scenario)
+        # Server memory is only visible when it shares this process
+        with RssSampler() as sampler:
+            for level in args.levels:
+                records: List[Tuple[str, Any, float]] = []
+                label = f"c{level}"
+                sampler.set_label(label if in_process else None)
+                started = time.perf_counter()
+                deadline = started + args.duration
+                workers = [
+                    threading.Thread(target=_worker, args=(base_url, scenario, level, i, deadline, records),
+                                     name=f"load-{level}-{i}", daemon=True)
+                    for i in range(level)
+                ]
+                for w in workers:
+                    w.start()
+                for w in workers:
+                    w.join()
+                stats = _level_stats(level, time.perf_counter() - started, records)
+                if in_process:
+                    stats["peak_rss_mb"] = round(sampler.peaks.get(label, rss_mb()), 1)
+                levels_out.append(stats)
+                _print_level(stats)
+    finally:
+        if server is not None:
+            server.should_exit = True
+            thread.join(timeout=10)
+
+    return {
+        "benchmark": "load",
+        "environment": environment(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "workdir", "serve")},
+        "target": "in-process uvicorn" if in_process else base_url,
+        "levels": levels_out,
+        "saturation": _saturation(levels_out, args.min_gain, args.max_error_rate),
+    }
+
+
+def _print_level(stats: Dict[str, Any]) -> None:
+    rss = f"  rss {stats['peak_rss_mb']:.0f} MB" if "peak_rss_mb" in stats else ""
+    lat = stats["latency_ms"]
+    print(f"c={stats['concurrency']:<4} {stats['throughput_rps']:>8.2f} rps  err {stats['error_rate']:>6.1%}  "
+          f"p50 {lat.get('p50', 0):>8.1f}  p95 {lat.get('p95', 0):>8.1f}  p99 {lat.get('p99', 0):>8.1f} ms{rss}")
+    for op, s in stats["endpoints"].items():
+        lat = s["latency_ms"]
+        print(f"    {op:<8} n={s['requests']:<6} err {s['error_rate']:>6.1%}  rejected {s['rejected']:<4} "
+              f"p50 {lat.get('p50', 0):>8.1f}  p95 {lat.get('p95', 0):>8.1f}  p99 {lat.get('p99', 0):>8.1f} ms")
+
+
+def _print_comparison(results: Dict[str, Any], previous: Dict[str, Any]) -> None:
+    print(f"\nvs. {previous['environment']['timestamp']}")
+    old_levels = {level["concurrency"]: level for level in previous.get("levels", [])}
+    for level in results["levels"]:
+        old = old_levels.get(level["concurrency"])
+        if old is None:
+            continue
+        d_rps = (level["throughput_rps"] - old["throughput_rps"]) / old["throughput_rps"] if old["throughput_rps"] else 0
+        old_p95 = old["latency_ms"].get("p95") or 0
+        d_p95 = (level["latency_ms"].get("p95", 0) - old_p95) / old_p95 if old_p95 else 0
+        print(f"c={level['concurrency']:<4} throughput {d_rps:+.1%}  p95 {d_p95:+.1%}  "
+              f"error rate {old['error_rate']:.1%} -> {level['error_rate']:.1%}")
+    print(f"max useful concurrency: {previous['saturation']['max_useful_concurrency']} -> "
+          f"{results['saturation']['max_useful_concurrency']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", default="1,2,4,8,16", help="comma-separated concurrency ramp")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation weights")
+    parser.add_argument("--vendors", type=int, default=4, help="vendor pool size")
+    parser.add_argument("--packets", type=int, default=2, help="synthetic PDFs per vendor")
+    parser.add_argument("--pages", type=int, default=5, help="pages per synthetic PDF")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--embed-latency-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="injected provider failure rate")
+    parser.add_argument("--timeout", type=float, default=120.0, help="client timeout per request (s)")
+    parser.add_argument("--min-gain", type=float, default=0.1,
+                        help="throughput gain below which a level counts as saturated")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", help="load an already running server instead of an in-process one")
+    parser.add_argument("--serve", action="store_true", help="only run the server with offline stand-ins")
+    parser.add_argument("--port", type=int, default=8000, help="port for --serve")
+    parser.add_argument("--workdir", help="uploads and packets (a temporary directory by default)")
+    parser.add_argument("--out", help="result file (default: benchmarks/results/load-<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args()
+    args.levels = [int(x) for x in args.levels.split(",") if x.strip()]
+
+    keep_workdir = bool(args.workdir)
+    args.workdir = args.workdir or tempfile.mkdtemp(prefix="vendorguard-load-")
+    # app.config reads the environment at import time
+    os.environ["UPLOAD_DIR"] = os.path.join(args.workdir, "uploads")
+    os.environ.setdefault("EVIDENCE_PRERENDER", "false")
+    try:
+        if args.serve:
+            _serve(args)
+            return
+        results = run(args)
+    finally:
+        if not keep_workdir:
+            shutil.rmtree(args.workdir, ignore_errors=True)
+
+    s = results["saturation"]
+    print(f"\nmax useful concurrency {s['max_useful_concurrency']} at {s['peak_throughput_rps']} rps: {s['reason']}")
+    if args.compare:
+        _print_comparison(results, read_results(args.compare))
+    out = args.out or os.path.join(RESULTS_DIR, f"load-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.json")
+    write_results(out, results)
+
+
+if __name__ == "__main__":
+    main()
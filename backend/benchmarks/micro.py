@@ -0,0 +1,350 @@
+"""
+Microbenchmarks of the CPU-bound hot paths, with a regression gate.
+
+Each case times one function on representative input: a large synthetic PDF,
+3072-dimension provider vectors, malformed LLM output and a full report's
+worth of evidence; functions that take only microseconds are batched so every
+case is long enough to time. After a warm-up call, each case makes --repeat
+timed runs of at least --min-time seconds. A case's figure is the median
+per-call time, and its spread is the median absolute deviation relative to
+that median.
+
+Runs are compared with a baseline file (benchmarks/micro_baseline.json by
+default), and the process exits with status 1 when a case's median is slower
+than its baseline by more than max(--threshold, --spread-k x spread), using
+the larger of the two spreads. Cases under MIN_GATED_US, and those that
+mostly time thread hand-offs, are reported but never gated. Baselines are machine-specific: record one with --update-baseline
+(three interleaved rounds by default) on the machine that runs the gate.
+
+Usage (from backend/):
+    python -m benchmarks.micro [--threshold 0.25] [--spread-k 3] [--only parser]
+                               [--repeat 7] [--min-time 0.2] [--rounds N]
+                               [--baseline path] [--update-baseline] [--out results.json]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import timeit
+from typing import Any, Callable, Dict, List
+
+from .common import environment, read_results, write_results
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, "benchmarks", "micro_baseline.json")
+
+# name -> setup(workdir) returning the zero-argument callable to time
+CASES: Dict[str, Callable[[str], Callable[[], Any]]] = {}
+# Cases that are reported but never gated (see case())
+UNGATED: set = set()
+
+
+def case(name: str, gated: bool = True):
+    """Register a case; gated=False for cases bound by thread scheduling rather than CPU work."""
+    def register(setup):
+        CASES[name] = setup
+        if not gated:
+            UNGATED.add(name)
+        return setup
+    return register
+
+
+# --- cases -----------------------------------------------------------------------
+
+@case("parser.extract_text_chunks[1.pdf]")
+def _chunks_sample(workdir):
+    from app.services.parser import extract_text_chunks
+
+    path = os.path.join(BACKEND_DIR, "1.pdf")
+    return lambda: extract_text_chunks(path)
+
+
+@case("parser.extract_text_chunks[synthetic-200p]")
+def _chunks_large(workdir):
+    from app.services.parser import extract_text_chunks
+    from .fakes import write_synthetic_packet
+
+    path = write_synthetic_packet(workdir, "micro", 0, pages=200)
+    return lambda: extract_text_chunks(path)
+
+
+_FILENAMES = [
+    "SOC2_Type_II_Report_2024.pdf", "acme-security-policy-v3.pdf", "Data Processing Agreement (signed).pdf",
+    "ISO27001_certificate.pdf", "pentest-summary-q2.pdf", "privacy_notice.pdf", "MSA_final.pdf",
+    "incident-response-plan.pdf", "business_continuity_plan.pdf", "vendor_questionnaire_sig_lite.pdf",
+    "scan_0042.pdf", "misc-attachment.pdf",
+]
+
+
+@case("document_classifier.classify_document_type[filename]")
+def _classify_filename(workdir):
+    from app.services.document_classifier import classify_document_type
+
+    return lambda: [classify_document_type(name) for name in _FILENAMES]
+
+
+def _content_pairs():
+    """12 filenames that match no pattern, each with a real first-page preview."""
+    import fitz
+
+    previews = []
+    for name in ("1.pdf", "2.pdf"):
+        with fitz.open(os.path.join(BACKEND_DIR, name)) as doc:
+            previews.append(doc[0].get_text("text")[:2000])
+    return [("scan_0042.pdf", previews[0]), ("misc-attachment.pdf", previews[1])] * 6
+
+
+@case("document_classifier.classify_document_type[content]")
+def _classify_content(workdir):
+    from app.services.document_classifier import classify_document_type
+
+    pairs = _content_pairs()
+    return lambda: [classify_document_type(name, preview) for name, preview in pairs]
+
+
+@case("document_classifier.classify_documents[12-document packet]")
+def _classify_packet(workdir):
+    from app.services.document_classifier import classify_documents
+
+    previews = _content_pairs()
+    packet = [(name, preview) for name, (_, preview) in zip(_FILENAMES, previews)]
+    return lambda: classify_documents(packet)
+
+
+@case("embeddings._fold_to_dim[3072->768]")
+def _fold(workdir):
+    from app.services.embeddings import _fold_to_dim
+
+    rng = random.Random(0)
+    vec = [rng.uniform(-1, 1) for _ in range(3072)]
+    return lambda: _fold_to_dim(vec, 768)
+
+
+@case("embeddings._deterministic_fallback[64 chunks]")
+def _fallback(workdir):
+    from app.services.embeddings import _deterministic_fallback
+
+    texts = [f"Chunk {i}: data is encrypted at rest with AES-256 and keys rotate yearly." * 8 for i in range(64)]
+    return lambda: [_deterministic_fallback(t) for t in texts]
+
+
+_VALID_OUTPUT = json.dumps({
+    "control_id": "C-ENCR-01", "classification": "Partial", "confidence": 0.62,
+    "rationale": "Encryption at rest is described for databases but not for backups.",
+    "followup_questions": ["Are backups encrypted?"],
+})
+_MALFORMED_OUTPUTS = [
+    _VALID_OUTPUT[:len(_VALID_OUTPUT) // 2],  # truncated mid-object
+    "```json\n" + _VALID_OUTPUT + "\n```",  # fenced
+    "Here is my assessment: " + _VALID_OUTPUT,  # prose prefix
+    _VALID_OUTPUT.replace('"Partial"', '"Mostly covered"'),  # schema violation
+    _VALID_OUTPUT.replace("0.62", "62"),  # out-of-range confidence
+]
+
+
+@case("llm._parse_classification[100 valid]")
+def _parse_valid(workdir):
+    from types import SimpleNamespace
+    from app.services.llm import _parse_classification
+
+    responses = [SimpleNamespace(text=_VALID_OUTPUT, parsed=None)] * 100
+    return lambda: [_parse_classification(resp) for resp in responses]
+
+
+@case("llm._parse_classification[100 malformed]")
+def _parse_malformed(workdir):
+    from types import SimpleNamespace
+    from pydantic import ValidationError
+    from app.services.llm import _parse_classification
+
+    responses = [SimpleNamespace(text=t, parsed=None) for t in _MALFORMED_OUTPUTS] * 20
+
+    def run():
+        for resp in responses:
+            try:
+                _parse_classification(resp)
+            except (ValidationError, ValueError):
+                pass
+    return run
+
+
+def _evidences(n: int, seed: int) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [{
+        "doc_id": f"doc_{rng.randrange(4)}.pdf",
+        "doc_type": "security_policy",
+        "page": rng.randrange(1, 40),
+        "clause_hash": f"{rng.getrandbits(64):016x}",
+        "snippet": "Customer data is encrypted at rest using AES-256.\nKeys are managed in a KMS. " * 4,
+        "similarity_score": round(rng.random(), 4) if rng.random() > 0.2 else None,
+        "point_id": rng.getrandbits(48),
+    } for _ in range(n)]
+
+
+# Every call hands off to the LLM thread pool, so this moves with thread wake-up latency
+# (2x between otherwise identical runs); its parse work is gated by _parse_classification[100 malformed]
+@case("llm.classify_control_with_gemini[malformed output]", gated=False)
+def _classify_malformed(workdir):
+    from app.services import llm
+    from .fakes import FakeGenAIClient
+
+    client = FakeGenAIClient(malformed_rate=1.0)
+    llm._get_genai_client = lambda: client
+    evidences = _evidences(6, 1)
+    return lambda: llm.classify_control_with_gemini(
+        "C-ENCR-01", "Data must be encrypted at rest using AES-256", evidences)
+
+
+@case("analyzer._dedupe_top_evidence[22 controls x 20 evidences]")
+def _dedupe(workdir):
+    from app.services.analyzer import _dedupe_top_evidence
+
+    per_control = [_evidences(20, 200 + i) for i in range(22)]
+    return lambda: [_dedupe_top_evidence(evidences, max_items=3) for evidences in per_control]
+
+
+@case("analyzer.summarize_for_ui[22 controls]")
+def _summarize(workdir):
+    from app.services.analyzer import summarize_for_ui
+
+    statuses = ("Covered", "Partial", "Missing")
+    raw = [{
+        "control_id": f"C-{i:02d}", "control_name": f"Control {i}",
+        "control_description": "Data must be encrypted at rest using AES-256 or equivalent",
+        "frameworks": ["SOC2", "ISO27001"], "status": statuses[i % 3], "confidence": 0.7,
+        "evidence": _evidences(8, 100 + i),
+    } for i in range(22)]
+    return lambda: [summarize_for_ui(r) for r in raw]
+
+
+# --- runner ----------------------------------------------------------------------
+
+# Cases faster than this per call are reported but never gated: timer and scheduler
+# noise swamps them. Batch tiny functions inside the case instead.
+MIN_GATED_US = 100.0
+
+
+def _calibrate(timer: timeit.Timer, min_time: float) -> int:
+    """Smallest loop count whose run takes at least min_time seconds."""
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            return number
+        number = max(number * 2, int(number * min_time * 1.2 / max(elapsed, 1e-9)))
+
+
+def measure(fn: Callable[[], Any], repeat: int, min_time: float) -> Dict[str, Any]:
+    """Per-call times (us) of `repeat` runs of at least min_time seconds each."""
+    fn()  # warm-up: first calls pay for imports, lazy clients and caches
+    timer = timeit.Timer(fn)
+    number = _calibrate(timer, min_time)
+    return {"number": number, "samples": [t / number * 1e6 for t in timer.repeat(repeat=repeat, number=number)]}
+
+
+def _summarize(samples: List[float], number: int) -> Dict[str, Any]:
+    median = statistics.median(samples)
+    # Median absolute deviation relative to the median: robust to the odd preempted run
+    spread = statistics.median(abs(x - median) for x in samples) / median if median else 0.0
+    return {
+        "median_us": round(median, 2),
+        "min_us": round(min(samples), 2),
+        "spread": round(spread, 4),
+        "number": number,
+        "runs": len(samples),
+    }
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            threshold: float, spread_k: float) -> List[str]:
+    """Names of the cases whose median is slower than the baseline's by more than
+    max(threshold, spread_k x the larger of the two relative spreads)."""
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"  {name}: no baseline")
+            continue
+        ratio = r["median_us"] / base["median_us"] if base["median_us"] else 1.0
+        tolerance = max(threshold, spread_k * max(base.get("spread", 0.0), r["spread"]))
+        flag = ""
+        if base["median_us"] < MIN_GATED_US:
+            flag = "  (too small to gate)"
+        elif name in UNGATED:
+            flag = "  (not gated)"
+        elif ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 - tolerance:
+            flag = "  improved"
+        print(f"  {name:<58} {base['median_us']:>12.1f} -> {r['median_us']:>12.1f} us  "
+              f"({ratio - 1:+.1%}, tolerance {tolerance:.0%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help="run only cases whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=7, help="timed runs per case and round")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds per timed run")
+    parser.add_argument("--rounds", type=int, help="passes over all cases, interleaved "
+                        "(default 1, or 3 with --update-baseline so the spread covers run-to-run drift)")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown vs. baseline (0.25 = 25%%)")
+    parser.add_argument("--spread-k", type=float, default=3.0,
+                        help="widen the threshold to this many relative spreads for noisy cases")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--out", help="also write this run's results to a file")
+    args = parser.parse_args()
+    rounds = args.rounds or (3 if args.update_baseline else 1)
+
+    workdir = tempfile.mkdtemp(prefix="vendorguard-micro-")
+    # app.config reads the environment at import time
+    os.environ.setdefault("UPLOAD_DIR", os.path.join(workdir, "uploads"))
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        fns = {name: setup(workdir) for name, setup in CASES.items() if not args.only or args.only in name}
+        samples: Dict[str, List[float]] = {name: [] for name in fns}
+        numbers: Dict[str, int] = {}
+        for _ in range(rounds):
+            for name, fn in fns.items():
+                m = measure(fn, args.repeat, args.min_time)
+                samples[name].extend(m["samples"])
+                numbers[name] = max(numbers.get(name, 0), m["number"])
+        for name in fns:
+            results[name] = _summarize(samples[name], numbers[name])
+            print(f"{name:<60} {results[name]['median_us']:>12.1f} us  "
+                  f"(spread {results[name]['spread']:.1%}, {results[name]['number']} loops)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    run = {"benchmark": "micro", "environment": environment(), "cases": results}
+    if args.out:
+        write_results(args.out, run)
+    if args.update_baseline:
+        if os.path.exists(args.baseline) and args.only:
+            # Partial runs only replace their own cases
+            merged = read_results(args.baseline)
+            merged["cases"].update(results)
+            merged["environment"] = run["environment"]
+            run = merged
+        write_results(args.baseline, run)
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; record one with --update-baseline")
+        return
+
+    print(f"\nvs. baseline {args.baseline} (threshold {args.threshold:.0%}, spread x{args.spread_k:g}):")
+    regressions = compare(results, read_results(args.baseline)["cases"], args.threshold, args.spread_k)
+    if regressions:
+        print(f"\n{len(regressions)} case(s) regressed: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()